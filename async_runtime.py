@@ -0,0 +1,239 @@
+"""
+Event-driven runtime: capture, hand inference, state updates and rendering
+run as separate asyncio tasks, so the screen is redrawn at a steady rate
+from the latest state however fast or slow inference is.
+
+    capture    reads the newest camera frame (on a worker thread) and converts
+               it to RGB into a free buffer; a frame inference has not picked
+               up yet is replaced by the newer one
+    inference  runs hands.process() on the newest frame (on another worker
+               thread) and publishes a HandResult stamped with the time its
+               frame was captured and the time the landmarks were ready
+    update     passes every result, in order, to the app's on_result()
+    render     calls the app's draw(now) every 1 / fps seconds and shows it
+
+Only the blocking calls (camera read, model) leave the event loop thread, so
+the app's state is never touched by two tasks at once. Between results the
+app draws from its last state, e.g. with a CursorFilter extrapolated to now.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from capture import LatestFrameCapture, frame_timestamp
+from hand_tracks import HandBatch
+from landmark_log import ReplaySession
+from metrics import RollingHistogram
+from stage_timer import null_timer
+
+
+class HandResult:
+    """One inference: the hands found (an (n, 21, 3) array, None without a hand) and when."""
+    __slots__ = ("seq", "frame_time", "done_time", "width", "height", "hands", "handedness")
+
+    def __init__(self, seq, frame_time, done_time, width, height, hands, handedness=()):
+        self.seq = seq                  # results are numbered in capture order
+        self.frame_time = frame_time    # perf_counter() when the frame was captured
+        self.done_time = done_time      # perf_counter() when the landmarks were ready
+        self.width = width              # size of the camera frame
+        self.height = height
+        self.hands = hands
+        self.handedness = handedness    # per hand, index in landmark_log.HANDEDNESS (-1 = unknown)
+
+    @property
+    def found(self):
+        return self.hands is not None
+
+    @property
+    def points(self):
+        """The first hand's (21, 3) landmarks, None without a hand."""
+        return self.hands[0] if self.hands is not None else None
+
+
+class AsyncRuntime:
+    """
+    Runs one app on a frame source and a Hands model. run() blocks until the
+    source runs out or one of stop_keys is pressed and returns that key (None
+    when the source ran out). mirror=True mirrors the landmarks, for apps that
+    do not show the camera image. Results hold up to max_hands hands.
+    """
+
+    def __init__(self, cap, hands, fps=60, mirror=False, max_hands=1):
+        self.cap = cap
+        self.hands = hands
+        self.fps = fps
+        self.mirror = mirror
+
+        self.frames_captured = 0
+        self.frames_dropped = 0     # captured but replaced by a newer frame before inference
+        self.results = 0
+        self.rendered = 0
+        self.latest = None          # newest HandResult
+        self.render_interval = RollingHistogram(1000)   # seconds between two rendered frames
+        self.result_age = RollingHistogram(1000)        # capture -> on screen, of the newest result
+        self.inference_time = RollingHistogram(1000)
+
+        self._batch = HandBatch(max_hands)
+        self._free = [None, None, None]     # RGB buffers: one being written, one waiting, one in inference
+        self._newest = None                 # (rgb, frame time, replay record) waiting for inference
+        self._source_done = False
+        self._capture_thread = ThreadPoolExecutor(1)
+        self._model_thread = ThreadPoolExecutor(1)
+
+    # ---------------- Tasks ----------------
+    def _read(self, rgb):
+        # On the capture thread. A replayed frame carries its record along:
+        # by the time it is inferred the session may have read further
+        ret, frame = self.cap.read()
+        if not ret:
+            return None
+        t = frame_timestamp(self.cap)
+        record = self.cap.current if isinstance(self.cap, ReplaySession) else None
+        if rgb is None or rgb.shape != frame.shape:
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        return rgb, t, record
+
+    async def _capture(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            buf = self._free.pop()
+            got = await loop.run_in_executor(self._capture_thread, self._read, buf)
+            if got is None:
+                self._free.append(buf)
+                self._source_done = True
+                self._frame_ready.set()
+                return
+            if self._newest is not None:
+                self._free.append(self._newest[0])
+                self.frames_dropped += 1
+            self._newest = got
+            self.frames_captured += 1
+            self._frame_ready.set()
+
+    async def _infer(self):
+        loop = asyncio.get_running_loop()
+        seq = 0
+        while True:
+            if self._newest is None:
+                if self._source_done:
+                    break
+                self._frame_ready.clear()
+                await self._frame_ready.wait()
+                continue
+            (rgb, frame_time, record), self._newest = self._newest, None
+            args = (rgb,) if record is None else (rgb, record)
+            start = time.perf_counter()
+            result = await loop.run_in_executor(self._model_thread, self.hands.process, *args)
+            done = time.perf_counter()
+            self._free.append(rgb)
+            self.inference_time.add(done - start)
+
+            batch = self._batch.load(result, self.mirror)
+            found, handedness = None, ()
+            if batch.count:
+                found = batch.points[:batch.count].copy()
+                handedness = tuple(int(label) for label in batch.handedness[:batch.count])
+            h, w = rgb.shape[:2]
+            self._results.put_nowait(HandResult(seq, frame_time, done, w, h, found, handedness))
+            seq += 1
+        self._results.put_nowait(None)
+
+    async def _update(self, on_result):
+        while True:
+            result = await self._results.get()
+            if result is None:
+                return
+            on_result(result)
+            self.latest = result
+            self.results += 1
+
+    async def _render(self, draw, sink, window_name, timer, stop_keys, max_frames, tasks):
+        period = 1.0 / self.fps
+        next_time = last_shown = time.perf_counter()
+        while max_frames is None or self.rendered < max_frames:
+            # A task that failed stops the app instead of leaving the screen frozen
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+            if tasks[-1].done():
+                # Every result has been applied and the source has run out
+                return None
+
+            timer.start_frame()
+            now = time.perf_counter()
+            img = draw(now)
+            timer.lap("render")
+            timer.overlay(img)
+            sink.show(window_name, img)
+            key = sink.poll_key()
+            timer.lap("display")
+            timer.end_frame()
+
+            shown = time.perf_counter()
+            if self.rendered:
+                self.render_interval.add(shown - last_shown)
+            last_shown = shown
+            if self.latest is not None:
+                self.result_age.add(shown - self.latest.frame_time)
+            self.rendered += 1
+            if key in stop_keys:
+                return key
+
+            # Fixed rate; after a stall start over instead of rushing to catch up
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay < 0:
+                next_time = time.perf_counter()
+                delay = 0
+            await asyncio.sleep(delay)
+        return None
+
+    async def _main(self, on_result, draw, sink, window_name, timer, stop_keys, max_frames):
+        self._frame_ready = asyncio.Event()
+        self._results = asyncio.Queue()
+        tasks = [asyncio.create_task(self._capture()),
+                 asyncio.create_task(self._infer()),
+                 asyncio.create_task(self._update(on_result))]
+        try:
+            return await self._render(draw, sink, window_name, timer, stop_keys, max_frames, tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self, on_result, draw, sink, window_name, timer=null_timer, stop_keys=(27, ord('q')), max_frames=None):
+        try:
+            return asyncio.run(self._main(on_result, draw, sink, window_name, timer, stop_keys, max_frames))
+        finally:
+            # Let a read or inference still in flight finish before the caller releases the source;
+            # a read waiting on a stalled camera is woken up instead (the camera stays open,
+            # launcher.py hands it to the next app)
+            if isinstance(self.cap, LatestFrameCapture):
+                self.cap.interrupt()
+            self._capture_thread.shutdown(wait=True)
+            self._model_thread.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            "rendered": self.rendered,
+            "render_fps": self.render_interval.total / self.render_interval.total_sum if self.render_interval.total else 0.0,
+            "interval_p95_ms": 1000 * self.render_interval.percentile(95),
+            "captured": self.frames_captured,
+            "dropped": self.frames_dropped,
+            "results": self.results,
+            "inference_ms": 1000 * self.inference_time.percentile(50),
+            "age_p50_ms": 1000 * self.result_age.percentile(50),
+            "age_p95_ms": 1000 * self.result_age.percentile(95),
+        }
+
+
+def print_runtime_stats(runtime):
+    if runtime is not None:
+        s = runtime.stats()
+        print("runtime: rendered {rendered} frames at {render_fps:.1f} fps (interval p95 {interval_p95_ms:.1f} ms), "
+              "{results} results from {captured} frames ({dropped} dropped), inference {inference_ms:.1f} ms, "
+              "result age p50 {age_p50_ms:.1f} / p95 {age_p95_ms:.1f} ms".format(**s))
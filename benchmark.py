@@ -0,0 +1,240 @@
+"""
+Headless benchmark for the three apps.
+
+Runs the main loop of color_canvas, game_option and game_play2 over the same
+fixed clip without a camera or a display, and reports FPS plus p50/p95/p99
+latency for every stage of the loop.
+
+    python benchmark.py --source clip.mp4
+    python benchmark.py --source synthetic:1280x720:300 --apps game_play2 --json out.json
+
+With --replay the apps are fed a recorded landmark session (see
+landmark_log.py) instead of frames and the model, which measures everything
+in the loop except inference.
+
+    python benchmark.py --replay session.lmk
+
+With --allocations it counts image-sized heap allocations per stage instead
+of timing, to check that the loops reuse their buffers in steady state.
+
+    python benchmark.py --allocations
+
+With --backends it compares hand detectors instead of apps: each one runs
+over the clip and its landmarks are checked against MediaPipe landmarks
+recorded from the same clip (--reference; recorded first if the file does
+not exist yet). Reports inference FPS, how often the hand was found, the
+pixel error of the index tip and of the landmark centroid (the two cursors)
+and how often the classified gesture (see gestures.py) agrees. --mirror
+flips the frames first, as color_canvas and game_option do.
+
+    python benchmark.py --source clip.mp4 --backends mediapipe classic --reference clip.lmk
+"""
+import argparse
+import importlib
+import json
+import os
+import time
+
+import numpy as np
+
+from frame_pool import FramePool, bgr_to_rgb, mirror_frame
+from frame_source import open_source, HeadlessSink
+from gestures import GestureEngine
+from hands_model import BACKENDS, create_hands
+from landmark_log import LandmarkRecorder, ReplaySession, load_session, stop_recording
+from landmarks import HandArray
+from stage_timer import AllocationTimer, StageTimer, format_allocations, format_report, null_timer
+
+APPS = ("color_canvas", "game_option", "game_play2")
+
+
+def reset_app(app):
+    # Start every run from a fresh game / empty drawing
+    if hasattr(app, "init_game"):
+        app.init_game()
+    if hasattr(app, "canvas"):
+        app.canvas = None
+    if hasattr(app, "journal_path"):
+        app.journal_path = None     # never load or overwrite the user's saved drawing
+
+
+def benchmark_app(name, source_spec, frames=None, warmup=10, replay=None, allocations=False):
+    app = importlib.import_module(name)
+    reset_app(app)
+    sink = HeadlessSink()
+    timer = AllocationTimer() if allocations else StageTimer()
+    if app.hands is None and not replay:
+        app.hands = create_hands(max_num_hands=getattr(app, "max_hands", getattr(app, "players", 1)),
+                                 roi=app.roi_inference, backend=app.hand_backend, mirrored=app.mirrored_frames)
+    hands, scheduler = app.hands, getattr(app, "scheduler", None)
+    cap = open_replay(app, replay) if replay else open_source(source_spec)
+    try:
+        if warmup:
+            app.run(cap, sink, null_timer, max_frames=warmup)
+        app.run(cap, sink, timer, max_frames=frames)
+        if allocations:
+            timer.stop()
+        report = timer.report()
+        if hasattr(app.hands, "stats"):
+            report["hands"] = app.hands.stats()
+        if getattr(app, "scheduler", None) is not None:
+            report["scheduler"] = app.scheduler.stats()
+    finally:
+        cap.release()
+        app.hands, app.scheduler = hands, scheduler
+    return report
+
+
+def open_replay(app, path):
+    # The session stands in for both the camera and the model
+    session = ReplaySession(path)
+    app.hands, app.scheduler = session.hands, None
+    return session
+
+
+def read_frames(source_spec, mirror=False, frames=None):
+    """Yields the clip's frames as RGB (reused buffers), mirrored first if asked."""
+    cap = open_source(source_spec)
+    pool = FramePool()
+    try:
+        count = 0
+        while frames is None or count < frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if mirror:
+                frame = mirror_frame(frame, pool)
+            yield bgr_to_rgb(frame, pool)
+            count += 1
+    finally:
+        cap.release()
+
+
+def record_reference(source_spec, path, mirror=False, frames=None):
+    """Records full-frame MediaPipe landmarks of every frame of the clip to path."""
+    hands = LandmarkRecorder(create_hands(roi=False, mirrored=mirror), path)
+    try:
+        for rgb in read_frames(source_spec, mirror, frames):
+            hands.process(rgb)
+    finally:
+        stop_recording(hands).close()
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": float("nan"), "p95": float("nan")}
+    return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95))}
+
+
+def benchmark_backend(backend, source_spec, reference, frames=None, mirror=False):
+    """Runs one hand detector over the clip and compares it with the reference session, frame by frame."""
+    records, header = load_session(reference)
+    frames = len(records) if frames is None else min(frames, len(records))
+    w, h = header["width"], header["height"]
+    hands = create_hands(backend=backend, mirrored=mirror)
+    hand, ref = HandArray(), HandArray()
+    hand_gestures, ref_gestures = GestureEngine(), GestureEngine()
+
+    times = []
+    tip_errors = []
+    centroid_errors = []
+    ref_found = found_both = false_positives = same_gesture = same_fist = 0
+    for i, rgb in enumerate(read_frames(source_spec, mirror, frames)):
+        start = time.perf_counter()
+        result = hands.process(rgb)
+        times.append(time.perf_counter() - start)
+
+        found = bool(result.multi_hand_landmarks)
+        expected = records[i]["num_hands"] > 0
+        ref_found += expected
+        false_positives += found and not expected
+        if not (found and expected):
+            continue
+        found_both += 1
+        hand.load(result.multi_hand_landmarks[0])
+        ref.load(records[i]["landmarks"][0])
+        tip_errors.append(float(np.hypot(*((hand.points[8, :2] - ref.points[8, :2]) * (w, h)))))
+        centroid_errors.append(float(np.hypot(*((hand.centroid() - ref.centroid()) * (w, h)))))
+        got, want = hand_gestures.classify(hand), ref_gestures.classify(ref)
+        same_gesture += got == want
+        same_fist += (got is not None and hand_gestures.names[got] == "fist") == \
+                     (want is not None and ref_gestures.names[want] == "fist")
+    if hasattr(hands, "close"):
+        hands.close()
+
+    return {
+        "frames": len(times),
+        "fps": len(times) / sum(times) if times else 0.0,
+        "inference_ms": {k: 1000 * v for k, v in _percentiles(times).items()},
+        "found": found_both / ref_found if ref_found else float("nan"),
+        "false_positives": false_positives,
+        "tip_error_px": _percentiles(tip_errors),
+        "centroid_error_px": _percentiles(centroid_errors),
+        "gesture_agreement": same_gesture / found_both if found_both else float("nan"),
+        "fist_agreement": same_fist / found_both if found_both else float("nan"),
+    }
+
+
+def format_backend_report(name, report):
+    lines = ["{}: {} frames, {:.1f} FPS (inference p50 {:.2f} ms, p95 {:.2f} ms)".format(
+        name, report["frames"], report["fps"], report["inference_ms"]["p50"], report["inference_ms"]["p95"])]
+    lines.append("  hand found {:.0%} of reference frames, {} false positives".format(
+        report["found"], report["false_positives"]))
+    lines.append("  {:<18} {:>8} {:>8}".format("error (px)", "p50", "p95"))
+    for key in ("tip_error_px", "centroid_error_px"):
+        lines.append("  {:<18} {:>8.1f} {:>8.1f}".format(key[:-3], report[key]["p50"], report[key]["p95"]))
+    lines.append("  gesture agreement {:.0%}, fist agreement {:.0%}".format(
+        report["gesture_agreement"], report["fist_agreement"]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless per-stage benchmark of the gesture apps")
+    parser.add_argument("--source", default="synthetic",
+                        help="video file, image directory, camera index or synthetic[:WxH[:N[:FPS]]]")
+    parser.add_argument("--apps", nargs="+", default=list(APPS), choices=APPS)
+    parser.add_argument("--frames", type=int, default=None,
+                        help="frames to time per app (default: until the clip ends)")
+    parser.add_argument("--warmup", type=int, default=10,
+                        help="untimed frames run first so model and caches are warm")
+    parser.add_argument("--replay", help="replay this landmark session instead of --source (no inference)")
+    parser.add_argument("--allocations", action="store_true",
+                        help="count image-sized heap allocations per stage instead of timing")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS,
+                        help="compare these hand detectors against --reference instead of timing the apps")
+    parser.add_argument("--reference",
+                        help="MediaPipe landmark session of --source (recorded first if missing)")
+    parser.add_argument("--mirror", action="store_true", help="mirror the frames before detection (--backends)")
+    parser.add_argument("--json", help="also write the reports to this file")
+    args = parser.parse_args(argv)
+
+    if args.backends:
+        if not args.reference:
+            parser.error("--backends needs --reference")
+        if not os.path.exists(args.reference):
+            record_reference(args.source, args.reference, args.mirror, args.frames)
+        reports = {}
+        for name in args.backends:
+            reports[name] = benchmark_backend(name, args.source, args.reference, args.frames, args.mirror)
+            print(format_backend_report(name, reports[name]))
+            print()
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"source": args.source, "reference": args.reference, "backends": reports}, f, indent=2)
+        return reports
+
+    reports = {}
+    for name in args.apps:
+        reports[name] = benchmark_app(name, args.source, args.frames, args.warmup,
+                                      args.replay, args.allocations)
+        print((format_allocations if args.allocations else format_report)(name, reports[name]))
+        print()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"source": args.replay or args.source, "apps": reports}, f, indent=2)
+    return reports
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import threading
+import time
+
+
+class LatestFrameCapture:
+    """
+    Grabs frames from a cv2.VideoCapture (or anything with read()/release())
+    on a background thread and keeps only the newest one.
+
+    read() hands over the newest frame that has not been handed out yet, so
+    the main loop never waits on camera I/O that already happened and never
+    works on stale frames sitting in a buffer. Frames the main loop was too
+    slow to pick up are dropped and counted. When no frame is ready read()
+    waits for one, however long the camera takes to open or stalls for; it
+    only returns (False, None) once the source has run out.
+
+    Frames are triple buffered: the thread decodes into a back buffer (via
+    source.read(image)), publishes it by swapping it with the ready one, and
+    read() swaps ready with the front buffer it returns. The frame returned
+    by read() is therefore never written to until the next read(), and no
+    image is allocated after the first few frames.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.frames_grabbed = 0
+        self.frames_delivered = 0
+        self.dropped = 0
+        self.wait_time_total = 0.0  # total time read() waited for a frame
+        self.frame_time = None      # perf_counter() when the last handed-out frame was grabbed
+        self.grab_time_total = 0.0  # total time spent blocked in source.read()
+        self.latency_total = 0.0
+        self.latency_count = 0
+
+        self._buffers = [None, None, None]
+        self._back, self._ready, self._front = 0, 1, 2
+        self._frame_grabbed_at = None
+        self._pending = False
+        self._ok = True
+        self._running = True
+        self._interrupts = 0        # bumped by interrupt() to wake the read() waiting
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._grab_loop, daemon=True)
+        self._thread.start()
+
+    def _grab_loop(self):
+        while self._running:
+            start = time.perf_counter()
+            buf = self._buffers[self._back]
+            ret, frame = self.source.read(buf)
+            now = time.perf_counter()
+            if ret and frame is not buf:
+                # First frames (or a source that ignores image): keep our own copy
+                self._buffers[self._back] = frame.copy()
+            with self._cond:
+                self.grab_time_total += now - start
+                if not ret:
+                    self._ok = False
+                    self._cond.notify_all()
+                    return
+                if self._pending:
+                    self.dropped += 1
+                self._back, self._ready = self._ready, self._back
+                self._frame_grabbed_at = now
+                self._pending = True
+                self.frames_grabbed += 1
+                self._cond.notify_all()
+
+    @property
+    def queue_depth(self):
+        """Number of grabbed frames waiting to be read (0 or 1, older ones are dropped)."""
+        return 1 if self._pending else 0
+
+    @property
+    def finished(self):
+        """True once the source has run out and every grabbed frame has been read."""
+        return not self._ok and not self._pending
+
+    def read(self):
+        with self._cond:
+            start = time.perf_counter()
+            interrupts = self._interrupts
+            # The thread also stops without a frame if source.read() raised or release() was called
+            while (not self._pending and self._ok and self._running and self._thread.is_alive()
+                   and self._interrupts == interrupts):
+                self._cond.wait(0.5)
+            self.wait_time_total += time.perf_counter() - start
+            if not self._pending:
+                return False, None
+            self._pending = False
+            self._ready, self._front = self._front, self._ready
+            self.frames_delivered += 1
+            self.frame_time = self._frame_grabbed_at
+            return True, self._buffers[self._front]
+
+    def interrupt(self):
+        """
+        Makes a read() waiting for a frame (on another thread) return
+        (False, None) now. Grabbing goes on, so the next read() works as
+        usual: for a loop that is stopping while the camera stalls.
+        """
+        with self._cond:
+            self._interrupts += 1
+            self._cond.notify_all()
+
+    def mark_shown(self):
+        """
+        Call once the current frame has been displayed. Records the time from
+        grab to display, which is the end-to-end latency of the loop.
+        """
+        if self.frame_time is None:
+            return None
+        age = time.perf_counter() - self.frame_time
+        self.latency_total += age
+        self.latency_count += 1
+        return age
+
+    def stats(self):
+        grabbed = max(self.frames_grabbed, 1)
+        return {
+            "grabbed": self.frames_grabbed,
+            "delivered": self.frames_delivered,
+            "dropped": self.dropped,
+            "queue_depth": self.queue_depth,
+            "avg_wait_ms": 1000.0 * self.wait_time_total / max(self.frames_delivered, 1),
+            "avg_grab_ms": 1000.0 * self.grab_time_total / grabbed,
+            "avg_latency_ms": 1000.0 * self.latency_total / max(self.latency_count, 1),
+        }
+
+    def release(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+        self.source.release()
+
+
+def frame_timestamp(cap):
+    """
+    perf_counter() time the frame just read was captured (as close as we know
+    it): the grab time of a LatestFrameCapture, the recorded time of a
+    ReplaySession, otherwise now.
+    """
+    t = getattr(cap, "frame_time", None)
+    return time.perf_counter() if t is None else t
+
+
+def mark_shown(cap):
+    if isinstance(cap, LatestFrameCapture):
+        cap.mark_shown()
+
+
+def print_capture_stats(cap):
+    if isinstance(cap, LatestFrameCapture):
+        s = cap.stats()
+        print("capture: grabbed {grabbed}, delivered {delivered}, dropped {dropped}, "
+              "avg wait for a frame {avg_wait_ms:.1f} ms, avg grab {avg_grab_ms:.1f} ms, "
+              "avg grab-to-display {avg_latency_ms:.1f} ms".format(**s))
@@ -0,0 +1,246 @@
+"""
+A cheap classical hand tracker for machines where MediaPipe Hands alone uses
+most of the frame budget. No model: skin-colour segmentation, the convex
+hull of the hand for fingertips, and optical flow between detections.
+
+    detect   on a downscaled frame: skin pixels in YCrCb, the biggest blob,
+             its palm (the deepest point of the blob's distance transform)
+             and the hull points far enough above the palm as fingertips
+    track    on the frames in between: corners found inside the blob at the
+             last detection are followed with pyramidal Lucas-Kanade, and
+             the hand moves with their median displacement
+
+process() answers like mediapipe's Hands.process(): the result's
+multi_hand_landmarks is a list with one (21, 3) array (normalized x, y;
+z = 0) or None. The 21 points are built from the palm and the fingertips
+in mediapipe's layout, so cursor mapping (centroid, index tip) and finger
+up / folded tests work unchanged. It sees how many fingers are up, and the
+thumb by its direction, not which fingers they are: extended fingers are
+counted from the thumb side, which is the left of the image for a right
+hand in a mirrored frame (mirrored=True, what color_canvas and game_option
+pass) and the right in a camera frame as it comes (game_play2 and
+kiosk_server; see hands_model.create_hands).
+"""
+import math
+
+import cv2
+import numpy as np
+
+from frame_pool import FramePool
+from landmarks import NUM_LANDMARKS
+
+
+class ClassicResult:
+    """The parts of a mediapipe result the apps use."""
+
+    __slots__ = ("multi_hand_landmarks", "multi_handedness")
+
+    def __init__(self, landmarks):
+        self.multi_hand_landmarks = landmarks   # list of (21, 3) arrays, or None like mediapipe
+        self.multi_handedness = None
+
+
+# Direction of each finger's knuckle from the palm centre, in degrees from
+# straight up towards the thumb side (index, middle, ring, pinky); the thumb
+# is placed on its own
+KNUCKLE_ANGLES = (30.0, 5.0, -20.0, -42.0)
+# Palm centre to knuckles and to wrist, in units of the palm's inscribed radius
+PALM_LENGTH = 1.3
+
+
+class ClassicHands:
+    """
+    Stands in for mediapipe's Hands. Detection runs on a frame downscaled to
+    max_side pixels, at least every detect_every frames and whenever the
+    tracked corners are lost. The skin range is (Cr, Cb) in YCrCb; the blob
+    has to cover min_area of the frame to count as a hand.
+    """
+
+    def __init__(self, max_side=160, detect_every=4, min_area=0.01,
+                 cr=(133, 173), cb=(77, 127), mirrored=True):
+        self.max_side = max_side
+        self.detect_every = detect_every
+        self.min_area = min_area
+        self.skin_low = np.array((0, cr[0], cb[0]), dtype=np.uint8)
+        self.skin_high = np.array((255, cr[1], cb[1]), dtype=np.uint8)
+        self.mirrored = mirrored
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        self.pool = FramePool(1)        # downscaled frame
+        self.ycrcb_pool = FramePool(1)
+        self.mask_pool = FramePool(1)
+        self.blob_pool = FramePool(1)
+        self.deep_pool = FramePool(1)
+        self.dist_pool = FramePool(1, dtype=np.float32)
+        self.gray_pools = (FramePool(1), FramePool(1))
+        self._gray = 0                  # which of the two grey buffers holds this frame
+
+        self.points = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+        self._pixels = np.zeros((NUM_LANDMARKS, 2), dtype=np.float32)   # landmarks in downscaled pixels
+        self._corners = None            # (n, 1, 2) corners followed by optical flow
+        self._prev_gray = None
+        self._since_detect = 0
+        self.detections = 0
+        self.tracked = 0
+        self.misses = 0
+
+    @property
+    def mirrored(self):
+        """Whether frames are mirrored, i.e. the thumb of a right hand is on the left; can be changed between frames."""
+        return self.side > 0
+
+    @mirrored.setter
+    def mirrored(self, mirrored):
+        self.side = 1.0 if mirrored else -1.0   # x sign of "away from the thumb"
+
+    def process(self, rgb):
+        h, w = rgb.shape[:2]
+        scale = min(1.0, self.max_side / max(w, h))
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        small = cv2.resize(rgb, size, dst=self.pool.scratch((size[1], size[0], 3)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY, dst=self.gray_pools[self._gray].scratch(small.shape[:2]))
+
+        found = False
+        if self._corners is not None and self._since_detect < self.detect_every - 1:
+            found = self._track(gray)
+        if not found:
+            found = self._detect(small, gray)
+        self._prev_gray = gray
+        self._gray ^= 1
+        if not found:
+            self.misses += 1
+            return ClassicResult(None)
+
+        np.divide(self._pixels, (size[0], size[1]), out=self.points[:, :2])
+        return ClassicResult([self.points])
+
+    # ---------------- Tracking ----------------
+    def _track(self, gray):
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, self._corners, None,
+                                                    winSize=(15, 15), maxLevel=2)
+        ok = status.ravel() == 1
+        if np.count_nonzero(ok) < max(4, len(ok) // 2):
+            self._corners = None
+            return False
+        shift = np.median(moved[ok, 0] - self._corners[ok, 0], axis=0)
+        self._pixels += shift
+        self._corners = moved[ok].reshape(-1, 1, 2)
+        self._since_detect += 1
+        self.tracked += 1
+        return True
+
+    # ---------------- Detection ----------------
+    def _detect(self, small, gray):
+        self._corners = None
+        ycrcb = cv2.cvtColor(small, cv2.COLOR_RGB2YCrCb, dst=self.ycrcb_pool.scratch(small.shape))
+        mask = cv2.inRange(ycrcb, self.skin_low, self.skin_high, dst=self.mask_pool.scratch(small.shape[:2]))
+        # Opening drops specks; holes need no closing, the blob is filled from its outline below,
+        # and closing would glue neighbouring fingers into one block the palm is then found in
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=mask)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return False
+        contour = max(contours, key=cv2.contourArea)
+        if cv2.contourArea(contour) < self.min_area * mask.size:
+            return False
+
+        # Palm: the point of the blob farthest from its edge, r its distance.
+        # The wrist is almost as wide, so of the points nearly as deep take the
+        # highest, or the centre slides down the arm from frame to frame
+        blob = self.blob_pool.scratch(mask.shape)
+        blob[:] = 0
+        cv2.drawContours(blob, [contour], -1, 255, -1)
+        dist = cv2.distanceTransform(blob, cv2.DIST_L2, 3, dst=self.dist_pool.scratch(mask.shape))
+        _, r, _, _ = cv2.minMaxLoc(dist)
+        if r < 2:
+            return False
+        deep = np.greater_equal(dist, 0.9 * r, out=self.deep_pool.scratch(mask.shape))
+        top = int(deep.any(axis=1).argmax())
+        center = (float(np.flatnonzero(deep[top]).mean()), float(top))
+
+        self._build(self._fingertips(contour, center, r), center, r)
+        self._corners = cv2.goodFeaturesToTrack(gray, 30, 0.01, 3, mask=blob)
+        self._since_detect = 0
+        self.detections += 1
+        return True
+
+    def _fingertips(self, contour, center, r):
+        """
+        Hull points reaching far enough out of the palm, and not below it, one
+        per finger, as (x, y, angle). The knuckles of folded fingers are on
+        the hull too, but reach less far than an extended finger; the thumb
+        and the little finger are shorter than the others.
+        """
+        cx, cy = center
+        tips = []
+        for x, y in cv2.convexHull(contour).reshape(-1, 2):
+            dx, dy = float(x) - cx, float(y) - cy
+            # Angle from straight up, positive towards the thumb side
+            angle = math.degrees(math.atan2(-self.side * dx, -dy))
+            reach = 1.9 * r if angle > 50 else 2.3 * r if angle < -30 else 2.6 * r
+            if dy > 0.5 * r or math.hypot(dx, dy) < reach:
+                continue
+            # Hull points of one finger are close together; keep the farthest
+            for i, (tx, ty, _) in enumerate(tips):
+                if math.hypot(x - tx, y - ty) < 0.55 * r:
+                    if math.hypot(dx, dy) > math.hypot(tx - cx, ty - cy):
+                        tips[i] = (float(x), float(y), angle)
+                    break
+            else:
+                tips.append((float(x), float(y), angle))
+        tips.sort(key=lambda t: -t[2])
+        return tips[:5]
+
+    def _build(self, tips, center, r):
+        """Fills the 21 landmarks from the palm and the fingertips (thumb side first)."""
+        cx, cy = center
+        px = self._pixels
+        s = self.side
+        fingers = [None] * 5
+        # A tip pointing well sideways on the thumb side is the thumb
+        if tips and tips[0][2] > 50:
+            fingers[0] = tips[0]
+            tips = tips[1:]
+        for f, tip in zip(range(1, 5), tips):
+            fingers[f] = tip
+
+        k = PALM_LENGTH * r
+        px[0] = (cx, cy + k)            # wrist
+        # The thumb starts low on the palm; landmark 2 is the joint it folds past
+        px[1] = (cx - s * 0.65 * k, cy + 0.5 * k)
+        px[2] = (cx - s * 1.1 * k, cy + 0.15 * k)
+        if fingers[0] is not None:
+            tx, ty = fingers[0][:2]
+            px[3] = ((px[2, 0] + tx) / 2, (px[2, 1] + ty) / 2)
+            px[4] = (tx, ty)
+        else:
+            px[3] = (cx - s * 0.6 * k, cy + 0.2 * k)
+            px[4] = (cx - s * 0.2 * k, cy + 0.3 * k)
+        for f in range(1, 5):
+            a = math.radians(KNUCKLE_ANGLES[f - 1])
+            ux, uy = -s * math.sin(a), -math.cos(a)     # unit vector from the palm to the knuckle
+            base = 1 + 4 * f
+            knuckle = (cx + ux * k, cy + uy * k)
+            px[base] = knuckle
+            if fingers[f] is not None:
+                tx, ty = fingers[f][:2]
+                px[base + 1] = (knuckle[0] + 0.4 * (tx - knuckle[0]), knuckle[1] + 0.4 * (ty - knuckle[1]))
+                px[base + 2] = (knuckle[0] + 0.7 * (tx - knuckle[0]), knuckle[1] + 0.7 * (ty - knuckle[1]))
+                px[base + 3] = (tx, ty)
+            else:
+                # Folded: the tip curls back below the middle joint
+                px[base + 1] = (knuckle[0] + 0.3 * k * ux, knuckle[1] + 0.3 * k * uy)
+                px[base + 2] = (knuckle[0] + 0.1 * k * ux, knuckle[1] + 0.1 * k * uy)
+                px[base + 3] = (knuckle[0] - 0.1 * k * ux, knuckle[1] - 0.1 * k * uy)
+
+    def stats(self):
+        runs = max(self.detections + self.tracked, 1)
+        return {
+            "detections": self.detections,
+            "tracked": self.tracked,
+            "misses": self.misses,
+            "tracked_fraction": self.tracked / runs,
+        }
+
+    def close(self):
+        pass
@@ -1,15 +1,39 @@
+import os
+import sys
+
 import cv2
-import numpy as np
-import mediapipe as mp
+
+from capture import frame_timestamp, mark_shown
+from cursor_filter import CursorFilter
+from frame_source import run_app
+from inference_scheduler import InferenceScheduler
+from hand_tracks import HandBatch, HandTracker, track_hands
+from landmarks import draw_hand, THUMB, INDEX, MIDDLE, RING, PINKY
+from gestures import Gesture, GestureBatch, START, END
+from widgets import Widget, WidgetLayer
+from ink_canvas import InkCanvas, Viewport
+from stroke_journal import StrokeJournal
+from frame_pool import FramePool, mirror_frame
+from stage_timer import null_timer
 
 # Setup
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-hands = mp_hands.Hands(
-    max_num_hands=1,
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.5
-)
+# Built in main() (or handed in by launcher.py), see hands_model.py
+hands = None
+# Hand detector: "mediapipe", or "classic" for slow machines (see classic_hands.py)
+hand_backend = "mediapipe"
+# The model sees the mirrored camera frame (the classic backend needs to know)
+mirrored_frames = True
+# Hands drawing at once (e.g. 2 for two people), each with its own cursor,
+# gestures, color and strokes; they keep their slot between frames (see hand_tracks.py)
+max_hands = 1
+# Run the model on a crop around the last known hand instead of the full frame
+roi_inference = True
+# Skip inference while the hand holds still (see inference_scheduler.py; one hand only)
+adaptive_inference = True
+scheduler = InferenceScheduler(min_rate=5.0) if adaptive_inference and max_hands == 1 else None
+# Cursor smoothing and latency compensation: "one_euro", "kalman" or None (raw)
+cursor_filter_kind = "one_euro"
+cursors = [CursorFilter(cursor_filter_kind) for _ in range(max_hands)]
 
 # Color palette
 palette = {
@@ -20,80 +44,240 @@ palette = {
     "White":  ((260, 20), (310, 70), (255, 255, 255))
 }
 
-# Drawing state
+def draw_swatch(swatch, img, rect, hover, scale):
+    x, y, w, h = rect
+    if hover:
+        cv2.rectangle(img, (x - 4, y - 4), (x + w + 4, y + h + 4), (255, 255, 255), 2)
+    cv2.rectangle(img, (x, y), (x + w, y + h), swatch.value, -1)
+    cv2.putText(img, swatch.name, (x, y + h + int(round(20 * scale))), cv2.FONT_HERSHEY_SIMPLEX,
+                0.5 * scale, (0,0,0), max(1, int(round(scale))))
+
+# Palette swatches, rendered once and stamped onto every frame; the swatch
+# under the finger is found in the palette's label map (see widgets.py).
+# The layout is for a palette_width wide frame and is scaled once to the camera.
+palette_width = 640
+palette_ui = WidgetLayer(330, 100, [Widget(name, (x1, y1, x2 - x1, y2 - y1), draw_swatch, color, pad=25)
+                                    for name, ((x1, y1), (x2, y2), color) in palette.items()])
+
+# Drawing state (an InkCanvas and its StrokeJournal, created on the first frame)
 canvas = None
-prev_x, prev_y = 0, 0
-draw_color = (255, 0, 0)
-drawing = False
-
-# Helper: Finger state
-def is_finger_up(landmarks, idx_tip, idx_dip):
-    return landmarks[idx_tip].y < landmarks[idx_dip].y
-
-cap = cv2.VideoCapture(0)
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    frame = cv2.flip(frame, 1)
-    h, w, _ = frame.shape
-    if canvas is None:
-        canvas = np.zeros_like(frame)
-
-    # Draw palette
-    for name, ((x1, y1), (x2, y2), color) in palette.items():
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
-        cv2.putText(frame, name, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1)
-
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = hands.process(rgb)
-
-    if result.multi_hand_landmarks:
-        for hand_landmarks in result.multi_hand_landmarks:
-            lm = hand_landmarks.landmark
-            x = int(lm[8].x * w)
-            y = int(lm[8].y * h)
-
-            # Check if index finger is up and middle down
-            index_up = is_finger_up(lm, 8, 6)
-            middle_up = is_finger_up(lm, 12, 10)
-
-            if index_up and not middle_up:
-                # Color selection
-                for name, ((x1, y1), (x2, y2), color) in palette.items():
-                    if x1 < x < x2 and y1 < y < y2:
-                        draw_color = color
-                        drawing = False
-                        prev_x, prev_y = 0, 0
-                        break
-                else:
-                    # Draw
-                    if drawing and prev_x != 0 and prev_y != 0:
-                        cv2.line(canvas, (prev_x, prev_y), (x, y), draw_color, 5)
-                    prev_x, prev_y = x, y
-                    drawing = True
+journal = None
+# The part of the canvas on screen. Index, middle and ring finger up drags the
+# canvas; thumb and pinky up zooms (hand up = in) around where the gesture started
+view = Viewport()
+# Index up and middle down draws (or picks a color over the palette). Debounced
+# briefly, so a stroke is not cut in two by one misread frame (see gestures.py)
+canvas_gestures = (
+    Gesture("pan", up=(INDEX, MIDDLE, RING), down=(PINKY,)),
+    Gesture("zoom", up=(THUMB, PINKY), down=(INDEX, MIDDLE, RING)),
+    Gesture("draw", up=(INDEX,), down=(MIDDLE,)),
+)
+brush_width = 5         # in screen pixels, whatever the zoom
+zoom_speed = 200        # pixels of vertical hand movement per doubling of the zoom
+# Color each hand starts with: the first blue, the second red, ...
+hand_colors = ((255, 0, 0), (0, 0, 255), (0, 255, 0), (0, 255, 255))
+# The gestures of every hand slot, classified together each frame
+hand_gestures = GestureBatch(max_hands, canvas_gestures, debounce=0.05)
+# The drawing is loaded from here at start and saved on exit and with 's' (None = never)
+journal_path = "air_canvas.strokes"
+
+
+class Painter:
+    """
+    One hand's state: its cursor, gestures and color, and the stroke it is
+    drawing with its own journal pen (the hand's slot). The gestures are
+    updated for all hands at once (hand_gestures) before update().
+    """
+
+    def __init__(self, pen):
+        self.pen = pen
+        self.cursor = cursors[pen]
+        self.gestures = hand_gestures[pen]
+        self.color = hand_colors[pen % len(hand_colors)]
+        self.drawing = False
+        self.prev = None        # (x, y) of the last frame while panning or zooming
+        self.anchor = None      # screen point the zoom is centred on
+
+    def reset(self):
+        """Forgets the hand (keeps the color); the next one starts afresh."""
+        self.cursor.reset()
+        self.gestures.reset()
+        self.drawing = False
+        self.prev = None
+
+    def lift(self):
+        """Ends the stroke being drawn, if any."""
+        if self.drawing:
+            journal.end(self.pen)
+            self.drawing = False
+
+    def update(self, frame, tip, t):
+        """One frame with the hand (its index tip in pixels): pans, zooms, picks a color or draws."""
+        self.cursor.update(int(tip[0]), int(tip[1]), t)
+        x, y = self.cursor.position()
+
+        # Gesture edges end a stroke or anchor a pan / zoom
+        for event in self.gestures.events:
+            if event.kind == END and event.gesture == "draw":
+                self.lift()
+            elif event.kind == START and event.gesture in ("pan", "zoom"):
+                self.anchor = self.prev = (x, y)
+
+        gesture = self.gestures.active
+        if gesture in ("pan", "zoom"):
+            px, py = self.prev
+            if gesture == "pan":
+                view.pan(x - px, y - py)
+            else:
+                view.zoom_at(2 ** ((py - y) / zoom_speed), *self.anchor)
+            self.prev = (x, y)
+        elif gesture == "draw":
+            # Color selection
+            swatch = palette_ui.hit(x, y)
+            if swatch is not None:
+                palette_ui.draw_hover(frame, swatch)
+                self.color = swatch.value
+                self.lift()
             else:
-                drawing = False
-                prev_x, prev_y = 0, 0
+                # Draw (the journal draws each new segment onto the canvas)
+                if not self.drawing:
+                    journal.begin(self.color, max(1, round(brush_width / view.zoom)), self.pen)
+                    self.drawing = True
+                journal.add_point(*view.to_canvas(x, y), self.pen)
+
+    def lose(self):
+        # Losing the hand ends the gesture and the stroke; the next one starts afresh
+        self.lift()
+        self.reset()
+
+
+painters = [Painter(pen) for pen in range(max_hands)]
+
+# Camera index, video file, image directory or "synthetic", threaded capture,
+# profiling and landmark recording / replay: see run_app() in frame_source.py
+source_spec = "0"
+threaded_capture = True
+profiling = False
+profile_hud = True
+profile_dir = None
+record_path = None
+replay_path = None
+replay_realtime = False
+
+window_name = "Air Canvas"
 
-            mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-    else:
-        drawing = False
-        prev_x, prev_y = 0, 0
+# Landmarks of all hands in one array, refilled every frame, and the slot of each hand
+batch = HandBatch(max_hands)
+tracker = HandTracker(max_hands)
+# Buffers for the mirrored frame and its RGB copy, reused every frame
+frame_pool = FramePool()
+
+def run(cap, sink, timer=null_timer, max_frames=None, switch_keys=()):
+    """
+    Main loop. Returns the key that ended it (quit, or one of switch_keys
+    when hosted by launcher.py), or None when the source ran out. The
+    drawing is saved to journal_path however the loop ends (launcher.py
+    never calls main()).
+    """
+    try:
+        return _run(cap, sink, timer, max_frames, switch_keys)
+    finally:
+        if journal is not None and journal_path:
+            journal.save(journal_path)
+
+def _run(cap, sink, timer, max_frames, switch_keys):
+    global canvas, journal, palette_ui
+
+    frames = 0
+    while max_frames is None or frames < max_frames:
+        timer.start_frame()
+        ret, frame = cap.read()
+        frame_time = frame_timestamp(cap)
+        timer.lap("capture")
+        if not ret:
+            break
+        frames += 1
+
+        frame = mirror_frame(frame, frame_pool)
+        h, w, _ = frame.shape
+        if canvas is None:
+            canvas = InkCanvas()
+            journal = StrokeJournal(canvas)
+            view.reset()
+            for painter in painters:
+                painter.reset()
+            if palette_ui.scale != w / palette_width:
+                palette_ui = palette_ui.scaled(w / palette_width)
+            if journal_path and os.path.exists(journal_path):
+                try:
+                    journal.load(journal_path)
+                except ValueError as e:
+                    print("not loading the saved drawing:", e)
+        timer.lap("convert")
+
+        # Draw palette
+        palette_ui.draw(frame)
+        timer.lap("render")
+
+        if track_hands(hands, frame, batch, tracker, scheduler, timer, frame_pool, now=frame_time):
+            # Index tips and gestures of all hands at once
+            tips = batch.landmark_pixels(8, w, h)
+            for painter in painters:
+                if tracker.fresh[painter.pen]:
+                    painter.reset()
+            hand_gestures.update(batch, tracker.index, frame_time)
+            for painter in painters:
+                i = tracker.index[painter.pen]
+                if i >= 0:
+                    painter.update(frame, tips[i], frame_time)
+                else:
+                    painter.lose()
+            timer.lap("logic")
 
-    # Overlay canvas
-    combined = cv2.addWeighted(frame, 1, canvas, 1, 0)
-    cv2.imshow("Air Canvas", combined)
+            for painter in painters:
+                i = tracker.index[painter.pen]
+                if i >= 0:
+                    draw_hand(frame, batch.hands[i], joint_color=painter.color if max_hands > 1 else (0, 0, 255))
+            timer.lap("landmarks")
+        else:
+            for painter in painters:
+                painter.lose()
+            timer.lap("logic")
 
-    key = cv2.waitKey(1) & 0xFF
-    if key == ord('c'):
-        canvas = np.zeros_like(frame)
-    elif key == ord('q'):
-        break
+        # Overlay canvas (only the tiles on screen that have ink)
+        combined = canvas.composite(frame, view)
+        timer.lap("composite")
+        timer.overlay(combined)
+        timer.lap("render")
+        sink.show(window_name, combined)
+        mark_shown(cap)
 
-cap.release()
-cv2.destroyAllWindows()
+        key = sink.poll_key()
+        timer.lap("display")
+        timer.end_frame()
+        if key in (ord('c'), ord('z'), ord('y'), ord('s')):
+            # These end the open strokes
+            for painter in painters:
+                painter.lift()
+        if key == ord('c'):
+            journal.clear()
+        elif key == ord('z'):
+            journal.undo()
+        elif key == ord('y'):
+            journal.redo()
+        elif key == ord('s') and journal_path:
+            journal.save(journal_path)
+        elif key in (ord('+'), ord('=')):
+            view.zoom_at(1.25, w // 2, h // 2)
+        elif key == ord('-'):
+            view.zoom_at(0.8, w // 2, h // 2)
+        elif key == ord('0'):
+            view.reset()
+        elif key == ord('q') or key in switch_keys:
+            return key
 
+def main():
+    run_app(sys.modules[__name__], "color_canvas")
 
+if __name__ == "__main__":
+    main()
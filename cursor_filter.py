@@ -0,0 +1,151 @@
+import math
+import time
+
+
+# ---------------- One Euro Filter ----------------
+class OneEuroFilter:
+    """
+    One Euro filter for a single value (Casiez et al. 2012): a low-pass
+    filter whose cutoff rises with speed, so a still hand does not jitter and
+    a moving hand does not lag. Also keeps the filtered speed, which is used
+    to extrapolate.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.speed = 0.0
+        self.t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, x, t):
+        if self.value is None or t <= self.t:
+            if self.value is None:
+                self.value = x
+            self.t = t
+            return self.value
+        dt = t - self.t
+        a_d = self._alpha(self.d_cutoff, dt)
+        self.speed += a_d * ((x - self.value) / dt - self.speed)
+        cutoff = self.min_cutoff + self.beta * abs(self.speed)
+        self.value += self._alpha(cutoff, dt) * (x - self.value)
+        self.t = t
+        return self.value
+
+    def predict(self, t):
+        return self.value + self.speed * (t - self.t)
+
+
+# ---------------- Kalman Filter ----------------
+class ConstantVelocityKalman:
+    """
+    Kalman filter for one coordinate with state (position, velocity) and a
+    constant-velocity motion model. process_noise is the acceleration
+    variance (px^2/s^4), measurement_noise the landmark jitter variance (px^2).
+    Written out for 2x2 matrices, it is cheap enough to run every frame.
+    """
+
+    def __init__(self, process_noise=5e5, measurement_noise=16.0):
+        self.q = process_noise
+        self.r = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self.speed = 0.0
+        self.t = None
+        self.p = None   # covariance [[p00, p01], [p01, p11]]
+
+    def update(self, x, t):
+        if self.value is None:
+            self.value, self.speed, self.t = x, 0.0, t
+            self.p = [self.r, 0.0, 1e6]
+            return self.value
+        dt = max(t - self.t, 0.0)
+        p00, p01, p11 = self.p
+
+        # Predict
+        pos = self.value + self.speed * dt
+        dt2 = dt * dt
+        p00 = p00 + 2 * dt * p01 + dt2 * p11 + self.q * dt2 * dt2 / 4
+        p01 = p01 + dt * p11 + self.q * dt2 * dt / 2
+        p11 = p11 + self.q * dt2
+
+        # Correct
+        s = p00 + self.r
+        k0, k1 = p00 / s, p01 / s
+        innovation = x - pos
+        self.value = pos + k0 * innovation
+        self.speed = self.speed + k1 * innovation
+        self.p = [(1 - k0) * p00, (1 - k0) * p01, p11 - k1 * p01]
+        self.t = t
+        return self.value
+
+    def predict(self, t):
+        return self.value + self.speed * (t - self.t)
+
+
+# ---------------- Cursor ----------------
+FILTERS = {
+    "one_euro": OneEuroFilter,
+    "kalman": ConstantVelocityKalman,
+}
+
+
+class CursorFilter:
+    """
+    Smooths a 2D cursor and hides pipeline latency.
+
+    update() takes a raw position stamped with the time its camera frame was
+    captured. position() can be called at any rate (every displayed frame,
+    whether or not inference ran) and returns the filtered position
+    extrapolated to the given time, which is normally "now". The lead is the
+    capture + inference latency measured from those timestamps; it is capped
+    at max_lead so a sudden stop does not fling the cursor away.
+    kind=None turns filtering off (position() returns the last raw value).
+    """
+
+    def __init__(self, kind="one_euro", max_lead=0.12, **params):
+        self.kind = kind
+        self.max_lead = max_lead
+        if kind is not None:
+            self.fx = FILTERS[kind](**params)
+            self.fy = FILTERS[kind](**params)
+        self.raw = None
+        self.t = None
+        self.latency = 0.0      # smoothed capture -> use latency, for reporting
+
+    def reset(self):
+        self.raw = None
+        self.t = None
+        if self.kind is not None:
+            self.fx.reset()
+            self.fy.reset()
+
+    def update(self, x, y, t):
+        self.raw = (x, y)
+        self.t = t
+        if self.kind is not None:
+            self.fx.update(float(x), t)
+            self.fy.update(float(y), t)
+
+    def position(self, now=None):
+        """Filtered (x, y) in integer pixels at time now, or None without a cursor."""
+        if self.raw is None:
+            return None
+        if self.kind is None:
+            return self.raw
+        if now is None:
+            now = time.perf_counter()
+        lead = min(max(now - self.t, 0.0), self.max_lead)
+        self.latency += 0.1 * (lead - self.latency)
+        return int(round(self.fx.predict(self.t + lead))), int(round(self.fy.predict(self.t + lead)))
@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+
+
+class FramePool:
+    """
+    Preallocated image buffers for the per-frame work of the main loops.
+
+    get(shape) hands out `size` buffers of that shape round-robin, so a
+    buffer stays valid until `size` more have been taken for the same shape.
+    OpenCV writes into them through dst= and no image is allocated once
+    every shape has been seen. scratch(shape) is for images whose size
+    changes every frame (e.g. hand crops): a contiguous view into one flat
+    buffer that only grows.
+    """
+
+    def __init__(self, size=2, dtype=np.uint8):
+        self.size = size
+        self.dtype = dtype
+        self.allocations = 0    # buffers allocated so far; stays flat in steady state
+        self._rings = {}        # shape -> [next index, buffers]
+        self._scratch = np.empty(0, dtype=dtype)
+
+    def get(self, shape):
+        ring = self._rings.get(shape)
+        if ring is None:
+            ring = self._rings[shape] = [0, [np.empty(shape, self.dtype) for _ in range(self.size)]]
+            self.allocations += self.size
+        i, buffers = ring
+        ring[0] = (i + 1) % self.size
+        return buffers[i]
+
+    def scratch(self, shape):
+        n = int(np.prod(shape))
+        if self._scratch.size < n:
+            self._scratch = np.empty(n, self.dtype)
+            self.allocations += 1
+        return self._scratch[:n].reshape(shape)
+
+
+class FrameRing:
+    """
+    The last `size` frames a cv2.VideoCapture decoded, handed back to it so
+    read(image) decodes into an existing array instead of a new one.
+    """
+
+    def __init__(self, size=2):
+        self.slots = [None] * size
+        self.pos = 0
+
+    def read(self, cap):
+        ret, frame = cap.read(self.slots[self.pos])
+        if ret:
+            self.slots[self.pos] = frame
+            self.pos = (self.pos + 1) % len(self.slots)
+        return ret, frame
+
+
+def mirror_frame(frame, pool):
+    """cv2.flip(frame, 1) into a pooled buffer."""
+    return cv2.flip(frame, 1, dst=pool.get(frame.shape))
+
+
+def bgr_to_rgb(frame, pool):
+    """cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) into a pooled buffer."""
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=pool.get(frame.shape))
@@ -0,0 +1,268 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from capture import LatestFrameCapture, print_capture_stats
+from frame_pool import FramePool, FrameRing
+from hands_model import create_hands
+from inference_scheduler import print_scheduler_stats
+from landmark_log import LandmarkRecorder, ReplaySession, stop_recording
+from metrics import make_timer
+from roi_hands import print_roi_stats
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+# ---------------- Frame Sources ----------------
+# Every source has the cv2.VideoCapture interface the apps already use:
+# read() -> (ret, frame) and release(). Frames come from a small ring of
+# preallocated buffers, so a frame stays valid until the source has been read
+# twice more. read(image) fills the caller's buffer instead when it has the
+# right shape.
+
+def _copy_out(frame, image, pool):
+    if image is None or image.shape != frame.shape:
+        image = pool.get(frame.shape)
+    np.copyto(image, frame)
+    return image
+
+
+class WebcamSource:
+    def __init__(self, index=0):
+        self.cap = cv2.VideoCapture(index)
+        self.ring = FrameRing()
+
+    def read(self, image=None):
+        if image is not None:
+            return self.cap.read(image)
+        return self.ring.read(self.cap)
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource:
+    def __init__(self, path, loop=False):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        self.ring = FrameRing()
+
+    def _read(self, image):
+        if image is not None:
+            return self.cap.read(image)
+        return self.ring.read(self.cap)
+
+    def read(self, image=None):
+        ret, frame = self._read(image)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._read(image)
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirSource:
+    """Plays the images of a directory in name order. Images are decoded up front."""
+
+    def __init__(self, path, loop=False):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+        if not names:
+            raise ValueError("no images in " + path)
+        self.frames = [cv2.imread(os.path.join(path, n)) for n in names]
+        self.loop = loop
+        self.pos = 0
+        self.pool = FramePool()
+
+    def read(self, image=None):
+        if self.pos >= len(self.frames):
+            if not self.loop:
+                return False, None
+            self.pos = 0
+        frame = self.frames[self.pos]
+        self.pos += 1
+        return True, _copy_out(frame, image, self.pool)
+
+    def release(self):
+        pass
+
+
+class SyntheticSource:
+    """
+    Generates frames without a camera: a skin-coloured blob moving over a
+    noisy background. The frames are rendered up front so reading them costs
+    only a copy into a buffer, like a real driver filling a buffer.
+
+    With fps set, read() hands out frames at that rate, like a camera (after
+    a stall it goes on from now instead of catching up); otherwise as fast as
+    they are read. loop=True keeps going after the last frame.
+    """
+
+    def __init__(self, width=640, height=480, frames=300, seed=0, period=60, fps=None, loop=False):
+        rng = np.random.default_rng(seed)
+        background = rng.integers(40, 80, size=(height, width, 3), dtype=np.uint8)
+        self.frames = []
+        for i in range(period):
+            frame = background.copy()
+            t = 2 * np.pi * i / period
+            cx = int(width / 2 + width / 4 * np.cos(t))
+            cy = int(height / 2 + height / 4 * np.sin(t))
+            cv2.ellipse(frame, (cx, cy), (width // 12, height // 8), 0, 0, 360, (120, 160, 220), -1)
+            self.frames.append(frame)
+        self.total = frames
+        self.fps = fps
+        self.loop = loop
+        self.pos = 0
+        self.pool = FramePool()
+        self._start = None      # perf_counter() time frame 0 was due
+
+    def read(self, image=None):
+        if self.total is not None and self.pos >= self.total and not self.loop:
+            return False, None
+        if self.fps:
+            now = time.perf_counter()
+            if self._start is None or now - (self._start + self.pos / self.fps) > 1 / self.fps:
+                self._start = now - self.pos / self.fps
+            delay = self._start + self.pos / self.fps - now
+            if delay > 0:
+                time.sleep(delay)
+        frame = self.frames[self.pos % len(self.frames)]
+        self.pos += 1
+        return True, _copy_out(frame, image, self.pool)
+
+    def release(self):
+        pass
+
+
+def open_source(spec="0", threaded=False, loop=False):
+    """
+    Opens a frame source from a short description:
+      "0", "1", ...                  webcam index
+      "synthetic" / "synthetic:WxH:N:FPS"
+                                     generated frames (default 640x480, 300 frames,
+                                     unpaced; 30 fps when threaded)
+      a directory                    images in name order
+      anything else                  a video file
+    threaded=True reads the source on a background thread (see capture.py).
+    loop=True starts files and synthetic frames over when they run out.
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        source = WebcamSource(int(spec))
+    elif spec.startswith("synthetic"):
+        parts = spec.split(":")
+        width, height, frames, fps = 640, 480, 300, None
+        if len(parts) > 1:
+            width, height = (int(v) for v in parts[1].lower().split("x"))
+        if len(parts) > 2:
+            frames = int(parts[2])
+        if len(parts) > 3:
+            fps = float(parts[3])
+        elif threaded:
+            # Unpaced, the grabber thread would drain the frames in a busy loop
+            fps = 30.0
+        source = SyntheticSource(width, height, frames, fps=fps, loop=loop)
+    elif os.path.isdir(spec):
+        source = ImageDirSource(spec, loop=loop)
+    else:
+        source = VideoFileSource(spec, loop=loop)
+
+    if threaded:
+        if isinstance(source, WebcamSource):
+            # Keep the driver queue short too, otherwise old frames still pile up there.
+            source.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return LatestFrameCapture(source)
+    return source
+
+
+# ---------------- Frame Sinks ----------------
+
+class WindowSink:
+    """Shows frames with OpenCV windows, like the apps always did."""
+
+    def open_window(self, name, fullscreen=False):
+        cv2.namedWindow(name, cv2.WINDOW_NORMAL)
+        if fullscreen:
+            cv2.setWindowProperty(name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+
+    def show(self, name, img):
+        cv2.imshow(name, img)
+
+    def poll_key(self):
+        return cv2.waitKey(1) & 0xFF
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+
+class HeadlessSink:
+    """Drops every frame. For build boxes without a display."""
+
+    def __init__(self):
+        self.frames_shown = 0
+
+    def open_window(self, name, fullscreen=False):
+        pass
+
+    def show(self, name, img):
+        self.frames_shown += 1
+
+    def poll_key(self):
+        return -1
+
+    def close(self):
+        pass
+
+
+# ---------------- Running an App ----------------
+
+def run_app(app, name, run=None):
+    """
+    What each app's main() does: opens the source and the model from the
+    app module's settings, runs run(cap, sink, timer) (app.run by default)
+    in windows, and prints the stats and releases everything however it
+    ends. The settings every app has:
+      source_spec          camera index, video file, image directory or
+                           "synthetic" (see open_source)
+      threaded_capture     read the camera on a background thread, so
+                           capture overlaps with inference (see capture.py)
+      profiling            per-stage profiling (see metrics.py): rolling
+      profile_hud          histograms, an on-screen HUD and, if profile_dir
+      profile_dir          is set, <name>.jsonl and <name>.prom files
+                           updated every second
+      record_path          record the landmarks of the session to this file
+      replay_path          replay a recording instead of the camera and the
+      replay_realtime      model, as fast as possible or in real time (see
+                           landmark_log.py)
+    The model is app.hands if set (e.g. by launcher.py), otherwise built
+    from hand_backend, roi_inference, mirrored_frames and max_hands (or
+    players). A replay stands in for the model and turns off app.scheduler.
+    """
+    if app.replay_path:
+        cap = ReplaySession(app.replay_path, realtime=app.replay_realtime)
+        app.hands, app.scheduler = cap.hands, None
+    else:
+        cap = open_source(app.source_spec, threaded=app.threaded_capture)
+        if app.hands is None:
+            app.hands = create_hands(max_num_hands=getattr(app, "max_hands", getattr(app, "players", 1)),
+                                     roi=app.roi_inference, backend=app.hand_backend,
+                                     mirrored=app.mirrored_frames)
+        if app.record_path:
+            app.hands = LandmarkRecorder(app.hands, app.record_path)
+    sink = WindowSink()
+    timer = make_timer(name, app.profiling, app.profile_hud, app.profile_dir)
+    try:
+        return (run or app.run)(cap, sink, timer)
+    finally:
+        app.hands = stop_recording(app.hands)
+        print_capture_stats(cap)
+        print_roi_stats(app.hands)
+        print_scheduler_stats(app.scheduler)
+        cap.release()
+        sink.close()
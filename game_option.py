@@ -1,224 +1,264 @@
+import sys
+
 import cv2
-import numpy as np
-import mediapipe as mp
-import time
-import random
+
+from capture import frame_timestamp, mark_shown
+from cursor_filter import CursorFilter
+from frame_source import run_app
+from inference_scheduler import InferenceScheduler, track_hand
+from landmarks import draw_hand, HandArray
+from gestures import GestureEngine, START, END
+from layer_cache import LayerCache
+from widgets import Widget, WidgetLayer, grid_cells
+from ttt_ui import draw_x_box, draw_o_box, draw_cell, render_board
+from ttt_engine import Board, Solver
+from frame_pool import FramePool, mirror_frame
+from stage_timer import null_timer
 
 # Mediapipe hands setup
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
-mp_draw = mp.solutions.drawing_utils
+# Built in main() (or handed in by launcher.py), see hands_model.py
+hands = None
+# Hand detector: "mediapipe", or "classic" for slow machines (see classic_hands.py)
+hand_backend = "mediapipe"
+# The model sees the mirrored camera frame (the classic backend needs to know)
+mirrored_frames = True
+# Run the model on a crop around the last known hand instead of the full frame
+roi_inference = True
+# Skip inference while the hand holds still (see inference_scheduler.py)
+adaptive_inference = True
+scheduler = InferenceScheduler(min_rate=5.0) if adaptive_inference else None
+# Cursor smoothing and latency compensation: "one_euro", "kalman" or None (raw)
+cursor_filter_kind = "one_euro"
+cursor = CursorFilter(cursor_filter_kind)
+# Debounced gestures (see gestures.py): the cursor only moves while pointing, and
+# hovering is holding the point over one widget (rearmed when the cursor moves on)
+gestures = GestureEngine()
 
 # Tic Tac Toe board initialization
-board = [['' for _ in range(3)] for _ in range(3)]
-cell_size = 150  # size of each square
+board_n = 3        # board is board_n x board_n ...
+win_k = 3          # ... and needs win_k in a row
+difficulty = "medium"   # "easy" (random), "medium" or "hard" (perfect play), see ttt_engine.py
+board = Board(board_n, win_k)
+solver = Solver(board_n, win_k)
+board_size = 450
+cell_size = board_size // board_n  # size of each square
 offset = 50      # margin from window edges
 
 # Window size
-width, height = 3 * cell_size + 2 * offset, 3 * cell_size + 2 * offset
+width, height = board_size + 2 * offset, board_size + 2 * offset
+
+# Pre-rendered selection screen and board, see draw_selection_screen/draw_board
+layers = LayerCache(width, height)
+
+# Selection boxes (x, y, w, h)
+x_box = (width // 4 - 75, height // 2 - 75, 150, 150)
+o_box = (3 * width // 4 - 75, height // 2 - 75, 150, 150)
 
-# Hover timing thresholds
+# How long the point must be held over a box or cell to pick it
 hover_threshold_select = 1.5
 hover_threshold_move = 1.0
 
+# Camera index, video file, image directory or "synthetic", threaded capture,
+# profiling and landmark recording / replay: see run_app() in frame_source.py
+source_spec = "0"
+threaded_capture = True
+profiling = False
+profile_hud = True
+profile_dir = None
+record_path = None
+replay_path = None
+replay_realtime = False
+
 # Game variables
 user_symbol = None
 computer_symbol = None
 user_turn = True
 move_made = False
 selected_cell = None
-hover_start_time = None
 selection_made = False
+hover_pos = None
+selection_hover_pos = None
 
-def draw_selection_screen(img, hover_pos):
-    img[:] = (255, 255, 255)
-    # Draw X box
-    x_box = (width // 4 - 75, height // 2 - 75, 150, 150)
-    cv2.rectangle(img, (x_box[0], x_box[1]), (x_box[0] + x_box[2], x_box[1] + x_box[3]), (0,0,255), 3)
-    cv2.line(img, (x_box[0] + 20, x_box[1] + 20), (x_box[0] + 130, x_box[1] + 130), (0,0,255), 7)
-    cv2.line(img, (x_box[0] + 20, x_box[1] + 130), (x_box[0] + 130, x_box[1] + 20), (0,0,255), 7)
+# Landmarks of the tracked hand, refilled every frame
+hand = HandArray()
+# Buffers for the mirrored frame and its RGB copy, reused every frame
+frame_pool = FramePool()
 
-    # Draw O box
-    o_box = (3 * width // 4 - 75, height // 2 - 75, 150, 150)
-    cv2.rectangle(img, (o_box[0], o_box[1]), (o_box[0] + o_box[2], o_box[1] + o_box[3]), (255,0,0), 3)
-    cv2.circle(img, (o_box[0] + 75, o_box[1] + 75), 60, (255,0,0), 7)
+# Laid out once; drawing and hit-testing both use these (see widgets.py)
+selection_ui = WidgetLayer(width, height, [Widget("X", x_box, draw_x_box, 'X'),
+                                           Widget("O", o_box, draw_o_box, 'O')])
+board_ui = WidgetLayer(width, height, grid_cells(offset, offset, board_n, cell_size, draw_cell))
+
+def render_selection_layer(img):
+    img[:] = (255, 255, 255)
+    # Draw X and O boxes
+    selection_ui.draw(img)
 
     # Instructions
     cv2.putText(img, "Choose your symbol by hovering", (width//6, height//4), cv2.FONT_HERSHEY_SIMPLEX, 1, (50,50,50), 2)
     #cv2.putText(img, "Hover over X or O for 1.5 seconds", (width//6, height//4 + 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (50,50,50), 1)
 
-    # Draw hover circle if over selection
-    if hover_pos:
-        x, y = hover_pos
-        # Check if inside X box
-        if x_box[0] < x < x_box[0] + x_box[2] and x_box[1] < y < x_box[1] + x_box[3]:
-            cv2.circle(img, (x, y), 25, (0,0,255), 3)
-        elif o_box[0] < x < o_box[0] + o_box[2] and o_box[1] < y < o_box[1] + o_box[3]:
-            cv2.circle(img, (x, y), 25, (255,0,0), 3)
+def draw_selection_screen(img, hover_pos, box=None):
+    # Static part comes from the cached layer, only the hover look and circle are drawn per frame
+    layers.compose("selection", None, render_selection_layer, dst=img)
 
-def draw_board(img):
-    img[:] = (255, 255, 255)
+    # Draw hover circle if over selection (box: the widget under hover_pos)
+    if hover_pos and box is not None:
+        selection_ui.draw_hover(img, box)
+        cv2.circle(img, hover_pos, 25, (0,0,255) if box.value == 'X' else (255,0,0), 3)
+
+def render_board_layer(img, winner=None):
+    render_board(img, board, offset, cell_size)
+    if winner:
+        cv2.putText(img, winner, (offset, height - 30), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0,0,255), 3)
 
-    # Draw grid lines
-    for i in range(4):
-        # Vertical lines
-        cv2.line(img, (offset + i * cell_size, offset), (offset + i * cell_size, offset + 3 * cell_size), (0,0,0), 3)
-        # Horizontal lines
-        cv2.line(img, (offset, offset + i * cell_size), (offset + 3 * cell_size, offset + i * cell_size), (0,0,0), 3)
-
-    # Draw existing X and O
-    for r in range(3):
-        for c in range(3):
-            center = (offset + c * cell_size + cell_size//2, offset + r * cell_size + cell_size//2)
-            if board[r][c] == 'X':
-                cv2.line(img, (center[0]-40, center[1]-40), (center[0]+40, center[1]+40), (0,0,255), 5)
-                cv2.line(img, (center[0]-40, center[1]+40), (center[0]+40, center[1]-40), (0,0,255), 5)
-            elif board[r][c] == 'O':
-                cv2.circle(img, center, 50, (255,0,0), 5)
+def draw_board(img, winner=None):
+    # Rebuilt only when a move is made or the game ends
+    key = (board.key(), winner)
+    layers.compose("board", key, lambda layer: render_board_layer(layer, winner), dst=img)
 
 def get_cell_from_pos(x, y):
-    if offset < x < offset + 3*cell_size and offset < y < offset + 3*cell_size:
-        col = (x - offset) // cell_size
-        row = (y - offset) // cell_size
-        return int(row), int(col)
-    return None
+    cell = board_ui.hit(x, y)
+    return cell.value if cell is not None else None
 
 def computer_move():
-    empty_cells = [(r, c) for r in range(3) for c in range(3) if board[r][c] == '']
-    if empty_cells:
-        r, c = random.choice(empty_cells)
-        board[r][c] = computer_symbol
+    move = solver.choose_move(board, computer_symbol, difficulty)
+    if move:
+        board.place(move[0], move[1], computer_symbol)
 
 def check_winner(sym):
-    lines = board + [list(col) for col in zip(*board)] + [[board[i][i] for i in range(3)]] + [[board[i][2-i] for i in range(3)]]
-    return any(all(cell == sym for cell in line) for line in lines)
+    return board.is_win(sym)
+
+def run(cap, sink, timer=null_timer, max_frames=None, switch_keys=()):
+    """
+    Main loop. Returns the key that ended it (quit, or one of switch_keys
+    when hosted by launcher.py), or None when the source ran out.
+    """
+    global user_symbol, computer_symbol, user_turn, move_made
+    global selected_cell, selection_made, hover_pos
+
+    frames = 0
+    while max_frames is None or frames < max_frames:
+        timer.start_frame()
+        ret, frame = cap.read()
+        frame_time = frame_timestamp(cap)
+        timer.lap("capture")
+        if not ret:
+            break
+        frames += 1
+        frame = mirror_frame(frame, frame_pool)
+        canvas = layers.frame
+
+        cursor_pos = None
+        fist_closed = False
+
+        found = track_hand(hands, frame, hand, scheduler, timer, frame_pool)
+        for event in gestures.update(hand if found else None, frame_time):
+            if event.gesture == "point" and event.kind in (START, END):
+                # A point starts (or stops) the cursor afresh and drops the hover
+                cursor.reset()
+                hover_pos = None
+                selected_cell = None
+        if found:
+            # Finger detection: index finger up and others down
+            if gestures.active == "point":
+                h, w, _ = frame.shape
+                cursor.update(*hand.pixel(8, w, h), frame_time)
+                cursor_pos = cursor.position()
+            else:
+                fist_closed = True
+            timer.lap("logic")
 
-# Start capturing video
-cap = cv2.VideoCapture(0)
+            draw_hand(frame, hand)
+            timer.lap("landmarks")
+        else:
+            cursor.reset()
 
-hover_start_time = None
-hover_pos = None
-selection_hover_pos = None
+        # Scale cursor position to canvas coordinates
+        if cursor_pos:
+            fx = int(cursor_pos[0] * width / frame.shape[1])
+            fy = int(cursor_pos[1] * height / frame.shape[0])
+        else:
+            fx, fy = None, None
+
+        if not selection_made:
+            # One lookup in the label map, used for drawing and selecting
+            box = selection_ui.hit(fx, fy) if fx and fy else None
+            timer.lap("logic")
+            # Draw selection screen
+            draw_selection_screen(canvas, (fx, fy) if fx and fy else None, box)
+            timer.lap("render")
+
+            # Check if cursor is over X or O
+            if fx and fy:
+                if box is not None:
+                    if hover_pos != box.value:
+                        # The dwell on a box is the point held since the cursor got there
+                        gestures.rearm(frame_time)
+                        hover_pos = box.value
+                    elif gestures.held_for(frame_time) > hover_threshold_select:
+                        user_symbol = box.value
+                        computer_symbol = 'O' if box.value == 'X' else 'X'
+                        selection_made = True
+                else:
+                    hover_pos = None
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-    frame = cv2.flip(frame, 1)
-    canvas = np.ones((height, width, 3), dtype=np.uint8) * 255
-
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = hands.process(rgb)
-
-    cursor_pos = None
-    fist_closed = False
-
-    if result.multi_hand_landmarks:
-        hand_landmarks = result.multi_hand_landmarks[0]
-
-        # Finger detection: index finger up and others down
-        fingers = []
-        tips = [4, 8, 12, 16, 20]
-        for i, tip in enumerate(tips):
-            tip_y = hand_landmarks.landmark[tip].y
-            dip_y = hand_landmarks.landmark[tip - 2].y
-            fingers.append(tip_y < dip_y)
-        if fingers[1] and not any(fingers[2:]):
-            h, w, _ = frame.shape
-            x = int(hand_landmarks.landmark[8].x * w)
-            y = int(hand_landmarks.landmark[8].y * h)
-            cursor_pos = (x, y)
         else:
-            fist_closed = True
-
-        mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-
-    # Scale cursor position to canvas coordinates
-    if cursor_pos:
-        fx = int(cursor_pos[0] * width / frame.shape[1])
-        fy = int(cursor_pos[1] * height / frame.shape[0])
-    else:
-        fx, fy = None, None
-
-    if not selection_made:
-        # Draw selection screen
-        draw_selection_screen(canvas, (fx, fy) if fx and fy else None)
-
-        # Check if cursor is over X or O
-        x_box = (width // 4 - 75, height // 2 - 75, 150, 150)
-        o_box = (3 * width // 4 - 75, height // 2 - 75, 150, 150)
-
-        if fx and fy:
-            if x_box[0] < fx < x_box[0] + x_box[2] and x_box[1] < fy < x_box[1] + x_box[3]:
-                if hover_pos != 'X':
-                    hover_start_time = time.time()
-                    hover_pos = 'X'
-                elif time.time() - hover_start_time > hover_threshold_select:
-                    user_symbol = 'X'
-                    computer_symbol = 'O'
-                    selection_made = True
-            elif o_box[0] < fx < o_box[0] + o_box[2] and o_box[1] < fy < o_box[1] + o_box[3]:
-                if hover_pos != 'O':
-                    hover_start_time = time.time()
-                    hover_pos = 'O'
-                elif time.time() - hover_start_time > hover_threshold_select:
-                    user_symbol = 'O'
-                    computer_symbol = 'X'
-                    selection_made = True
-            else:
-                hover_pos = None
-                hover_start_time = None
-
-    else:
-        draw_board(canvas)
-        # Show green cursor circle if finger detected and no fist
-        if fx and fy and not fist_closed:
-            cv2.circle(canvas, (fx, fy), 15, (0, 255, 0), -1)
-
-        cell = get_cell_from_pos(fx, fy) if fx and fy else None
-       # global selected_cell
-       # global hover_start_time
-
-        if cell and not fist_closed and user_turn:
-            if selected_cell != cell:
-                selected_cell = cell
-                hover_start_time = time.time()
-            else:
-                if time.time() - hover_start_time > hover_threshold_move and board[cell[0]][cell[1]] == '':
-                    board[cell[0]][cell[1]] = user_symbol
+            cell_widget = board_ui.hit(fx, fy) if fx and fy else None
+            cell = cell_widget.value if cell_widget is not None else None
+
+            if cell and not fist_closed and user_turn:
+                if selected_cell != cell:
+                    gestures.rearm(frame_time)
+                    selected_cell = cell
+                elif gestures.held_for(frame_time) > hover_threshold_move and board.is_empty(*cell):
+                    board.place(cell[0], cell[1], user_symbol)
                     user_turn = False
                     move_made = True
                     selected_cell = None
-                    hover_start_time = None
-        else:
-            selected_cell = None
-            hover_start_time = None
-
-        if move_made:
-            if not check_winner(user_symbol):
-                computer_move()
-            user_turn = True
-            move_made = False
-
-        winner = None
-        if check_winner(user_symbol):
-            winner = 'You Win!'
-        elif check_winner(computer_symbol):
-            winner = 'Computer Wins!'
-        elif all(all(cell != '' for cell in row) for row in board):
-            winner = 'Draw!'
-
-        if winner:
-            cv2.putText(canvas, winner, (offset, height - 30), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0,0,255), 3)
-
-    cv2.imshow('Tic Tac Toe', canvas)
-    cv2.imshow('Webcam', frame)
-
-    key = cv2.waitKey(1)
-    if key == 27 or key == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
-
-
+            else:
+                selected_cell = None
+
+            if move_made:
+                if not check_winner(user_symbol):
+                    computer_move()
+                user_turn = True
+                move_made = False
+
+            winner = None
+            if check_winner(user_symbol):
+                winner = 'You Win!'
+            elif check_winner(computer_symbol):
+                winner = 'Computer Wins!'
+            elif board.is_full():
+                winner = 'Draw!'
+
+            timer.lap("logic")
+
+            draw_board(canvas, winner)
+            # Frame the free cell the finger is on
+            if cell and not winner and board.is_empty(*cell):
+                board_ui.draw_hover(canvas, cell_widget)
+            # Show green cursor circle if finger detected and no fist
+            if fx and fy and not fist_closed:
+                cv2.circle(canvas, (fx, fy), 15, (0, 255, 0), -1)
+            timer.lap("render")
+
+        timer.lap("logic")
+        timer.overlay(frame)
+        timer.lap("render")
+        sink.show('Tic Tac Toe', canvas)
+        sink.show('Webcam', frame)
+        mark_shown(cap)
+
+        key = sink.poll_key()
+        timer.lap("display")
+        timer.end_frame()
+        if key == 27 or key == ord('q') or key in switch_keys:
+            return key
+
+def main():
+    run_app(sys.modules[__name__], "game_option")
+
+if __name__ == "__main__":
+    main()
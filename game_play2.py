@@ -1,250 +1,473 @@
+import sys
+
 import cv2
-import numpy as np
-import mediapipe as mp
-import time
-import random
 
-# ---------------- Mediapipe Setup ----------------
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
-mp_draw = mp.solutions.drawing_utils
+from capture import frame_timestamp, mark_shown
+from cursor_filter import CursorFilter
+from frame_source import run_app
+from inference_scheduler import InferenceScheduler
+from hand_tracks import HandBatch, HandTracker, track_hands
+from gestures import GestureBatch
+from layer_cache import LayerCache
+from widgets import Widget, WidgetLayer, grid_cells
+from ttt_ui import draw_x_box, draw_o_box, draw_cell, render_board
+from frame_pool import FramePool
+from ttt_engine import Board, Solver
+from stage_timer import null_timer
+from landmark_log import ReplaySession
+from async_runtime import AsyncRuntime, print_runtime_stats
 
-# ---------------- Game Initialization ----------------
-def init_game():
-    global board, user_symbol, computer_symbol, user_turn, move_made
-    global selected_cell, selection_made, winner
-    global restart_hover_start
-    board = [['' for _ in range(3)] for _ in range(3)]
-    user_symbol = None
-    computer_symbol = None
-    user_turn = True
-    move_made = False
-    selected_cell = None
-    selection_made = False
-    winner = None
-    restart_hover_start = None
-
-cell_size = 150
+# ---------------- Mediapipe Setup ----------------
+# 1 plays against the computer; 2 lets two people play each other in front of
+# one camera, one hand each, told apart from frame to frame (see hand_tracks.py)
+players = 1
+# Built in main() (or handed in by launcher.py), see hands_model.py
+hands = None
+# Hand detector: "mediapipe", or "classic" for slow machines (see classic_hands.py)
+hand_backend = "mediapipe"
+# The model sees the camera frame as it comes: the landmarks are mirrored
+# afterwards (the classic backend needs to know)
+mirrored_frames = False
+# Run the model on a crop around the last known hand instead of the full frame
+roi_inference = True
+# Skip inference while the hand holds still (see inference_scheduler.py; one hand only)
+adaptive_inference = True
+scheduler = InferenceScheduler(min_rate=5.0) if adaptive_inference and players == 1 else None
+# Cursor smoothing and latency compensation: "one_euro", "kalman" or None (raw)
+cursor_filter_kind = "one_euro"
+cursors = [CursorFilter(cursor_filter_kind) for _ in range(players)]
+
+# ---------------- Game Settings ----------------
+board_n = 3        # board is board_n x board_n ...
+win_k = 3          # ... and needs win_k in a row (e.g. 4 and 4, or 5 and 4)
+difficulty = "medium"   # "easy" (random), "medium" or "hard" (perfect play), see ttt_engine.py
+solver = Solver(board_n, win_k)
+
+board_size = 450
+cell_size = board_size // board_n
 offset = 50
-width, height = 5 * cell_size + 2 * offset, 3 * cell_size + 2 * offset
+width, height = board_size + 300 + 2 * offset, board_size + 2 * offset
 window_name = "Tic Tac Toe"
 
-cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-cv2.setWindowProperty(window_name, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-
 # (Kept in case you want to bring back time-based selection visuals)
 hover_threshold_restart = 1.5
 
-init_game()
-
-# ---------------- Gesture Detection ----------------
-def is_fist(hand_landmarks, image_w, image_h):
-    """
-    Detects a fist by checking if at least 3 of the 4 fingers (index, middle, ring, pinky)
-    have their TIP below their PIP (folded). Thumb is ignored for robustness.
-    """
-    folded = 0
-
-    # Index, Middle, Ring, Pinky
-    finger_tips = [8, 12, 16, 20]
-    finger_pips = [6, 10, 14, 18]
-
-    for tip, pip in zip(finger_tips, finger_pips):
-        tip_y = hand_landmarks.landmark[tip].y * image_h
-        pip_y = hand_landmarks.landmark[pip].y * image_h
-        if tip_y > pip_y:  # folded (lower on image)
-            folded += 1
-
-    return folded >= 3
+# Cursor color of each player, and the endgame texts (padded to sit centred
+# under the board) for the first and the second player winning
+player_colors = ((0, 255, 0), (0, 140, 255))
+win_texts = {
+    1: ('                             You Win!', '                          Computer Wins!'),
+    2: ('                          Player 1 Wins!', '                          Player 2 Wins!'),
+}
+
+# Redraw at this rate with inference running in the background (see
+# async_runtime.py); None draws once per camera frame with run()
+render_fps = 60
+# Camera index, video file, image directory or "synthetic", threaded capture,
+# profiling and landmark recording / replay: see run_app() in frame_source.py
+source_spec = "0"
+threaded_capture = True
+profiling = False
+profile_hud = True
+profile_dir = None
+record_path = None
+replay_path = None
+replay_realtime = False
+
+# Landmarks of all hands in one array, refilled every frame, and each player's hand in it
+batch = HandBatch(players)
+tracker = HandTracker(players)
+# Buffers for the RGB copy of each frame. The camera frame itself is never
+# shown here, so it is not flipped: the landmarks are mirrored instead.
+frame_pool = FramePool()
 
 # ---------------- Drawing Functions ----------------
-def draw_selection_screen(img, hover_pos):
+# The static parts of both screens are rendered once into cached layers and
+# rebuilt only when the board or the result changes (or the game is reset).
+# Every frame copies the cached layer into the canvas and draws just the
+# cursor and hover highlights on top.
+
+# Define consistent box positions
+x_box = (width // 3 - 75, height // 2 - 75, 150, 150)
+o_box = (2 * width // 3 - 75, height // 2 - 75, 150, 150)
+restart_box = (width//3 + 250, height - 110, 300, 70)
+
+def draw_restart_button(button, img, rect, hover, scale):
+    x, y, w, h = rect
+    if hover:
+        cv2.rectangle(img, (x, y), (x + w, y + h), (210,255,210), -1)
+    cv2.rectangle(img, (x, y), (x + w, y + h), (0,200,0), int(round(3 * scale)))
+    cv2.putText(img, "Play Again", (x + w // 5, y + h * 9 // 14),
+                cv2.FONT_HERSHEY_SIMPLEX, scale, (0,200,0), int(round(2 * scale)))
+
+# Laid out once; drawing and hit-testing both use these (see widgets.py)
+selection_ui = WidgetLayer(width, height, [Widget("X", x_box, draw_x_box, 'X'),
+                                           Widget("O", o_box, draw_o_box, 'O')])
+board_ui = WidgetLayer(width, height, grid_cells(offset, offset, board_n, cell_size, draw_cell))
+restart_ui = WidgetLayer(width, height, [Widget("Play Again", restart_box, draw_restart_button)])
+
+def render_selection_layer(img):
     img[:] = (255, 255, 255)
 
-    # Define consistent box positions
-    x_box = (width // 3 - 75, height // 2 - 75, 150, 150)
-    o_box = (2 * width // 3 - 75, height // 2 - 75, 150, 150)
-
-    # Draw X box
-    cv2.rectangle(img, (x_box[0], x_box[1]),
-                  (x_box[0] + x_box[2], x_box[1] + x_box[3]), (0,0,255), 3)
-    cv2.line(img, (x_box[0] + 20, x_box[1] + 20),
-             (x_box[0] + 130, x_box[1] + 130), (0,0,255), 7)
-    cv2.line(img, (x_box[0] + 20, x_box[1] + 130),
-             (x_box[0] + 130, x_box[1] + 20), (0,0,255), 7)
-
-    # Draw O box
-    cv2.rectangle(img, (o_box[0], o_box[1]),
-                  (o_box[0] + o_box[2], o_box[1] + o_box[3]), (255,0,0), 3)
-    cv2.circle(img, (o_box[0] + 75, o_box[1] + 75), 60, (255,0,0), 7)
+    # X and O boxes
+    selection_ui.draw(img)
 
     cv2.putText(img, "Choose! (make a FIST to confirm)",
                 (width//6, height//4), cv2.FONT_HERSHEY_SIMPLEX, 1, (50,50,50), 2)
 
-    # Hover highlight
-    if hover_pos:
-        x, y = hover_pos
-        if x_box[0] < x < x_box[0] + x_box[2] and x_box[1] < y < x_box[1] + x_box[3]:
-            cv2.circle(img, (x, y), 25, (0,0,255), 3)
-        elif o_box[0] < x < o_box[0] + o_box[2] and o_box[1] < y < o_box[1] + o_box[3]:
-            cv2.circle(img, (x, y), 25, (255,0,0), 3)
-
-    return x_box, o_box
-
-def draw_board(img):
-    img[:] = (255, 255, 255)
-    for i in range(4):
-        cv2.line(img, (offset + i * cell_size, offset),
-                 (offset + i * cell_size, offset + 3 * cell_size), (0,0,0), 3)
-        cv2.line(img, (offset, offset + i * cell_size),
-                 (offset + 3 * cell_size, offset + i * cell_size), (0,0,0), 3)
-
-    for r in range(3):
-        for c in range(3):
-            center = (offset + c * cell_size + cell_size//2,
-                      offset + r * cell_size + cell_size//2)
-            if board[r][c] == 'X':
-                cv2.line(img, (center[0]-40, center[1]-40),
-                         (center[0]+40, center[1]+40), (0,0,255), 5)
-                cv2.line(img, (center[0]-40, center[1]+40),
-                         (center[0]+40, center[1]-40), (0,0,255), 5)
-            elif board[r][c] == 'O':
-                cv2.circle(img, center, 50, (255,0,0), 5)
-
 # ---------------- Game Logic ----------------
 def get_cell_from_pos(x, y):
-    if x is None or y is None:
-        return None
-    if offset < x < offset + 3*cell_size and offset < y < offset + 3*cell_size:
-        col = (x - offset) // cell_size
-        row = (y - offset) // cell_size
-        return int(row), int(col)
-    return None
-
-def computer_move():
-    empty_cells = [(r, c) for r in range(3) for c in range(3) if board[r][c] == '']
-    if empty_cells:
-        r, c = random.choice(empty_cells)
-        board[r][c] = computer_symbol
-
-def check_winner(sym):
-    lines = board + [list(col) for col in zip(*board)] \
-            + [[board[i][i] for i in range(3)]] \
-            + [[board[i][2-i] for i in range(3)]]
-    return any(all(cell == sym for cell in line) for line in lines)
+    cell = board_ui.hit(x, y)
+    return cell.value if cell is not None else None
 
-# ---------------- Main Loop ----------------
-cap = cv2.VideoCapture(0)
+def to_canvas(cursor_pos, frame_w, frame_h):
+    """Maps a cursor in camera pixels to canvas pixels, (None, None) without a cursor."""
+    if not cursor_pos:
+        return None, None
+    return int(cursor_pos[0] * width / frame_w), int(cursor_pos[1] * height / frame_h)
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-    frame = cv2.flip(frame, 1)
-    canvas = np.ones((height, width, 3), dtype=np.uint8) * 255
-
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = hands.process(rgb)
-
-    cursor_pos = None
-    gesture_confirmed = False
+# ---------------- Game Session ----------------
+class GameSession:
+    """
+    One game: the state init_game() used to keep in module globals, plus its
+    own cached layers (and so its own canvas) and the players' gestures.
+    With players=1 the user plays the computer, with players=2 two people
+    play each other, X first. difficulty overrides the module setting for
+    this session. The script plays the module-level `game`; kiosk_server.py
+    runs one session per station.
+    """
 
-    if result.multi_hand_landmarks:
-        hand_landmarks = result.multi_hand_landmarks[0]
-        h, w, _ = frame.shape
-        # Cursor = average of all landmarks
-        x = int(np.mean([lm.x for lm in hand_landmarks.landmark]) * w)
-        y = int(np.mean([lm.y for lm in hand_landmarks.landmark]) * h)
-        cursor_pos = (x, y)
-        gesture_confirmed = is_fist(hand_landmarks, w, h)
-        mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-
-    # Map cursor to canvas coordinates
-    if cursor_pos:
-        fx = int(cursor_pos[0] * width / frame.shape[1])
-        fy = int(cursor_pos[1] * height / frame.shape[0])
-    else:
-        fx, fy = None, None
-
-    # Debug text for fist detection
-    if gesture_confirmed:
-        cv2.putText(canvas, "FIST DETECTED", (50, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 200, 0), 3)
-
-    # -------------- Symbol Selection Phase --------------
-    if not selection_made:
-        x_box, o_box = draw_selection_screen(canvas, (fx, fy) if fx and fy else None)
-
-        if fx is not None and fy is not None:
-            # Draw cursor
-            cv2.circle(canvas, (fx, fy), 15, (0, 255, 0), -1)
-
-            # Confirm selection with fist
-            if x_box[0] < fx < x_box[0] + x_box[2] and x_box[1] < fy < x_box[1] + x_box[3]:
-                if gesture_confirmed:
-                    user_symbol = 'X'
-                    computer_symbol = 'O'
-                    selection_made = True
-            elif o_box[0] < fx < o_box[0] + o_box[2] and o_box[1] < fy < o_box[1] + o_box[3]:
-                if gesture_confirmed:
-                    user_symbol = 'O'
-                    computer_symbol = 'X'
-                    selection_made = True
-
-    # -------------- Game Phase --------------
-    else:
-        draw_board(canvas)
-
-        # Draw cursor
-        if fx is not None and fy is not None:
-            cv2.circle(canvas, (fx, fy), 15, (0, 255, 0), -1)
-
-        if not winner:
-            cell = get_cell_from_pos(fx, fy)
-
-            # Place move only on fist
-            if cell and user_turn and gesture_confirmed and board[cell[0]][cell[1]] == '':
-                board[cell[0]][cell[1]] = user_symbol
-                user_turn = False
-                move_made = True
-
-            if move_made:
-                if not check_winner(user_symbol):
-                    computer_move()
-                user_turn = True
-                move_made = False
-
-            if check_winner(user_symbol):
-                winner = '                             You Win!'
-            elif check_winner(computer_symbol):
-                winner = '                          Computer Wins!'
-            elif all(all(cell != '' for cell in row) for row in board):
-                winner = '                                Draw!'
-
-        # ----------- Endgame Screen with Restart -----------
-        if winner:
-            cv2.putText(canvas, winner, (offset, height - 140),
+    def __init__(self, players=1, difficulty=None):
+        self.players = players
+        self.difficulty = difficulty
+        self.layers = LayerCache(width, height)
+        # A fist confirms when it is made, not on every frame it is held
+        # (see gestures.py); kept across reset() so a held fist cannot restart
+        # the game and pick a symbol in one go
+        self.gestures = GestureBatch(players)
+        self.reset()
+
+    def reset(self):
+        self.board = Board(board_n, win_k)
+        self.symbols = [None, None]     # the user's (player 1's), then the computer's (player 2's)
+        self.to_move = 'X'              # two players: the symbol whose move it is
+        self.user_turn = True
+        self.move_made = False
+        self.selected_cell = None
+        self.selection_made = False
+        self.winner = None
+        self.restart_hover_start = None
+        self.layers.invalidate()
+
+    @property
+    def user_symbol(self):
+        return self.symbols[0]
+
+    @property
+    def computer_symbol(self):
+        return self.symbols[1]
+
+    def can_move(self, player):
+        """Whether player may place a symbol now (the user always: the computer answers at once)."""
+        return self.players == 1 or self.symbols[player] == self.to_move
+
+    # -------- Gestures --------
+    def fist(self, hand, t, player=0):
+        """
+        Feeds one inference of player's hand (a HandArray, None without a
+        hand) taken at time t to their gesture engine. Returns (fist just
+        made, fist held).
+        """
+        gestures = self.gestures[player]
+        gestures.update(hand, t)
+        return gestures.started("fist"), gestures.active == "fist"
+
+    def fists(self, batch, index, t):
+        """
+        fist() for all players at once: index[player] is the row of their
+        hand in the HandBatch batch (-1 without one). The hands are
+        classified together (see gestures.GestureBatch).
+        """
+        self.gestures.update(batch, index, t)
+        return [(g.started("fist"), g.active == "fist") for g in self.gestures]
+
+    # -------- Drawing --------
+    def draw_selection_screen(self, img, hover_positions):
+        self.layers.compose("selection", None, render_selection_layer, dst=img)
+
+        # Hover highlight of every cursor over the screen (None for a player without one)
+        for hover_pos in hover_positions:
+            box = selection_ui.hit(*hover_pos) if hover_pos else None
+            if box is not None:
+                selection_ui.draw_hover(img, box)
+                cv2.circle(img, hover_pos, 25, (0,0,255) if box.value == 'X' else (255,0,0), 3)
+
+    def render_board_layer(self, img):
+        render_board(img, self.board, offset, cell_size)
+
+        # Endgame screen with restart
+        if self.winner:
+            cv2.putText(img, self.winner, (offset, height - 140),
                         cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0,0,255), 3)
-
-            restart_box = (width//3 + 250, height - 110, 300, 70)
-            cv2.rectangle(canvas, (restart_box[0], restart_box[1]),
-                          (restart_box[0] + restart_box[2], restart_box[1] + restart_box[3]), (0,200,0), 3)
-            cv2.putText(canvas, "Play Again", (restart_box[0] + 60, restart_box[1] + 45),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0,200,0), 2)
-
-            if fx is not None and fy is not None:
-                if restart_box[0] < fx < restart_box[0] + restart_box[2] and restart_box[1] < fy < restart_box[1] + restart_box[3]:
+            restart_ui.draw(img)
+
+    def draw_board(self, img):
+        key = (self.board.key(), self.winner)
+        self.layers.compose("board", key, self.render_board_layer, dst=img)
+
+    # -------- Logic --------
+    def computer_move(self):
+        move = solver.choose_move(self.board, self.computer_symbol, self.difficulty or difficulty)
+        if move:
+            self.board.place(move[0], move[1], self.computer_symbol)
+
+    def check_winner(self, sym):
+        return self.board.is_win(sym)
+
+    def choose_symbol(self, fx, fy, gesture_confirmed, player=0):
+        """Selection phase: a fist over the X or O box picks player's symbol (the other gets the other)."""
+        box = selection_ui.hit(fx, fy)
+        if box is not None and gesture_confirmed:
+            self.symbols[player] = box.value
+            self.symbols[1 - player] = 'O' if box.value == 'X' else 'X'
+            self.selection_made = True
+
+    def play(self, fx, fy, gesture_confirmed, player=0):
+        """
+        Game phase: player's move (fist over an empty cell), the computer's
+        answer (one player) or the other player's turn (two), and the result.
+        """
+        if self.winner:
+            return
+        cell = get_cell_from_pos(fx, fy)
+
+        if self.players == 2:
+            if cell and gesture_confirmed and self.can_move(player) and self.board.is_empty(*cell):
+                self.board.place(cell[0], cell[1], self.to_move)
+                self.to_move = 'O' if self.to_move == 'X' else 'X'
+        # Place move only on fist
+        elif cell and self.user_turn and gesture_confirmed and self.board.is_empty(*cell):
+            self.board.place(cell[0], cell[1], self.user_symbol)
+            self.user_turn = False
+            self.move_made = True
+
+        if self.move_made:
+            if not self.check_winner(self.user_symbol):
+                self.computer_move()
+            self.user_turn = True
+            self.move_made = False
+
+        first_wins, second_wins = win_texts[self.players]
+        if self.check_winner(self.user_symbol):
+            self.winner = first_wins
+        elif self.check_winner(self.computer_symbol):
+            self.winner = second_wins
+        elif self.board.is_full():
+            self.winner = '                                Draw!'
+
+    def check_restart(self, fx, fy, gesture_confirmed):
+        """Endgame: a fist over "Play Again" starts a new game."""
+        # Require fist to restart
+        if self.winner and gesture_confirmed and restart_ui.hit(fx, fy) is not None:
+            self.reset()
+
+    def update(self, fx, fy, gesture_confirmed, player=0):
+        """The game logic of one step() for player's cursor, without drawing (see run_async())."""
+        if not self.selection_made:
+            self.choose_symbol(fx, fy, gesture_confirmed, player)
+        else:
+            self.play(fx, fy, gesture_confirmed, player)
+            self.check_restart(fx, fy, gesture_confirmed)
+
+    def draw(self, fx, fy, fist_held):
+        """Draws the current state with the cursor at (fx, fy) in canvas pixels. Returns the canvas."""
+        return self.draw_players(((fx, fy),), fist_held)
+
+    def draw_players(self, cursors, fist_held):
+        """Draws the current state with every player's cursor ((None, None) without one). Returns the canvas."""
+        canvas = self.layers.frame
+
+        # Debug text for fist detection
+        if fist_held:
+            cv2.putText(canvas, "FIST DETECTED", (50, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 200, 0), 3)
+
+        # -------------- Symbol Selection Phase --------------
+        if not self.selection_made:
+            self.draw_selection_screen(canvas, [(fx, fy) if fx and fy else None for fx, fy in cursors])
+
+            for player, (fx, fy) in enumerate(cursors):
+                if fx is not None and fy is not None:
+                    # Draw cursor
+                    cv2.circle(canvas, (fx, fy), 15, player_colors[player], -1)
+
+        # -------------- Game Phase --------------
+        else:
+            self.draw_board(canvas)
+            if self.players == 2 and not self.winner:
+                player = self.symbols.index(self.to_move)
+                cv2.putText(canvas, "Player {} ({}) to move".format(player + 1, self.to_move),
+                            (2 * offset + board_size, offset + 30), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.7, player_colors[player], 2)
+
+            for player, (fx, fy) in enumerate(cursors):
+                # Hovered widget: "Play Again" at the end, otherwise a free cell
+                button = restart_ui.hit(fx, fy) if self.winner else None
+                if button is not None:
+                    restart_ui.draw_hover(canvas, button)
+                elif not self.winner and self.can_move(player):
+                    cell = board_ui.hit(fx, fy)
+                    if cell is not None and self.board.is_empty(*cell.value):
+                        board_ui.draw_hover(canvas, cell)
+
+                # Draw cursor
+                if fx is not None and fy is not None:
+                    cv2.circle(canvas, (fx, fy), 15, player_colors[player], -1)
+
+                # ----------- Endgame Screen with Restart -----------
+                if button is not None:
                     cv2.circle(canvas, (fx, fy), 25, (0,200,0), 3)
-                    # Require fist to restart
-                    if gesture_confirmed:
-                        init_game()
 
-    cv2.imshow(window_name, canvas)
+        return canvas
+
+    def step(self, fx, fy, gesture_confirmed, fist_held=False, timer=null_timer):
+        """
+        Runs one frame of the game for a cursor at (fx, fy) in canvas pixels
+        (None, None without a hand) and draws it. gesture_confirmed is the
+        frame a fist was made (see fist()). Returns the canvas.
+        """
+        if not self.selection_made:
+            canvas = self.draw(fx, fy, fist_held)
+            timer.lap("render")
+            self.choose_symbol(fx, fy, gesture_confirmed)
+        else:
+            self.play(fx, fy, gesture_confirmed)
+            timer.lap("logic")
+            canvas = self.draw(fx, fy, fist_held)
+            self.check_restart(fx, fy, gesture_confirmed)
+            timer.lap("render")
+        return canvas
+
+# ---------------- Game Initialization ----------------
+game = GameSession(players)
 
-    # Press ESC or 'q' to quit
-    if cv2.waitKey(1) & 0xFF in [27, ord('q')]:
-        break
+def init_game():
+    game.reset()
 
-cap.release()
-cv2.destroyAllWindows()
+def read_players(w, h, t):
+    """
+    Feeds every player's hand this frame (the tracker slot's row of batch)
+    to their cursor and gestures; a hand new to a slot starts with fresh
+    gestures. Returns (fist just made, fist held) per player.
+    """
+    # Cursor = average of all landmarks, for all hands at once
+    centroids = batch.centroid_pixels(w, h)
+    for player in range(players):
+        i = tracker.index[player]
+        if tracker.fresh[player]:
+            game.gestures[player].reset()
+        if i >= 0:
+            cursors[player].update(int(centroids[i, 0]), int(centroids[i, 1]), t)
+        else:
+            cursors[player].reset()
+    return game.fists(batch, tracker.index, t)
 
+# ---------------- Main Loop ----------------
+def run(cap, sink, timer=null_timer, max_frames=None, switch_keys=()):
+    """
+    Main loop. Returns the key that ended it (quit, or one of switch_keys
+    when hosted by launcher.py), or None when the source ran out.
+    """
+    sink.open_window(window_name, fullscreen=True)
+
+    frames = 0
+    while max_frames is None or frames < max_frames:
+        timer.start_frame()
+        ret, frame = cap.read()
+        frame_time = frame_timestamp(cap)
+        timer.lap("capture")
+        if not ret:
+            break
+        frames += 1
+
+        track_hands(hands, frame, batch, tracker, scheduler, timer, frame_pool, mirror=True, now=frame_time)
+        h, w, _ = frame.shape
+        fists = read_players(w, h, frame_time)
+
+        # Map cursors to canvas coordinates
+        spots = [to_canvas(c.position(), w, h) for c in cursors]
+        timer.lap("logic")
+
+        if players == 1:
+            (fx, fy), (gesture_confirmed, fist_held) = spots[0], fists[0]
+            canvas = game.step(fx, fy, gesture_confirmed, fist_held, timer)
+        else:
+            for player, ((fx, fy), (gesture_confirmed, _)) in enumerate(zip(spots, fists)):
+                game.update(fx, fy, gesture_confirmed, player)
+            timer.lap("logic")
+            canvas = game.draw_players(spots, any(held for _, held in fists))
+            timer.lap("render")
+
+        timer.lap("logic")
+        timer.overlay(canvas)
+        timer.lap("render")
+        sink.show(window_name, canvas)
+        mark_shown(cap)
+
+        # Press ESC or 'q' to quit
+        key = sink.poll_key()
+        timer.lap("display")
+        timer.end_frame()
+        if key in [27, ord('q')] or key in switch_keys:
+            return key
+
+def run_async(cap, sink, timer=null_timer, fps=60, switch_keys=()):
+    """
+    Like run(), but inference runs in the background and the game is drawn
+    fps times a second from the latest state. Every inference result runs
+    the game logic once, as one frame of run() does, so a fist confirms
+    exactly as there; between results only the cursors move
+    (extrapolated by the cursor filters). Returns the AsyncRuntime and the
+    key that ended the loop (None when the source ran out).
+    """
+    sink.open_window(window_name, fullscreen=True)
+    state = {"size": None, "fist": False}
+
+    def on_result(result):
+        state["size"] = (result.width, result.height)
+        batch.load_points(result.hands, result.handedness)
+        tracker.assign(batch, result.frame_time)
+        fists = read_players(result.width, result.height, result.frame_time)
+        state["fist"] = any(held for _, held in fists)
+        for player, (confirmed, _) in enumerate(fists):
+            fx, fy = to_canvas(cursors[player].position(), result.width, result.height)
+            game.update(fx, fy, confirmed, player)
+
+    def draw(now):
+        spots = [(None, None)] * players
+        if state["size"] is not None:
+            spots = [to_canvas(c.position(now), *state["size"]) for c in cursors]
+        return game.draw_players(spots, state["fist"])
+
+    runtime = AsyncRuntime(cap, hands, fps, mirror=True, max_hands=players)
+    key = runtime.run(on_result, draw, sink, window_name, timer, (27, ord('q')) + tuple(switch_keys))
+    return runtime, key
+
+def play(cap, sink, timer):
+    """main()'s loop: run_async() at render_fps, or run() for a replay."""
+    global scheduler
+    # A replay goes through run(), one frame per record: the runtime drops
+    # whatever frames inference does not keep up with, so it is not repeatable
+    if not render_fps or isinstance(cap, ReplaySession):
+        return run(cap, sink, timer)
+    # The runtime infers on the newest frame whenever the model is free
+    scheduler = None
+    runtime, key = run_async(cap, sink, timer, render_fps)
+    print_runtime_stats(runtime)
+    return key
+
+def main():
+    run_app(sys.modules[__name__], "game_play2", play)
+
+if __name__ == "__main__":
+    main()
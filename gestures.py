@@ -0,0 +1,281 @@
+"""
+Debounced hand gestures, as events instead of per-frame booleans.
+
+A GestureEngine is fed one HandArray (or None without a hand) per
+inference and classifies it in one vectorized pass over the landmarks:
+
+    features   per finger, whether it is extended (tip above the joint below
+               it, by more than a hysteresis band relative to the hand size)
+               and whether thumb and index tip touch (pinch), again with
+               separate thresholds for closing and opening
+    table      every gesture is a row of wanted features; a hand matches a
+               row when no more than `slack` of the features it cares about
+               differ, and the first matching row is the gesture (resolved
+               up front for all 64 feature combinations, so classifying is
+               one lookup)
+    debounce   the gesture only changes once the new one has been seen for
+               `debounce` seconds, so one flickering frame changes nothing
+
+Changes come out as events: START when a gesture begins, END when it stops
+and HOLD once when it has been held for its hold time. The apps act on
+START (a fist confirms once, however long it is held) instead of on every
+frame the gesture is there.
+
+With several hands, a GestureBatch classifies all of them in one pass and
+keeps an engine per hand slot for the hysteresis and debouncing.
+"""
+import numpy as np
+
+from landmarks import FINGER_TIPS, FINGER_PIPS, WRIST, THUMB, INDEX, MIDDLE, RING, PINKY
+
+START, END, HOLD = "start", "end", "hold"
+
+# Feature columns: the five fingers, then the pinch
+PINCH = 5
+NUM_FEATURES = 6
+
+MIDDLE_MCP = 9
+
+# Features as bits of one integer per hand: with six features there are only
+# 64 combinations, so every engine resolves its table for all of them up front
+FEATURE_BITS = 1 << np.arange(NUM_FEATURES)
+# Landmark pairs measured for every hand: wrist to middle knuckle (the hand
+# size), index tip to thumb tip (pinch), then each finger's tip to the joint
+# below it (the finger is up when the tip is above)
+SPAN_TO = np.concatenate(([MIDDLE_MCP, FINGER_TIPS[THUMB]], FINGER_PIPS))
+SPAN_FROM = np.concatenate(([WRIST, FINGER_TIPS[INDEX]], FINGER_TIPS))
+SPANS = np.concatenate((SPAN_TO, SPAN_FROM))
+FIRST = np.ones(1, dtype=bool)
+
+
+class Gesture:
+    """
+    One row of a gesture table: the fingers that have to be up, the ones
+    that have to be down and whether thumb and index touch (None = either).
+    Up to `slack` of these may be wrong.
+    """
+
+    def __init__(self, name, up=(), down=(), pinch=None, slack=0):
+        self.name = name
+        self.up = tuple(up)
+        self.down = tuple(down)
+        self.pinch = pinch
+        self.slack = slack
+
+
+# Earlier rows win; a fist tolerates one finger out (as is_fist() always
+# did), which is why pointing and two fingers have to come before it
+GESTURES = (
+    Gesture("point", up=(INDEX,), down=(MIDDLE, RING, PINKY)),
+    Gesture("two_finger", up=(INDEX, MIDDLE), down=(RING, PINKY)),
+    Gesture("palm", up=(THUMB, INDEX, MIDDLE, RING, PINKY), pinch=False),
+    Gesture("fist", down=(INDEX, MIDDLE, RING, PINKY), slack=1),
+    Gesture("pinch", pinch=True),
+)
+
+
+class GestureEvent:
+    __slots__ = ("kind", "gesture", "time", "duration")
+
+    def __init__(self, kind, gesture, time, duration=0.0):
+        self.kind = kind            # START, END or HOLD
+        self.gesture = gesture      # name of the gesture
+        self.time = time            # when it happened (the time passed to update())
+        self.duration = duration    # how long the gesture had been held (END, HOLD)
+
+    def __repr__(self):
+        return "GestureEvent({!r}, {!r}, {:.3f}, {:.3f})".format(self.kind, self.gesture, self.time, self.duration)
+
+
+class GestureEngine:
+    """
+    Classifies hands with a gesture table and turns the result into events.
+
+    update(hand, t) returns the events of that update (a list reused by the
+    next call); `active` is the current gesture (None for no hand or no
+    known gesture). holds maps gesture names to the seconds after which a
+    HOLD event fires. The extension thresholds are in units of the hand size
+    (wrist to middle knuckle); a finger goes up above `extend` and down
+    again below `retract`. Pinch closes below `pinch_close` and opens above
+    `pinch_open`.
+    """
+
+    def __init__(self, gestures=GESTURES, debounce=0.08, holds=None,
+                 extend=0.05, retract=-0.05, pinch_close=0.3, pinch_open=0.45):
+        self.gestures = tuple(gestures)
+        self.names = tuple(g.name for g in self.gestures)
+        self.debounce = debounce
+        self.holds = dict(holds or {})
+        self.extend = extend
+        self.retract = retract
+        self.pinch_close = pinch_close
+        self.pinch_open = pinch_open
+
+        # The table as arrays: what each row wants, which columns it cares about
+        n = len(self.gestures)
+        self._want = np.zeros((n, NUM_FEATURES), dtype=bool)
+        self._care = np.zeros((n, NUM_FEATURES), dtype=bool)
+        self._slack = np.array([g.slack for g in self.gestures], dtype=np.intp)
+        for i, g in enumerate(self.gestures):
+            self._want[i, list(g.up)] = True
+            self._care[i, list(g.up) + list(g.down)] = True
+            if g.pinch is not None:
+                self._want[i, PINCH] = g.pinch
+                self._care[i, PINCH] = True
+        self._hold_times = np.array([self.holds.get(name, np.inf) for name in self.names])
+        # The first matching row of every combination of features (n: none)
+        combos = (np.arange(1 << NUM_FEATURES)[:, None] & FEATURE_BITS) != 0
+        wrong = (combos[:, None, :] != self._want) & self._care
+        matches = np.c_[wrong.sum(axis=2) <= self._slack, np.ones(len(combos), dtype=bool)]
+        self._row_of = matches.argmax(axis=1)
+        # Feature i is on when value i (finger score, or minus the pinch distance)
+        # is above its threshold: on to stay on, off to come on, and a first hand
+        self._thr_on = np.array([retract] * PINCH + [-pinch_open])
+        self._thr_off = np.array([extend] * PINCH + [-pinch_close])
+        self._thr_first = np.array([0.0] * PINCH + [-pinch_close])
+
+        self.features = np.zeros(NUM_FEATURES, dtype=bool)
+        self.events = []
+        self.reset()
+
+    def reset(self):
+        self._seen = False          # the features hold a previous hand (for hysteresis)
+        self.raw = None             # index of the gesture of the last hand, before debouncing
+        self._raw_since = None
+        self._active = None
+        self.since = None           # when the active gesture started
+        self._held = False          # HOLD already fired for the active gesture
+
+    @property
+    def active(self):
+        return self.names[self._active] if self._active is not None else None
+
+    def classify(self, hand):
+        """Updates the features from a HandArray and returns the index of the first matching row, or None."""
+        i = int(self.classify_points(hand.points[None], self.features[None], None if self._seen else FIRST)[0])
+        self._seen = True
+        return i if i < len(self.gestures) else None
+
+    def classify_points(self, points, features, first=None):
+        """
+        Classifies k hands at once: points (k, 21, 3), features (k, 6) the
+        previous features of each hand, updated in place (for hysteresis;
+        ignored for the hands first (k,) marks as new, None: none are).
+        Returns the index of every hand's first matching row, len(gestures)
+        where no row matches.
+        """
+        ends = points[:, SPANS, :2]
+        spans = ends[:, :len(SPAN_TO)] - ends[:, len(SPAN_TO):]
+        lengths = np.sqrt((spans[:, :2] * spans[:, :2]).sum(axis=2))
+        size = lengths[:, :1]
+        size[size == 0] = 1.0
+        # Per finger how far the tip is above the joint below it, then minus the
+        # pinch distance, all in units of the hand size
+        values = np.empty((len(points), NUM_FEATURES))
+        values[:, :PINCH] = spans[:, 2:, 1]
+        values[:, PINCH] = -lengths[:, 1]
+        values /= size
+
+        # Hysteresis: an extended finger stays up until it drops below retract, a folded
+        # one waits for extend (likewise the pinch); a new hand has no history
+        thresholds = np.where(features, self._thr_on, self._thr_off)
+        if first is not None:
+            thresholds[first] = self._thr_first
+        np.greater(values, thresholds, out=features)
+        return self._row_of[features @ FEATURE_BITS]
+
+    def step(self, raw, t):
+        """Debounces the gesture index raw (None: no hand or no gesture) seen at time t. Returns the events."""
+        events = self.events
+        events.clear()
+        if raw != self.raw:
+            self.raw = raw
+            self._raw_since = t
+        if raw != self._active and t - self._raw_since >= self.debounce:
+            if self._active is not None:
+                events.append(GestureEvent(END, self.names[self._active], t, t - self.since))
+            self._active = raw
+            self.since = self._raw_since
+            self._held = False
+            if raw is not None:
+                events.append(GestureEvent(START, self.names[raw], t))
+        if self._active is not None and not self._held and t - self.since >= self._hold_times[self._active]:
+            self._held = True
+            events.append(GestureEvent(HOLD, self.names[self._active], t, t - self.since))
+        return events
+
+    def update(self, hand, t):
+        """Feeds one inference (hand None when there is none) taken at time t. Returns its events."""
+        if hand is None:
+            self._seen = False
+            return self.step(None, t)
+        return self.step(self.classify(hand), t)
+
+    def held_for(self, t):
+        """Seconds the active gesture has been held at time t (0.0 when there is none)."""
+        return t - self.since if self._active is not None else 0.0
+
+    def rearm(self, t):
+        """Restarts the hold of the active gesture at time t, as if it had just started (HOLD fires again)."""
+        if self._active is not None:
+            self.since = t
+            self._held = False
+
+    def started(self, name):
+        """True if the last update started gesture `name`."""
+        return any(e.kind == START and e.gesture == name for e in self.events)
+
+    def held(self, name):
+        """True if the last update fired the HOLD event of gesture `name`."""
+        return any(e.kind == HOLD and e.gesture == name for e in self.events)
+
+
+class GestureBatch:
+    """
+    One GestureEngine per HandTracker slot (see hand_tracks.py), classified
+    together: update() runs the hands of all slots through the table in one
+    classify_points() call, and only each slot's features (for hysteresis)
+    and debouncing stay its own. batch[slot] is the slot's engine, with its
+    active gesture and the events of the last update.
+    """
+
+    def __init__(self, slots, gestures=GESTURES, **options):
+        self.engines = [GestureEngine(gestures, **options) for _ in range(slots)]
+        self.features = np.zeros((slots, NUM_FEATURES), dtype=bool)
+        for slot, engine in enumerate(self.engines):
+            engine.features = self.features[slot]
+
+    def __getitem__(self, slot):
+        return self.engines[slot]
+
+    def __len__(self):
+        return len(self.engines)
+
+    def reset(self):
+        for engine in self.engines:
+            engine.reset()
+
+    def update(self, batch, index, t):
+        """
+        Feeds every slot its hand at time t: index[slot] is the slot's row of
+        the HandBatch batch (-1 without one), as in HandTracker.index.
+        Returns the events of every slot.
+        """
+        engines = self.engines
+        slots = np.flatnonzero(index >= 0)
+        if len(slots):
+            features = self.features[slots]
+            first = np.array([not engines[slot]._seen for slot in slots])
+            raws = engines[0].classify_points(batch.points[index[slots]], features, first if first.any() else None)
+            self.features[slots] = features
+        j = 0
+        for slot, engine in enumerate(engines):
+            if index[slot] < 0:
+                engine._seen = False
+                engine.step(None, t)
+            else:
+                raw = int(raws[j])
+                j += 1
+                engine._seen = True
+                engine.step(raw if raw < len(engine.gestures) else None, t)
+        return [engine.events for engine in engines]
@@ -0,0 +1,193 @@
+"""
+Several hands at once, each keeping its identity from frame to frame.
+
+    HandBatch    the hands of one inference in one (max_hands, 21, 3) array
+                 plus their handedness; centroids and pixel positions are
+                 computed for all hands in one NumPy pass, and every row is
+                 also a HandArray view for the per-hand code (gestures,
+                 drawing)
+    HandTracker  gives every hand a slot (a player, a pen) that stays the same
+                 while the hand moves: hands are matched to the slots' last
+                 positions nearest pair first, with a penalty for the other
+                 handedness, and a slot is kept for `keep` seconds after its
+                 hand was lost, so a hand that drops out for a few frames
+                 comes back in the same slot
+
+The apps index their per-hand state (cursor filter, gesture engine, color)
+by slot: tracker.index[slot] is the batch row of the slot's hand this frame
+(-1 without one) and tracker.fresh[slot] says the slot has just been taken
+by a new hand, whose state should start afresh.
+"""
+import time
+
+import cv2
+import numpy as np
+
+from frame_pool import bgr_to_rgb
+from inference_scheduler import track_hand
+from landmark_log import HANDEDNESS
+from landmarks import NUM_LANDMARKS, HandArray
+from stage_timer import null_timer
+
+UNKNOWN = -1        # handedness of a hand the detector does not label
+
+
+def handedness_of(result, i):
+    """Index in HANDEDNESS of hand i of a result (mediapipe or replayed), UNKNOWN if it has none."""
+    labels = getattr(result, "multi_handedness", None)
+    if labels:
+        return HANDEDNESS.index(labels[i].classification[0].label)
+    replayed = getattr(result, "handedness", None)
+    if replayed:
+        return HANDEDNESS.index(replayed[i][0])
+    return UNKNOWN
+
+
+class HandBatch:
+    """The hands of one inference (up to max_hands) as one array; count is how many were found."""
+
+    def __init__(self, max_hands=2):
+        self.max_hands = max_hands
+        self.points = np.zeros((max_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+        self.handedness = np.full(max_hands, UNKNOWN, dtype=np.int8)
+        self.hands = [HandArray(self.points[i]) for i in range(max_hands)]
+        self.count = 0
+        self._centroids = np.zeros((max_hands, 2), dtype=np.float64)
+        self._pixels = np.zeros((max_hands, 2), dtype=np.float64)
+        self._pixels_int = np.zeros((max_hands, 2), dtype=np.int32)
+
+    def load(self, result, mirror=False):
+        """Fills the batch from a hands.process() result. mirror flips x of every hand."""
+        found = result.multi_hand_landmarks or []
+        n = self.count = min(len(found), self.max_hands)
+        for i in range(n):
+            self.hands[i].load(found[i])
+            self.handedness[i] = handedness_of(result, i)
+        if mirror and n:
+            xs = self.points[:n, :, 0]
+            np.subtract(1.0, xs, out=xs)
+        return self
+
+    def load_points(self, points, handedness=()):
+        """Fills the batch from an (n, 21, 3) array (and handedness indices), e.g. a HandResult's."""
+        n = self.count = 0 if points is None else min(len(points), self.max_hands)
+        if n:
+            np.copyto(self.points[:n], points[:n])
+        self.handedness[:n] = UNKNOWN
+        self.handedness[:min(n, len(handedness))] = handedness[:n]
+        return self
+
+    def centroids(self):
+        """(count, 2) mean normalized (x, y) of every hand."""
+        n = self.count
+        return self.points[:n, :, :2].mean(axis=1, dtype=np.float64, out=self._centroids[:n])
+
+    def centroid_pixels(self, w, h):
+        """(count, 2) int32 centroid of every hand in pixels (reused between calls)."""
+        n = self.count
+        np.multiply(self.centroids(), (w, h), out=self._pixels[:n])
+        np.copyto(self._pixels_int[:n], self._pixels[:n], casting="unsafe")
+        return self._pixels_int[:n]
+
+    def landmark_pixels(self, idx, w, h):
+        """(count, 2) int32 pixel position of landmark idx of every hand (reused between calls)."""
+        n = self.count
+        np.multiply(self.points[:n, idx, :2], (w, h), out=self._pixels[:n])
+        np.copyto(self._pixels_int[:n], self._pixels[:n], casting="unsafe")
+        return self._pixels_int[:n]
+
+
+class HandTracker:
+    """
+    Assigns the hands of each HandBatch to max_hands slots (see above).
+    Positions are hand centroids in normalized coordinates; a hand of the
+    other handedness than a slot's last hand costs `mismatch` extra, so two
+    hands crossing each other keep their slots when the detector labels
+    them.
+    """
+
+    # Cost of giving a hand a free slot: more than any distance plus mismatch,
+    # so hands go to the slots they were in whenever those are still kept
+    FREE = 100.0
+
+    def __init__(self, max_hands=2, keep=1.0, mismatch=0.5):
+        self.max_hands = max_hands
+        self.keep = keep
+        self.mismatch = mismatch
+        self.position = np.zeros((max_hands, 2), dtype=np.float64)
+        self.handedness = np.full(max_hands, UNKNOWN, dtype=np.int8)
+        self.last_seen = np.full(max_hands, -np.inf)
+        self.ids = np.full(max_hands, -1, dtype=np.int64)   # stable id of the hand in each slot
+        self.index = np.full(max_hands, -1, dtype=np.intp)  # batch row of each slot's hand this frame
+        self.fresh = np.zeros(max_hands, dtype=bool)
+        self._next_id = 0
+        self._cost = np.zeros((max_hands, max_hands), dtype=np.float64)
+        self._kept = np.zeros(max_hands, dtype=bool)
+
+    def reset(self):
+        self.last_seen[:] = -np.inf
+        self.handedness[:] = UNKNOWN
+        self.ids[:] = -1
+        self.index[:] = -1
+        self.fresh[:] = False
+
+    def assign(self, batch, now):
+        """Matches the hands of batch to slots at time now. Returns index (slot -> batch row or -1)."""
+        n = batch.count
+        index, fresh = self.index, self.fresh
+        index[:] = -1
+        fresh[:] = False
+        if n == 0:
+            return index
+
+        kept = np.greater_equal(self.last_seen, now - self.keep, out=self._kept)
+        # Cost of every (hand, slot) pair at once: distance, plus the handedness penalty
+        cost = self._cost[:n]
+        centroids = batch.centroids()
+        diff = centroids[:, None, :] - self.position[None, :, :]
+        np.hypot(diff[..., 0], diff[..., 1], out=cost)
+        labels = batch.handedness[:n, None]
+        cost += self.mismatch * ((labels != self.handedness) & (labels != UNKNOWN) & (self.handedness != UNKNOWN))
+        cost[:, ~kept] = self.FREE
+
+        # Nearest pair first; with a handful of hands greedy is as good as optimal
+        for _ in range(min(n, self.max_hands)):
+            row, slot = np.unravel_index(int(cost.argmin()), cost.shape)
+            if not np.isfinite(cost[row, slot]):
+                break
+            index[slot] = row
+            if not kept[slot]:
+                fresh[slot] = True
+                self.ids[slot] = self._next_id
+                self._next_id += 1
+            self.position[slot] = centroids[row]
+            self.handedness[slot] = batch.handedness[row]
+            self.last_seen[slot] = now
+            cost[row, :] = np.inf
+            cost[:, slot] = np.inf
+        return index
+
+    def hand(self, batch, slot):
+        """The HandArray of slot's hand this frame, or None."""
+        i = self.index[slot]
+        return batch.hands[i] if i >= 0 else None
+
+
+def track_hands(hands, frame, batch, tracker, scheduler=None, timer=null_timer, pool=None,
+                mirror=False, now=None):
+    """
+    Like track_hand(), for every hand in the frame: fills batch and assigns
+    the hands to tracker slots at time now (default: the clock). Returns the
+    number of hands. The scheduler only predicts a single hand, so it is
+    used with one-hand batches and ignored otherwise.
+    """
+    if scheduler is not None and batch.max_hands == 1:
+        batch.count = int(track_hand(hands, frame, batch.hands[0], scheduler, timer, pool, mirror))
+        batch.handedness[0] = UNKNOWN
+    else:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if pool is None else bgr_to_rgb(frame, pool)
+        timer.lap("convert")
+        batch.load(hands.process(rgb), mirror)
+        timer.lap("inference")
+    tracker.assign(batch, time.perf_counter() if now is None else now)
+    return batch.count
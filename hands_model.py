@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+
+from roi_hands import RoiHands
+
+
+# Hand detectors create_hands() can build; every one has process(rgb)
+# returning a result with multi_hand_landmarks, like mediapipe's Hands
+BACKENDS = ("mediapipe", "classic")
+
+
+def create_hands(max_num_hands=1, min_detection_confidence=0.7, min_tracking_confidence=0.5,
+                 roi=True, warm=True, backend="mediapipe", mirrored=True):
+    """
+    Builds the mediapipe Hands model the apps use, optionally wrapped in
+    RoiHands. mediapipe is imported here rather than at the top of the apps,
+    so replaying a recorded session or importing an app (e.g. from
+    launcher.py or benchmark.py) does not pay for it. warm=True runs one
+    dummy frame through the graph so the first real frame is not slow.
+
+    backend="classic" builds the model-free tracker from classic_hands.py
+    instead (one hand, no crop: it tracks the hand itself). It needs to know
+    whether the frames it gets are mirrored (mirrored=False for a camera
+    frame as it comes) to tell the thumb side; mediapipe does not.
+    """
+    if backend == "classic":
+        from classic_hands import ClassicHands
+        return ClassicHands(mirrored=mirrored)
+    if backend != "mediapipe":
+        raise ValueError("unknown hand backend {!r} (expected one of {})".format(backend, ", ".join(BACKENDS)))
+    import mediapipe as mp
+    hands = mp.solutions.hands.Hands(
+        max_num_hands=max_num_hands,
+        min_detection_confidence=min_detection_confidence,
+        min_tracking_confidence=min_tracking_confidence,
+    )
+    if warm:
+        warm_up(hands)
+    if roi:
+        hands = RoiHands(hands, max_hands=max_num_hands)
+    return hands
+
+
+def set_mirrored(hands, mirrored):
+    """Tells hands from create_hands() whether the frames are mirrored from now on (see create_hands)."""
+    if hasattr(hands, "mirrored"):
+        hands.mirrored = mirrored
+
+
+def warm_up(hands, width=640, height=480):
+    """Runs one black frame through hands.process(). Returns the time it took."""
+    start = time.perf_counter()
+    hands.process(np.zeros((height, width, 3), dtype=np.uint8))
+    return time.perf_counter() - start
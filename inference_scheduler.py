@@ -0,0 +1,133 @@
+import time
+
+import cv2
+import numpy as np
+
+from frame_pool import bgr_to_rgb
+from landmarks import NUM_LANDMARKS
+from stage_timer import null_timer
+
+
+class InferenceScheduler:
+    """
+    Decides on which frames hands.process() really has to run.
+
+    After every inference the landmark speed (mean over all landmarks, in
+    frame widths per second) and the finger pattern are compared with the
+    previous inference. While the hand stays still and keeps its gesture,
+    the interval between inferences doubles, up to 1 / min_rate seconds.
+    Any motion, a change of gesture (e.g. a fist opening or closing) or a
+    lost hand drops straight back to inference on every frame. Frames in
+    between get landmarks extrapolated from the last two inferences.
+    """
+
+    def __init__(self, min_rate=5.0, motion_threshold=0.05, first_interval=0.05):
+        self.max_interval = 1.0 / min_rate      # never go longer than this without inference
+        self.motion_threshold = motion_threshold
+        self.first_interval = first_interval
+        self.interval = 0.0
+
+        self._last = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+        self._velocity = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+        self._step = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+        self._last_time = None      # time of the last inference that found a hand
+        self._last_gesture = None
+        self._tracking = False
+
+        self.frames = 0
+        self.inferences = 0
+
+    def should_infer(self, now=None):
+        """Call once per frame. False means: use predict() instead of running the model."""
+        if now is None:
+            now = time.perf_counter()
+        self.frames += 1
+        if not self._tracking or now - self._last_time >= self.interval:
+            self.inferences += 1
+            return True
+        return False
+
+    def observe(self, hand, now=None):
+        """Call after each inference with the HandArray found, or None if there was no hand."""
+        if now is None:
+            now = time.perf_counter()
+        if hand is None:
+            self._tracking = False
+            self.interval = 0.0
+            self._last_gesture = None
+            return
+
+        gesture = int(np.dot(hand.fingers_up(), (1, 2, 4, 8, 16)))
+        if self._tracking and now > self._last_time:
+            # Landmark velocity between the last two inferences
+            np.subtract(hand.points, self._last, out=self._velocity)
+            self._velocity /= now - self._last_time
+            motion = float(np.abs(self._velocity[:, :2]).mean())
+            if motion < self.motion_threshold and gesture == self._last_gesture:
+                self.interval = min(max(self.interval * 2, self.first_interval), self.max_interval)
+            else:
+                self.interval = 0.0
+        else:
+            self._velocity[:] = 0
+            self.interval = 0.0
+
+        np.copyto(self._last, hand.points)
+        self._last_time = now
+        self._last_gesture = gesture
+        self._tracking = True
+
+    def predict(self, hand, now=None):
+        """Fills hand with landmarks extrapolated to now. Returns False if there is no hand to predict."""
+        if not self._tracking:
+            return False
+        if now is None:
+            now = time.perf_counter()
+        dt = min(now - self._last_time, self.max_interval)
+        np.multiply(self._velocity, dt, out=self._step)
+        np.add(self._last, self._step, out=hand.points)
+        return True
+
+    def stats(self):
+        frames = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "inferences": self.inferences,
+            "skipped": self.frames - self.inferences,
+            "saved": 1.0 - self.inferences / frames,
+        }
+
+
+def track_hand(hands, frame, hand, scheduler=None, timer=null_timer, pool=None, mirror=False):
+    """
+    Fills hand (a HandArray) for one BGR frame: runs color conversion and
+    hands.process() when the scheduler asks for it (or there is no
+    scheduler), otherwise predicts the landmarks. Returns True if there is a
+    hand this frame. With a FramePool the RGB image goes into a pooled
+    buffer; mirror=True flips the landmarks instead of the caller flipping
+    the frame.
+    """
+    if scheduler is not None and not scheduler.should_infer():
+        return scheduler.predict(hand)
+
+    if pool is None:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    else:
+        rgb = bgr_to_rgb(frame, pool)
+    timer.lap("convert")
+    result = hands.process(rgb)
+    timer.lap("inference")
+    found = bool(result.multi_hand_landmarks)
+    if found:
+        hand.load(result.multi_hand_landmarks[0])
+        if mirror:
+            hand.mirror()
+    if scheduler is not None:
+        scheduler.observe(hand if found else None)
+    return found
+
+
+def print_scheduler_stats(scheduler):
+    if scheduler is not None:
+        s = scheduler.stats()
+        print("scheduler: {inferences} inferences in {frames} frames, "
+              "{skipped} skipped ({saved:.0%} saved)".format(**s))
@@ -0,0 +1,161 @@
+import math
+
+import cv2
+import numpy as np
+
+from frame_pool import FramePool
+
+
+class InkCanvas:
+    """
+    The Air Canvas drawing surface: an unbounded plane of square tiles, of
+    which only the ones with ink exist.
+
+    Strokes are drawn in canvas coordinates, and a tile is allocated the
+    first time a stroke actually touches it, so memory follows the amount
+    of ink instead of the size of the board. composite() adds the tiles
+    that fall inside a Viewport onto the camera frame, in place; at zoom 1
+    and without panning the result is the same as
+    cv2.addWeighted(frame, 1, canvas, 1, 0) on a frame-sized canvas.
+
+    snapshot() returns a {(ty, tx): tile} dict sharing the tiles; a tile is
+    only copied when it is drawn on again afterwards (copy on write).
+    """
+
+    def __init__(self, tile=64):
+        self.tile = tile
+        self.tiles = {}         # (ty, tx) -> (tile, tile, 3) uint8, tile (ty, tx) starts at (tx * tile, ty * tile)
+        self._owned = set()     # tiles not shared with a snapshot, safe to draw into
+        self._pool = FramePool(1)          # resized tiles in composite()
+        self._patch = FramePool(1)         # a stroke segment and its mask in line()
+        self._patch_mask = FramePool(1)
+
+    def line(self, p0, p1, color, thickness):
+        # Drawn once into a patch around the segment and copied into the tiles
+        # it covers; drawing into each tile would clip, and clipping moves pixels
+        r = thickness // 2 + 1
+        x0 = min(p0[0], p1[0]) - r
+        y0 = min(p0[1], p1[1]) - r
+        shape = (max(p0[1], p1[1]) + r + 1 - y0, max(p0[0], p1[0]) + r + 1 - x0)
+        patch = self._patch.scratch(shape + (3,))
+        mask = self._patch_mask.scratch(shape)
+        patch[:] = 0
+        mask[:] = 0
+        a = (p0[0] - x0, p0[1] - y0)
+        b = (p1[0] - x0, p1[1] - y0)
+        cv2.line(patch, a, b, color, thickness)
+        cv2.line(mask, a, b, 1, thickness)
+
+        t = self.tile
+        for ty in range(y0 // t, (y0 + shape[0] - 1) // t + 1):
+            for tx in range(x0 // t, (x0 + shape[1] - 1) // t + 1):
+                # Overlap of the patch and the tile, in patch coordinates
+                py0, py1 = max(ty * t - y0, 0), min((ty + 1) * t - y0, shape[0])
+                px0, px1 = max(tx * t - x0, 0), min((tx + 1) * t - x0, shape[1])
+                m = mask[py0:py1, px0:px1]
+                # A long diagonal stroke's box covers tiles it never touches
+                if not m.any():
+                    continue
+                img = self._writable((ty, tx))
+                if img is None:
+                    img = self.tiles[ty, tx] = np.zeros((t, t, 3), dtype=np.uint8)
+                    self._owned.add((ty, tx))
+                dst = img[y0 + py0 - ty * t:y0 + py1 - ty * t, x0 + px0 - tx * t:x0 + px1 - tx * t]
+                np.copyto(dst, patch[py0:py1, px0:px1], where=m.view(bool)[..., None])
+
+    def _writable(self, key):
+        img = self.tiles.get(key)
+        if img is not None and key not in self._owned:
+            img = self.tiles[key] = img.copy()
+            self._owned.add(key)
+        return img
+
+    def composite(self, frame, view=None):
+        """Adds the ink inside view onto frame (saturating, like addWeighted with weights 1, 1) and returns it."""
+        if not self.tiles:
+            return frame
+        h, w = frame.shape[:2]
+        t = self.tile
+        left, top, zoom = (view.left, view.top, view.zoom) if view is not None else (0, 0, 1.0)
+        tx0 = math.floor(left / t)
+        tx1 = math.floor((left + w / zoom) / t)
+        ty0 = math.floor(top / t)
+        ty1 = math.floor((top + h / zoom) / t)
+        if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) <= len(self.tiles):
+            visible = [((ty, tx), self.tiles.get((ty, tx)))
+                       for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+        else:
+            visible = [(key, img) for key, img in self.tiles.items()
+                       if tx0 <= key[1] <= tx1 and ty0 <= key[0] <= ty1]
+        interpolation = cv2.INTER_AREA if zoom < 1 else cv2.INTER_LINEAR
+        for (ty, tx), img in visible:
+            if img is None:
+                continue
+            # Rounding both edges keeps neighbouring tiles seamless
+            sx0 = round((tx * t - left) * zoom)
+            sx1 = round(((tx + 1) * t - left) * zoom)
+            sy0 = round((ty * t - top) * zoom)
+            sy1 = round(((ty + 1) * t - top) * zoom)
+            x0, x1 = max(sx0, 0), min(sx1, w)
+            y0, y1 = max(sy0, 0), min(sy1, h)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            if (sx1 - sx0, sy1 - sy0) != (t, t):
+                img = cv2.resize(img, (sx1 - sx0, sy1 - sy0), dst=self._pool.scratch((sy1 - sy0, sx1 - sx0, 3)),
+                                 interpolation=interpolation)
+            roi = frame[y0:y1, x0:x1]
+            cv2.add(roi, img[y0 - sy0:y1 - sy0, x0 - sx0:x1 - sx0], dst=roi)
+        return frame
+
+    def clear(self):
+        self.tiles = {}
+        self._owned = set()
+
+    def snapshot(self):
+        """The ink as it is now, as a {(ty, tx): tile} dict. Costs no copies until the canvas is drawn on."""
+        self._owned = set()
+        return dict(self.tiles)
+
+    def restore(self, snapshot):
+        self.tiles = dict(snapshot)
+        self._owned = set()
+
+    def memory(self, snapshots=()):
+        """Bytes of the tiles held by the canvas and the given snapshots, each shared tile counted once."""
+        held = {id(img): img.nbytes for img in self.tiles.values()}
+        for snapshot in snapshots:
+            held.update((id(img), img.nbytes) for img in snapshot.values())
+        return sum(held.values())
+
+
+class Viewport:
+    """
+    The part of the canvas on screen: canvas point (x, y) is shown at
+    ((x - left) * zoom, (y - top) * zoom). Panning and zooming only change
+    these three numbers.
+    """
+
+    def __init__(self, min_zoom=0.25, max_zoom=4.0):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.reset()
+
+    def reset(self):
+        self.left = 0.0
+        self.top = 0.0
+        self.zoom = 1.0
+
+    def to_canvas(self, x, y):
+        return int(round(x / self.zoom + self.left)), int(round(y / self.zoom + self.top))
+
+    def pan(self, dx, dy):
+        """Moves the canvas by (dx, dy) screen pixels."""
+        self.left -= dx / self.zoom
+        self.top -= dy / self.zoom
+
+    def zoom_at(self, factor, x, y):
+        """Zooms by factor, keeping the canvas point under screen point (x, y) where it is."""
+        cx, cy = x / self.zoom + self.left, y / self.zoom + self.top
+        self.zoom = min(max(self.zoom * factor, self.min_zoom), self.max_zoom)
+        self.left = cx - x / self.zoom
+        self.top = cy - y / self.zoom
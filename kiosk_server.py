@@ -0,0 +1,295 @@
+"""
+Kiosk server: several Tic Tac Toe stations in one host.
+
+Every station has its own frame source (camera, video file, image directory
+or synthetic) and its own game (game_play2.GameSession). Hand inference runs
+in a pool of worker processes, each holding warm Hands models. Frames go to
+the workers through shared memory: the main process converts each camera
+frame to RGB straight into the station's shared buffer and only sends the
+station id over a queue; the landmarks (252 bytes) come back on a result
+queue. Stations are spread over the workers, and each keeps its own model so
+MediaPipe's tracking state never mixes two cameras.
+
+    python kiosk_server.py --sources 0 1
+    python kiosk_server.py --sources synthetic synthetic synthetic synthetic --workers 2 --seconds 20
+
+Synthetic stations deliver 30 frames/s like a camera (synthetic:WxH:N:FPS for
+another rate). With --seconds, video files and synthetic sources start over
+when they run out, so every station runs for the whole time.
+
+Per station it reports frames/s, frames dropped at capture, capture -> landmarks
+and capture -> rendered latency, and inference time; across stations the
+total throughput and Jain's fairness index of the frame rates (1.0 = every
+station got the same share).
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+# ---------------- Worker ----------------
+def _worker(worker_id, stations, tasks, results, roi, backend="mediapipe"):
+    """
+    Runs in a worker process. stations: [(station id, shared memory name,
+    frame shape)]. Answers every station id from tasks with
+    (station id, landmarks or None, inference seconds).
+    """
+    from hands_model import create_hands
+    from landmarks import HandArray
+
+    start = time.perf_counter()
+    buffers = {}
+    trackers = {}
+    frames = {}
+    for sid, name, shape in stations:
+        buffers[sid] = shared_memory.SharedMemory(name=name)
+        frames[sid] = np.ndarray(shape, dtype=np.uint8, buffer=buffers[sid].buf)
+        # The frames are not flipped (see Station.dispatch)
+        trackers[sid] = create_hands(roi=roi, backend=backend, mirrored=False)
+    results.put(("ready", worker_id, time.perf_counter() - start))
+
+    hand = HandArray()
+    try:
+        while True:
+            sid = tasks.get()
+            if sid is None:
+                break
+            t = time.perf_counter()
+            result = trackers[sid].process(frames[sid])
+            points = None
+            if result.multi_hand_landmarks:
+                points = hand.load(result.multi_hand_landmarks[0]).points.copy()
+            results.put((sid, points, time.perf_counter() - t))
+    finally:
+        del frames
+        for shm in buffers.values():
+            shm.close()
+
+
+# ---------------- Stations ----------------
+class Station:
+    """One camera and one game, plus its latency histograms."""
+
+    def __init__(self, sid, spec, worker, loop=False):
+        from cursor_filter import CursorFilter
+        from frame_source import open_source
+        from landmarks import HandArray
+        from metrics import RollingHistogram
+        import game_play2
+
+        self.sid = sid
+        self.spec = spec
+        self.worker = worker
+        self.window_name = "Station {} ({})".format(sid, spec)
+        self.cap = open_source(spec, threaded=True, loop=loop)
+        ret, frame = self.cap.read()
+        if not ret:
+            raise RuntimeError("no frames from " + spec)
+        self.height, self.width = frame.shape[:2]
+        self.shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        self.rgb = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+        self.game = game_play2.GameSession()
+        self.cursor = CursorFilter(game_play2.cursor_filter_kind)
+        self.hand = HandArray()
+
+        self.in_flight = False
+        self.done = False
+        self.frame_time = None
+        self.frames = 0
+        self.latency = RollingHistogram(1000)       # capture -> landmarks back
+        self.end_to_end = RollingHistogram(1000)    # capture -> game rendered
+        self.inference = RollingHistogram(1000)
+
+    def dispatch(self, tasks):
+        """Sends the newest frame to the station's worker. False if there is no new frame."""
+        if self.cap.queue_depth == 0:
+            self.done = self.cap.finished
+            return False
+        ret, frame = self.cap.read()
+        if not ret:
+            self.done = True
+            return False
+        self.frame_time = self.cap.frame_time
+        # Into shared memory; not flipped, the landmarks are mirrored instead
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        self.in_flight = True
+        tasks.put(self.sid)
+        return True
+
+    def finish(self, points, inference_time, sink):
+        """Runs the game for the landmarks that came back and shows it."""
+        import game_play2
+
+        self.in_flight = False
+        self.latency.add(time.perf_counter() - self.frame_time)
+        self.inference.add(inference_time)
+
+        cursor_pos = None
+        if points is not None:
+            self.hand.load(points).mirror()
+            self.cursor.update(*self.hand.centroid_pixel(self.width, self.height), self.frame_time)
+            cursor_pos = self.cursor.position()
+        else:
+            self.cursor.reset()
+        gesture_confirmed, fist_held = self.game.fist(self.hand if points is not None else None, self.frame_time)
+        fx, fy = game_play2.to_canvas(cursor_pos, self.width, self.height)
+        canvas = self.game.step(fx, fy, gesture_confirmed, fist_held)
+        sink.show(self.window_name, canvas)
+        self.frames += 1
+        self.end_to_end.add(time.perf_counter() - self.frame_time)
+
+    def stats(self, elapsed):
+        return {
+            "source": self.spec,
+            "worker": self.worker,
+            "frames": self.frames,
+            "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "dropped": self.cap.dropped,
+            "latency_p50_ms": 1000 * self.latency.percentile(50),
+            "latency_p95_ms": 1000 * self.latency.percentile(95),
+            "end_to_end_p50_ms": 1000 * self.end_to_end.percentile(50),
+            "end_to_end_p95_ms": 1000 * self.end_to_end.percentile(95),
+            "inference_p50_ms": 1000 * self.inference.percentile(50),
+        }
+
+    def close(self):
+        self.cap.release()
+        del self.rgb
+        self.shm.close()
+        self.shm.unlink()
+
+
+def fairness(rates):
+    """Jain's fairness index: 1.0 when all rates are equal, 1/n when one station gets everything."""
+    rates = np.asarray(rates, dtype=np.float64)
+    if len(rates) == 0 or not rates.any():
+        return 1.0
+    return float(rates.sum() ** 2 / (len(rates) * (rates ** 2).sum()))
+
+
+def report(stations, elapsed):
+    per_station = {s.sid: s.stats(elapsed) for s in stations}
+    rates = [s["fps"] for s in per_station.values()]
+    return {
+        "seconds": elapsed,
+        "throughput_fps": float(sum(rates)),
+        "fairness": fairness(rates),
+        "stations": per_station,
+    }
+
+
+def format_server_report(r):
+    lines = ["{:.1f} s, {:.1f} frames/s total, fairness {:.3f}".format(
+        r["seconds"], r["throughput_fps"], r["fairness"])]
+    lines.append("  {:>3} {:<12} {:>3} {:>7} {:>7} {:>8} {:>8} {:>8} {:>8} {:>8}".format(
+        "id", "source", "wk", "fps", "dropped", "lat p50", "lat p95", "e2e p50", "e2e p95", "infer"))
+    for sid, s in r["stations"].items():
+        lines.append("  {:>3} {:<12} {:>3} {:>7.1f} {:>7} {:>8.1f} {:>8.1f} {:>8.1f} {:>8.1f} {:>8.1f}".format(
+            sid, s["source"][:12], s["worker"], s["fps"], s["dropped"], s["latency_p50_ms"],
+            s["latency_p95_ms"], s["end_to_end_p50_ms"], s["end_to_end_p95_ms"], s["inference_p50_ms"]))
+    return "\n".join(lines)
+
+
+# ---------------- Server ----------------
+def serve(specs, workers=None, seconds=None, show=False, roi=True, report_every=None, backend="mediapipe"):
+    from frame_source import HeadlessSink, WindowSink
+
+    workers = min(workers or os.cpu_count() or 1, len(specs))
+    # A timed run loops its clips, so no station runs out early
+    stations = [Station(i, spec, i % workers, loop=seconds is not None) for i, spec in enumerate(specs)]
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    tasks = [ctx.Queue() for _ in range(workers)]
+    procs = []
+    sink = WindowSink() if show else HeadlessSink()
+    try:
+        for w in range(workers):
+            assigned = [(s.sid, s.shm.name, (s.height, s.width, 3)) for s in stations if s.worker == w]
+            proc = ctx.Process(target=_worker, args=(w, assigned, tasks[w], results, roi, backend), daemon=True)
+            proc.start()
+            procs.append(proc)
+        for _ in range(workers):
+            _, w, warm = results.get()
+            print("worker {} ready ({:.0f} ms)".format(w, 1000 * warm))
+
+        by_id = {s.sid: s for s in stations}
+        start = last_report = time.perf_counter()
+        turn = 0
+        while True:
+            now = time.perf_counter()
+            if seconds is not None and now - start >= seconds:
+                break
+            if all(s.done and not s.in_flight for s in stations):
+                break
+            if report_every and now - last_report >= report_every:
+                last_report = now
+                print(format_server_report(report(stations, now - start)))
+
+            # Rotate the starting station so none is always served first
+            for i in range(len(stations)):
+                s = stations[(turn + i) % len(stations)]
+                if not s.in_flight and not s.done:
+                    s.dispatch(tasks[s.worker])
+            turn += 1
+
+            try:
+                msg = results.get(timeout=0.005)
+            except queue.Empty:
+                continue
+            while True:
+                sid, points, inference_time = msg
+                by_id[sid].finish(points, inference_time, sink)
+                try:
+                    msg = results.get_nowait()
+                except queue.Empty:
+                    break
+
+            if sink.poll_key() in (27, ord('q')):
+                break
+        return report(stations, time.perf_counter() - start)
+    finally:
+        for t in tasks:
+            t.put(None)
+        for proc in procs:
+            proc.join(timeout=2.0)
+            if proc.is_alive():
+                proc.terminate()
+        for s in stations:
+            s.close()
+        sink.close()
+
+
+def main(argv=None):
+    from hands_model import BACKENDS
+
+    parser = argparse.ArgumentParser(description="Several Tic Tac Toe stations with a shared inference pool")
+    parser.add_argument("--sources", nargs="+", default=["0"],
+                        help="one frame source per station (camera index, video, image directory, synthetic[:WxH[:N[:FPS]]])")
+    parser.add_argument("--workers", type=int, default=None, help="inference processes (default: one per core)")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this long")
+    parser.add_argument("--show", action="store_true", help="open a window per station")
+    parser.add_argument("--no-roi", action="store_true", help="always run inference on the full frame")
+    parser.add_argument("--backend", default="mediapipe", choices=BACKENDS,
+                        help="hand detector (classic: no model, for slow machines, see classic_hands.py)")
+    parser.add_argument("--report-every", type=float, default=None, help="print the report every N seconds")
+    parser.add_argument("--json", help="also write the final report to this file")
+    args = parser.parse_args(argv)
+
+    r = serve(args.sources, args.workers, args.seconds, args.show, not args.no_roi, args.report_every, args.backend)
+    print(format_server_report(r))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=2)
+    return r
+
+
+if __name__ == "__main__":
+    main()
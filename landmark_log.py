@@ -0,0 +1,231 @@
+"""
+Landmark sessions: record what hands.process() returned, replay it later
+without a camera and without running the model.
+
+File layout: a 64-byte header followed by fixed-size records, one per
+process() call, so a session can be opened with np.memmap and indexed
+directly. The record count is taken from the file size, so a recording
+cut short by a crash opens with every record written before it.
+
+    header   magic, version, max hands, record size, frame width, frame height,
+             record count (informational, written on close)
+    record   t (seconds since the first call), frame (call index), num_hands,
+             handedness (0 = Left, 1 = Right) and score per hand,
+             landmarks (MAX_HANDS, 21, 3) normalized x, y, z
+"""
+import os
+import struct
+import time
+
+import numpy as np
+
+from frame_pool import FramePool
+from landmarks import NUM_LANDMARKS, HandArray
+
+MAGIC = b"GCLMREC\0"
+VERSION = 1
+MAX_HANDS = 2
+HANDEDNESS = ("Left", "Right")
+
+HEADER = struct.Struct("<8sHHIIIQ")
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype([
+    ("t", "<f8"),
+    ("frame", "<u4"),
+    ("num_hands", "u1"),
+    ("handedness", "u1", (MAX_HANDS,)),
+    ("score", "<f4", (MAX_HANDS,)),
+    ("landmarks", "<f4", (MAX_HANDS, NUM_LANDMARKS, 3)),
+])
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError("{} is not a landmark session".format(path))
+    magic, version, max_hands, record_size, width, height, count = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError("{} is not a landmark session".format(path))
+    if version != VERSION or max_hands != MAX_HANDS or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError("{}: unsupported session format (version {})".format(path, version))
+    return {"width": width, "height": height, "count": count}
+
+
+def load_session(path):
+    """
+    The records of a session as a read-only memory-mapped structured array,
+    plus its header. A partial record at the end (a crash mid-write) is left out.
+    """
+    header = read_header(path)
+    header["count"] = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if header["count"] == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE), header
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode="r",
+                        offset=HEADER_SIZE, shape=(header["count"],))
+    return records, header
+
+
+# ---------------- Recording ----------------
+class LandmarkRecorder:
+    """
+    Wraps a Hands object (mediapipe's or RoiHands) and appends one record to
+    path for every process() call. Results are passed through unchanged.
+    Every record is flushed to the file as it is written, so a process that
+    dies (e.g. in native code) leaves a session that still replays up to
+    the frame that killed it; close() only fills in the record count.
+    """
+
+    def __init__(self, hands, path):
+        self.hands = hands
+        self.path = path
+        self.count = 0
+        self.width = self.height = 0
+        self._file = open(path, "wb")
+        self._write_header()
+        self._record = np.zeros((), dtype=RECORD_DTYPE)
+        self._hand = HandArray()
+        self._start = None
+
+    def process(self, rgb):
+        result = self.hands.process(rgb)
+        now = time.perf_counter()
+        if self._start is None:
+            self._start = now
+            self.height, self.width = rgb.shape[:2]
+            self._write_header()
+
+        rec = self._record
+        rec["t"] = now - self._start
+        rec["frame"] = self.count
+        found = result.multi_hand_landmarks or []
+        n = min(len(found), MAX_HANDS)
+        rec["num_hands"] = n
+        rec["landmarks"][n:] = 0
+        rec["handedness"][n:] = 0
+        rec["score"][n:] = 0
+        for i in range(n):
+            rec["landmarks"][i] = self._hand.load(found[i]).points
+            if result.multi_handedness:
+                cls = result.multi_handedness[i].classification[0]
+                rec["handedness"][i] = HANDEDNESS.index(cls.label)
+                rec["score"][i] = cls.score
+        self._file.write(rec.tobytes())
+        self._file.flush()
+        self.count += 1
+        return result
+
+    def _write_header(self):
+        end = self._file.tell()
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, MAX_HANDS, RECORD_DTYPE.itemsize,
+                                     self.width, self.height, self.count).ljust(HEADER_SIZE, b"\0"))
+        self._file.seek(max(end, HEADER_SIZE))
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._write_header()
+        self._file.close()
+
+
+def stop_recording(hands):
+    """Closes a LandmarkRecorder and returns the Hands it wrapped (anything else is returned as is)."""
+    if isinstance(hands, LandmarkRecorder):
+        hands.close()
+        print("recorded {} frames to {}".format(hands.count, hands.path))
+        return hands.hands
+    return hands
+
+
+# ---------------- Replay ----------------
+class ReplayResult:
+    """The parts of a mediapipe result the apps use, backed by the session file."""
+
+    __slots__ = ("multi_hand_landmarks", "handedness")
+
+    def __init__(self, landmarks, handedness):
+        self.multi_hand_landmarks = landmarks   # list of (21, 3) arrays, or None like mediapipe
+        self.handedness = handedness            # list of (label, score)
+
+
+class ReplayHands:
+    """
+    Stands in for Hands: process() returns the record of the frame last read
+    from the session, or the given record (one taken at read time, for a
+    caller that reads the next frame before processing this one).
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def process(self, rgb, record=None):
+        rec = self.session.current if record is None else record
+        n = int(rec["num_hands"])
+        if n == 0:
+            return ReplayResult(None, [])
+        return ReplayResult(list(rec["landmarks"][:n]),
+                            [(HANDEDNESS[h], float(s)) for h, s in zip(rec["handedness"][:n], rec["score"][:n])])
+
+    def close(self):
+        pass
+
+
+class ReplaySession:
+    """
+    A recorded session used as both frame source and hand tracker: read()
+    returns a blank frame of the recorded size for every record, and
+    session.hands answers process() with that record's landmarks. With
+    realtime=True, read() waits until the record's original time; otherwise
+    the loop runs as fast as the app's own code allows.
+
+    frame_time is the recorded time of the frame last read, as a
+    perf_counter() time counted from the first read (see
+    capture.frame_timestamp), so cursor filters, gesture debouncing and hold
+    timers see the recorded timing however fast the replay runs. A looping
+    session keeps counting on from the end of the recording.
+
+    Replay feeds exactly the recorded inference results, so run it without
+    an InferenceScheduler (which decides per frame from the clock).
+    """
+
+    def __init__(self, path, realtime=False, loop=False):
+        self.records, header = load_session(path)
+        self.realtime = realtime
+        self.loop = loop
+        self.frame = np.zeros((header["height"], header["width"], 3), dtype=np.uint8)
+        self.pool = FramePool()
+        self.hands = ReplayHands(self)
+        self.current = None
+        self.frame_time = None
+        self.pos = 0
+        self._base = None       # perf_counter() time of recorded t = 0
+
+    def read(self, image=None):
+        if self.pos >= len(self.records):
+            if not self.loop or len(self.records) == 0:
+                return False, None
+            # Start over one frame interval after the last record
+            ts = self.records["t"]
+            gap = float(ts[-1] - ts[-2]) if len(ts) > 1 else 1 / 30
+            self._base = self.frame_time + gap - float(ts[0])
+            self.pos = 0
+        self.current = self.records[self.pos]
+        self.pos += 1
+        t = float(self.current["t"])
+        if self._base is None:
+            self._base = time.perf_counter() - t
+        self.frame_time = self._base + t
+        if self.realtime:
+            delay = self.frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if image is None or image.shape != self.frame.shape:
+            image = self.pool.get(self.frame.shape)
+        np.copyto(image, self.frame)
+        return True, image
+
+    def release(self):
+        self.records = None
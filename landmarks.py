@@ -0,0 +1,109 @@
+import cv2
+import numpy as np
+
+# ---------------- Landmark Indices ----------------
+NUM_LANDMARKS = 21
+WRIST = 0
+THUMB, INDEX, MIDDLE, RING, PINKY = range(5)
+
+# Tip of each finger (thumb first) and the joint two landmarks below it.
+# A finger counts as "up" when its tip is above that joint in the image.
+FINGER_TIPS = np.array([4, 8, 12, 16, 20])
+FINGER_PIPS = FINGER_TIPS - 2
+
+# Same bones as mediapipe's HAND_CONNECTIONS
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+)
+
+
+class HandArray:
+    """
+    One hand's landmarks as a preallocated (21, 3) float32 array of
+    normalized x, y, z.
+
+    load() copies a mediapipe landmark list into the array once per frame;
+    everything after that is a vectorized expression over the array, written
+    into buffers that are allocated once and reused every frame. points can
+    be handed in, e.g. one row of a HandBatch (see hand_tracks.py).
+    """
+
+    def __init__(self, points=None):
+        self.points = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32) if points is None else points
+        self._tip_y = np.zeros(5, dtype=np.float32)
+        self._pip_y = np.zeros(5, dtype=np.float32)
+        self._up = np.zeros(5, dtype=bool)
+        self._folded = np.zeros(5, dtype=bool)
+        self._centroid = np.zeros(2, dtype=np.float64)
+        self._pixels = np.zeros((NUM_LANDMARKS, 2), dtype=np.float32)
+        self._pixels_int = np.zeros((NUM_LANDMARKS, 2), dtype=np.int32)
+
+    def load(self, hand_landmarks):
+        """Fills the array from a mediapipe NormalizedLandmarkList or an (21, 3) array."""
+        pts = self.points
+        if isinstance(hand_landmarks, np.ndarray):
+            np.copyto(pts, hand_landmarks)
+            return self
+        for i, lm in enumerate(hand_landmarks.landmark):
+            pts[i, 0] = lm.x
+            pts[i, 1] = lm.y
+            pts[i, 2] = lm.z
+        return self
+
+    def mirror(self):
+        """Flips x (x -> 1 - x), for landmarks found on an unmirrored frame."""
+        xs = self.points[:, 0]
+        np.subtract(1.0, xs, out=xs)
+        return self
+
+    def _finger_y(self):
+        ys = self.points[:, 1]
+        np.take(ys, FINGER_TIPS, out=self._tip_y)
+        np.take(ys, FINGER_PIPS, out=self._pip_y)
+
+    def fingers_up(self):
+        """Bool array (thumb, index, middle, ring, pinky): tip above the joint below it."""
+        self._finger_y()
+        return np.less(self._tip_y, self._pip_y, out=self._up)
+
+    def fingers_folded(self):
+        """Bool array (thumb, index, middle, ring, pinky): tip below the joint below it."""
+        self._finger_y()
+        return np.greater(self._tip_y, self._pip_y, out=self._folded)
+
+    def centroid(self):
+        """Mean normalized (x, y) of all landmarks."""
+        return self.points[:, :2].mean(axis=0, dtype=np.float64, out=self._centroid)
+
+    def pixel(self, idx, w, h):
+        """Pixel position of one landmark, rounded the way the apps always did."""
+        return int(float(self.points[idx, 0]) * w), int(float(self.points[idx, 1]) * h)
+
+    def centroid_pixel(self, w, h):
+        cx, cy = self.centroid()
+        return int(cx * w), int(cy * h)
+
+    def to_pixels(self, w, h):
+        """All landmarks as an (21, 2) int32 pixel array (reused between calls)."""
+        np.multiply(self.points[:, :2], (w, h), out=self._pixels)
+        np.copyto(self._pixels_int, self._pixels, casting="unsafe")
+        return self._pixels_int
+
+
+def draw_hand(img, hand, bone_color=(224, 224, 224), joint_color=(0, 0, 255)):
+    """
+    Draws a HandArray the way mp.solutions.drawing_utils.draw_landmarks draws
+    a landmark list. Works for predicted / replayed hands that never came out
+    of mediapipe.
+    """
+    h, w = img.shape[:2]
+    px = hand.to_pixels(w, h)
+    for a, b in HAND_CONNECTIONS:
+        cv2.line(img, (int(px[a, 0]), int(px[a, 1])), (int(px[b, 0]), int(px[b, 1])), bone_color, 2)
+    for x, y in px:
+        cv2.circle(img, (int(x), int(y)), 3, (224, 224, 224), -1)
+        cv2.circle(img, (int(x), int(y)), 2, joint_color, 2)
@@ -0,0 +1,179 @@
+"""
+One process hosting all three apps, sharing a single warm Hands model and
+one open camera, with hot switching between them.
+
+    python launcher.py
+    python launcher.py --start game_play2 --source clip.mp4
+
+Keys: 1 Air Canvas, 2 Tic Tac Toe (hover), 3 Tic Tac Toe (fist), Tab next
+app, q / ESC quit. Holding an open palm (all five fingers up) for --hold
+seconds also switches to the next app. Apps are imported the first time they
+are shown and keep their state (drawing, game) when switched away from.
+Cold start and switch times are printed on exit.
+"""
+import time
+
+# Everything below is measured from here
+_start = time.perf_counter()
+
+import argparse
+import importlib
+
+APPS = ("color_canvas", "game_option", "game_play2")
+APP_KEYS = {ord("1"): "color_canvas", ord("2"): "game_option", ord("3"): "game_play2"}
+NEXT_APP_KEY = 9    # Tab
+QUIT_KEYS = (27, ord("q"))
+SWITCH_KEYS = tuple(APP_KEYS) + (NEXT_APP_KEY,)
+
+
+class PalmSwitch:
+    """
+    Wraps the shared Hands object and watches its results for an open palm
+    held for `hold` seconds. The palm has to be lowered (or change shape)
+    before it can trigger again, so one gesture is one switch.
+    """
+
+    def __init__(self, hands, hold=1.5):
+        from gestures import GestureEngine
+        from landmarks import HandArray
+        self.hands = hands
+        self.hold = hold
+        self.requested = False
+        self._hand = HandArray()
+        # The palm's HOLD event fires once per gesture (see gestures.py)
+        self._gestures = GestureEngine(holds={"palm": hold})
+
+    def process(self, rgb):
+        result = self.hands.process(rgb)
+        hand = self._hand.load(result.multi_hand_landmarks[0]) if result.multi_hand_landmarks else None
+        if self._gestures.update(hand, time.perf_counter()) and self._gestures.held("palm"):
+            self.requested = True
+        return result
+
+    def take_request(self):
+        requested, self.requested = self.requested, False
+        return requested
+
+
+class LauncherSink:
+    """
+    Passes everything on to the real sink. poll_key() also reports the palm
+    gesture as NEXT_APP_KEY, and the first show() after start_timing()
+    records how long it took to get a frame on screen.
+    """
+
+    def __init__(self, sink, palm):
+        self.sink = sink
+        self.palm = palm
+        self.timings = []       # (label, seconds)
+        self._label = None
+        self._since = None
+
+    def start_timing(self, label, since):
+        self._label, self._since = label, since
+
+    def open_window(self, name, fullscreen=False):
+        self.sink.open_window(name, fullscreen)
+
+    def show(self, name, img):
+        self.sink.show(name, img)
+        if self._label is not None:
+            self.timings.append((self._label, time.perf_counter() - self._since))
+            self._label = None
+
+    def poll_key(self):
+        key = self.sink.poll_key()
+        if key in (-1, 255) and self.palm is not None and self.palm.take_request():
+            return NEXT_APP_KEY
+        return key
+
+    def close(self):
+        self.sink.close()
+
+
+def main(argv=None):
+    from hands_model import BACKENDS
+
+    parser = argparse.ArgumentParser(description="Run the gesture apps in one process with hot switching")
+    parser.add_argument("--start", default="game_play2", choices=APPS, help="app shown first")
+    parser.add_argument("--source", default="0",
+                        help="camera index, video file, image directory or synthetic[:WxH[:N[:FPS]]]")
+    parser.add_argument("--hold", type=float, default=1.5,
+                        help="seconds to hold an open palm to switch apps (0 = gesture off)")
+    parser.add_argument("--backend", default="mediapipe", choices=BACKENDS,
+                        help="hand detector (classic: no model, for slow machines, see classic_hands.py)")
+    args = parser.parse_args(argv)
+
+    startup = []    # (step, seconds) of the cold start
+
+    def step(name, since):
+        now = time.perf_counter()
+        startup.append((name, now - since))
+        return now
+
+    t = _start
+    from capture import print_capture_stats
+    from frame_source import open_source, WindowSink
+    from hands_model import create_hands, set_mirrored, warm_up
+    from metrics import make_timer
+    from roi_hands import RoiHands, print_roi_stats
+    t = step("imports", t)
+    if args.backend == "mediapipe":
+        importlib.import_module("mediapipe")
+        t = step("mediapipe import", t)
+        model = create_hands(roi=False, warm=False)
+        t = step("model load", t)
+        warm_up(model)
+        t = step("warm-up", t)
+        hands = RoiHands(model)
+    else:
+        hands = create_hands(backend=args.backend)
+        t = step("model load", t)
+    cap = open_source(args.source, threaded=True)
+    t = step("camera open", t)
+
+    palm = PalmSwitch(hands, args.hold) if args.hold > 0 else None
+    sink = LauncherSink(WindowSink(), palm)
+    sink.start_timing("cold start", _start)
+
+    apps = {}
+    current = args.start
+    try:
+        while True:
+            if current not in apps:
+                t = time.perf_counter()
+                apps[current] = importlib.import_module(current)
+                startup.append(("import " + current, time.perf_counter() - t))
+            app = apps[current]
+            app.hands = palm if palm is not None else hands
+            # Some apps flip the frame before inference, game_play2 does not
+            set_mirrored(hands, app.mirrored_frames)
+            for cursor in getattr(app, "cursors", None) or [app.cursor]:
+                cursor.reset()
+            timer = make_timer(current, app.profiling, app.profile_hud, app.profile_dir)
+
+            key = app.run(cap, sink, timer, switch_keys=SWITCH_KEYS)
+            if key is None or key in QUIT_KEYS:
+                break
+            switched_at = time.perf_counter()
+            if key == NEXT_APP_KEY:
+                target = APPS[(APPS.index(current) + 1) % len(APPS)]
+            else:
+                target = APP_KEYS[key]
+            sink.close()    # the next app opens its own windows
+            sink.start_timing("switch {} -> {}".format(current, target), switched_at)
+            current = target
+    finally:
+        print("load times:")
+        for name, seconds in startup:
+            print("  {:<24} {:>8.1f} ms".format(name, 1000 * seconds))
+        for label, seconds in sink.timings:
+            print("{:<26} {:>8.1f} ms".format(label, 1000 * seconds))
+        print_capture_stats(cap)
+        print_roi_stats(hands)
+        cap.release()
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+# Key of a layer that has to be rebuilt no matter what key it is asked for
+_STALE = object()
+
+
+class LayerCache:
+    """
+    Pre-rendered static layers for a fixed-size canvas.
+
+    Each layer has a key describing what is drawn on it (e.g. the board
+    contents). layer() only calls the build function when the key changed
+    since the last time, otherwise it returns the cached image. compose()
+    copies a layer into one canvas buffer that is reused every frame, so the
+    per-frame cost is a single memcpy plus whatever is drawn on top.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.frame = np.full((height, width, 3), 255, dtype=np.uint8)
+        self._layers = {}   # name -> [key, image]
+        self.rebuilds = 0
+
+    def layer(self, name, key, build):
+        entry = self._layers.get(name)
+        if entry is None:
+            entry = [_STALE, np.empty((self.height, self.width, 3), dtype=np.uint8)]
+            self._layers[name] = entry
+        elif entry[0] == key:
+            return entry[1]
+        build(entry[1])
+        entry[0] = key
+        self.rebuilds += 1
+        return entry[1]
+
+    def compose(self, name, key, build, dst=None):
+        if dst is None:
+            dst = self.frame
+        np.copyto(dst, self.layer(name, key, build))
+        return dst
+
+    def invalidate(self, name=None):
+        """Forces the named layer (or every layer) to be rebuilt on next use."""
+        if name is None:
+            for entry in self._layers.values():
+                entry[0] = _STALE
+        elif name in self._layers:
+            self._layers[name][0] = _STALE
+
+
+class Sprite:
+    """
+    A pre-rendered overlay that only covers the pixels its build function
+    paints. build(img) is run once on a black and once on a white image: a
+    pixel that comes out the same in both was painted over, one that differs
+    was left alone or (anti-aliased edges) only partly covered. stamp() copies
+    the painted pixels and blends the partly covered ones with what is
+    underneath, so the result matches running build() on the image itself.
+    """
+
+    def __init__(self, width, height, build):
+        dark = np.zeros((height, width, 3), dtype=np.uint8)
+        light = np.full((height, width, 3), 255, dtype=np.uint8)
+        build(dark)
+        build(light)
+        see_through = light - dark      # 0 = painted, 255 = untouched
+        self.image = dark
+        painted = (see_through == 0).all(axis=2)
+        self.mask = painted.astype(np.uint8)
+        partial = ~painted & (see_through < 255).any(axis=2)
+        self.partial_yx = np.nonzero(partial)
+        self.partial_image = dark[self.partial_yx].astype(np.uint16)
+        self.partial_see_through = see_through[self.partial_yx].astype(np.uint16)
+
+    def stamp(self, img, x=0, y=0):
+        h, w = self.image.shape[:2]
+        if y + h > img.shape[0] or x + w > img.shape[1]:
+            raise ValueError("sprite does not fit into the image at ({}, {})".format(x, y))
+        roi = img[y:y + h, x:x + w]
+        cv2.copyTo(self.image, self.mask, roi)
+        if len(self.partial_yx[0]):
+            under = roi[self.partial_yx].astype(np.uint16)
+            blended = self.partial_image + (under * self.partial_see_through + 127) // 255
+            roi[self.partial_yx] = np.minimum(blended, 255)
+        return img
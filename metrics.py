@@ -0,0 +1,179 @@
+import bisect
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from stage_timer import STAGES, StageTimer, null_timer
+
+# Histogram bucket upper bounds in seconds: 50 us to ~2 s, 4 per octave
+BUCKETS = tuple(0.00005 * 2 ** (i / 4) for i in range(62))
+
+
+class RollingHistogram:
+    """
+    Bucketed latency histogram over the last `window` samples (for the HUD
+    and percentiles), plus cumulative counts since start (for Prometheus).
+    Adding a sample is a bisect and two counter updates, no allocation.
+    """
+
+    def __init__(self, window=300):
+        self.window = window
+        self.ring = np.zeros(window, dtype=np.int16)
+        self.pos = 0
+        self.filled = 0
+        self.counts = np.zeros(len(BUCKETS) + 1, dtype=np.int64)        # last `window` samples
+        self.total_counts = np.zeros(len(BUCKETS) + 1, dtype=np.int64)  # since start
+        self.total_sum = 0.0
+        self.total = 0
+
+    def add(self, seconds):
+        idx = bisect.bisect_left(BUCKETS, seconds)
+        if self.filled == self.window:
+            self.counts[self.ring[self.pos]] -= 1
+        else:
+            self.filled += 1
+        self.ring[self.pos] = idx
+        self.pos = (self.pos + 1) % self.window
+        self.counts[idx] += 1
+        self.total_counts[idx] += 1
+        self.total_sum += seconds
+        self.total += 1
+
+    def percentile(self, q):
+        """Upper bound (seconds) of the bucket holding the q-th percentile of the window."""
+        if self.filled == 0:
+            return 0.0
+        rank = q / 100.0 * self.filled
+        idx = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return BUCKETS[min(idx, len(BUCKETS) - 1)]
+
+
+class StageMetrics(StageTimer):
+    """
+    Live per-stage profiling for the main loops: a StageTimer (same
+    start_frame / lap / end_frame calls) that keeps bounded histograms
+    instead of every sample, so it can stay on for a whole session.
+
+    Every stage keeps a RollingHistogram. The numbers can be read three ways:
+    overlay() draws an on-screen HUD, and every `interval` seconds
+    end_frame() appends a JSON line to jsonl_path and rewrites a Prometheus
+    text file at prom_path (e.g. for node_exporter's textfile collector).
+    When profiling is off the apps use stage_timer.null_timer instead, so
+    the cost is a few empty method calls per frame.
+    """
+
+    def __init__(self, app, hud=True, jsonl_path=None, prom_path=None, interval=1.0, window=300):
+        super().__init__()
+        self.app = app
+        self.hud = hud
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.interval = interval
+        self.window = window
+        self.histograms = {}
+        self.frame = RollingHistogram(window)
+        self._next_export = time.perf_counter() + interval
+        self._hud_lines = []
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        now = time.perf_counter()
+        self.frame.add(now - self._frame_start)
+        for stage, seconds in self._frame.items():
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = RollingHistogram(self.window)
+            hist.add(seconds)
+        self._frame_start = None
+
+        if now >= self._next_export:
+            self._next_export = now + self.interval
+            self._hud_lines = self._format_hud()
+            if self.jsonl_path:
+                self.write_jsonl()
+            if self.prom_path:
+                self.write_prometheus()
+
+    def stage_names(self):
+        names = [s for s in STAGES if s in self.histograms]
+        return names + [s for s in self.histograms if s not in STAGES]
+
+    def snapshot(self):
+        mean_frame = self.frame.total_sum / max(self.frame.total, 1)
+        stages = {}
+        for stage in self.stage_names() + ["frame"]:
+            hist = self.frame if stage == "frame" else self.histograms[stage]
+            stages[stage] = {
+                "p50_ms": 1000 * hist.percentile(50),
+                "p95_ms": 1000 * hist.percentile(95),
+                "p99_ms": 1000 * hist.percentile(99),
+            }
+        return {
+            "time": time.time(),
+            "app": self.app,
+            "frames": self.frame.total,
+            "fps": 1.0 / mean_frame if mean_frame > 0 else 0.0,
+            "stages": stages,
+        }
+
+    # ---------------- Outputs ----------------
+    def _format_hud(self):
+        snap = self.snapshot()
+        lines = ["{:.0f} FPS   p50 / p95 ms".format(snap["fps"])]
+        for stage, s in snap["stages"].items():
+            lines.append("{:<10}{:>6.1f}{:>7.1f}".format(stage, s["p50_ms"], s["p95_ms"]))
+        return lines
+
+    def overlay(self, img):
+        """Draws the HUD (refreshed every interval) into the top right corner of img."""
+        if not self.hud or not self._hud_lines:
+            return
+        x = img.shape[1] - 250
+        for i, line in enumerate(self._hud_lines):
+            y = 20 + 18 * i
+            cv2.putText(img, line, (x, y), cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 0, 0), 3)
+            cv2.putText(img, line, (x, y), cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 255, 255), 1)
+
+    def write_jsonl(self):
+        with open(self.jsonl_path, "a") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def write_prometheus(self):
+        lines = [
+            "# HELP gesture_stage_seconds Time spent per frame in each stage of the main loop.",
+            "# TYPE gesture_stage_seconds histogram",
+        ]
+        for stage in self.stage_names() + ["frame"]:
+            hist = self.frame if stage == "frame" else self.histograms[stage]
+            labels = 'app="{}",stage="{}"'.format(self.app, stage)
+            cumulative = np.cumsum(hist.total_counts)
+            for bound, count in zip(BUCKETS, cumulative):
+                lines.append('gesture_stage_seconds_bucket{{{},le="{:.6g}"}} {}'.format(labels, bound, count))
+            lines.append('gesture_stage_seconds_bucket{{{},le="+Inf"}} {}'.format(labels, hist.total))
+            lines.append("gesture_stage_seconds_sum{{{}}} {:.6f}".format(labels, hist.total_sum))
+            lines.append("gesture_stage_seconds_count{{{}}} {}".format(labels, hist.total))
+        # Write then rename, so a scraper never reads a half-written file
+        tmp = self.prom_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.prom_path)
+
+
+def make_timer(app, profiling=False, hud=True, output_dir=None):
+    """
+    The timer an app's main() hands to run(): stage_timer.null_timer when
+    profiling is off, otherwise StageMetrics writing <app>.jsonl and
+    <app>.prom into output_dir (if given).
+    """
+    if not profiling:
+        return null_timer
+    jsonl_path = prom_path = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        jsonl_path = os.path.join(output_dir, app + ".jsonl")
+        prom_path = os.path.join(output_dir, app + ".prom")
+    return StageMetrics(app, hud=hud, jsonl_path=jsonl_path, prom_path=prom_path)
@@ -0,0 +1,364 @@
+"""
+Microbenchmarks of the functions the main loops call every frame, with a
+stored baseline to catch regressions.
+
+Nothing opens a camera or a window (the apps only do that in main()), so the
+game, gesture and drawing functions are imported and run straight over fixed
+synthetic inputs: a set of mid-game boards, landmark sets of an open hand,
+pointing, two fingers, a fist and a pinch, and a canvas with ink on it.
+
+    python microbench.py
+    python microbench.py --baseline microbench.json
+    python microbench.py --save microbench.json --repeat 9
+
+microbench.json is the committed baseline; compare against it before and
+after a change to a hot path, and save it again (on the machine it was
+saved on, see its "machine" entry) when a change is meant to be slower.
+
+Every case is timed as the best of --repeat runs of as many calls as take
+about 0.2 s, and reported in microseconds per call. --save writes the
+timings as a baseline; with --baseline the run exits with status 1 when a
+case is more than threshold (0.25 = 25 %) slower than its baseline.
+Timings depend on the machine, so compare against a baseline saved on the
+same one; a warning is printed when the baseline comes from another
+machine or Python.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import timeit
+import types
+
+import numpy as np
+
+import game_play2
+from gestures import GestureBatch, GestureEngine
+from hand_tracks import HandBatch, HandTracker
+from ink_canvas import InkCanvas, Viewport
+from landmarks import NUM_LANDMARKS, HandArray
+from ttt_engine import Board, Solver
+
+CASES = {}      # name -> function building the case: returns (callable, calls per run)
+
+
+def case(name):
+    def register(build):
+        CASES[name] = build
+        return build
+    return register
+
+
+# ---------------- Fixtures ----------------
+def boards(count=64, n=3, seed=0):
+    """count positions of random games, 2 to n * n - 2 moves in, none of them finished."""
+    rng = random.Random(seed)
+    found = []
+    while len(found) < count:
+        board = Board(n)
+        for move in range(rng.randint(2, n * n - 2)):
+            board.place(*rng.choice(board.empty_cells()), 'X' if move % 2 == 0 else 'O')
+            if board.winner:
+                break
+        if not board.winner:
+            found.append(board)
+    return found
+
+
+def hand_points(up, pinch=False):
+    """
+    (21, 3) landmarks of a right hand in the middle of the frame with the
+    fingers in `up` (thumb = 0 ... pinky = 4) extended and the others folded;
+    pinch=True brings thumb and index tip together.
+    """
+    pts = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+    pts[0] = (0.5, 0.75, 0.0)
+    for finger, x in enumerate((0.40, 0.45, 0.50, 0.55, 0.60)):
+        base = 1 + 4 * finger
+        for joint in range(4):
+            if finger in up:
+                y = 0.60 - 0.06 * joint
+            else:
+                y = 0.60 - 0.03 * min(joint, 1) + 0.02 * max(joint - 1, 0)
+            pts[base + joint] = (x, y, -0.01 * joint)
+    if pinch:
+        pts[4, :2] = pts[8, :2] + 0.005
+    return pts
+
+
+HAND_POSES = (
+    hand_points(range(5)),          # open palm
+    hand_points((1,)),              # pointing
+    hand_points(()),                # fist
+    hand_points((1, 2)),            # two fingers
+    hand_points((2, 3, 4), pinch=True),
+)
+
+
+def landmark_list(points):
+    """points as a mediapipe NormalizedLandmarkList look-alike (.landmark with .x, .y, .z)."""
+    return types.SimpleNamespace(landmark=[types.SimpleNamespace(x=float(x), y=float(y), z=float(z))
+                                           for x, y, z in points])
+
+
+# ---------------- Game ----------------
+@case("check_winner")
+def check_winner_case():
+    game = game_play2.GameSession()
+    fixtures = boards()
+
+    def run():
+        for board in fixtures:
+            game.board = board
+            game.check_winner('X')
+    return run, len(fixtures)
+
+
+@case("get_cell_from_pos")
+def get_cell_case():
+    points = [(x, y) for x in range(0, game_play2.width, 55) for y in range(0, game_play2.height, 55)]
+
+    def run():
+        for x, y in points:
+            game_play2.get_cell_from_pos(x, y)
+    return run, len(points)
+
+
+@case("computer_move")
+def computer_move_case():
+    # The solver keeps its table between moves, as in a game: this is the steady cost of a reply
+    game = game_play2.GameSession(difficulty="hard")
+    game.symbols = ['X', 'O']
+    fixtures = [b for b in boards() if not b.is_full()]
+    board = Board(game_play2.board_n, game_play2.win_k)
+    game.board = board
+
+    def run():
+        for b in fixtures:
+            board.x, board.o, board.winner = b.x, b.o, b.winner
+            game.computer_move()
+    return run, len(fixtures)
+
+
+@case("solver_first_move")
+def solver_cold_case():
+    # The first move of a session: a whole 3x3 search with an empty table
+    board = Board(3)
+
+    def run():
+        Solver(3).best_move(board, 'O')
+    return run, 1
+
+
+# ---------------- Hands and gestures ----------------
+@case("hand_load")
+def hand_load_case():
+    hand = HandArray()
+    lists = [landmark_list(p) for p in HAND_POSES]
+
+    def run():
+        for landmarks in lists:
+            hand.load(landmarks)
+    return run, len(lists)
+
+
+@case("fingers_up")
+def fingers_up_case():
+    hands = [HandArray().load(p) for p in HAND_POSES]
+
+    def run():
+        for hand in hands:
+            hand.fingers_up()
+    return run, len(hands)
+
+
+@case("gesture_classify")
+def classify_case():
+    # What is_fist() used to be: a fist (and every other gesture) is one row of the table
+    engine = GestureEngine()
+    hands = [HandArray().load(p) for p in HAND_POSES]
+
+    def run():
+        for hand in hands:
+            engine.classify(hand)
+    return run, len(hands)
+
+
+@case("gesture_update")
+def gesture_update_case():
+    engine = GestureEngine()
+    hands = [HandArray().load(p) for p in HAND_POSES]
+    clock = [0.0]
+
+    def run():
+        for hand in hands:
+            clock[0] += 1 / 30
+            engine.update(hand, clock[0])
+    return run, len(hands)
+
+
+@case("gesture_update_two_hands")
+def gesture_batch_case():
+    # Both hands of a frame classified together (per frame, not per hand)
+    gestures, batch = GestureBatch(2), HandBatch(2)
+    frames = [np.stack((HAND_POSES[i], HAND_POSES[i + 1])) for i in range(len(HAND_POSES) - 1)]
+    index = np.arange(2)
+    clock = [0.0]
+
+    def run():
+        for points in frames:
+            clock[0] += 1 / 30
+            gestures.update(batch.load_points(points), index, clock[0])
+    return run, len(frames)
+
+
+@case("track_two_hands")
+def track_case():
+    batch, tracker = HandBatch(2), HandTracker(2)
+    frames = [np.stack((HAND_POSES[i], HAND_POSES[i + 1] + (0.2, 0.0, 0.0))) for i in range(len(HAND_POSES) - 1)]
+    clock = [0.0]
+
+    def run():
+        for points in frames:
+            clock[0] += 1 / 30
+            batch.load_points(points)
+            tracker.assign(batch, clock[0])
+            batch.centroid_pixels(640, 480)
+    return run, len(frames)
+
+
+# ---------------- Drawing ----------------
+@case("draw_board")
+def draw_board_case():
+    # A frame between moves: the board layer comes from the cache
+    game = game_play2.GameSession()
+    game.board = boards(1)[0]
+    game.draw_board(game.layers.frame)
+
+    def run():
+        game.draw_board(game.layers.frame)
+    return run, 1
+
+
+@case("draw_board_rebuild")
+def draw_board_rebuild_case():
+    # A frame after a move: the board layer is drawn again
+    game = game_play2.GameSession()
+    game.board = boards(1)[0]
+
+    def run():
+        game.layers.invalidate("board")
+        game.draw_board(game.layers.frame)
+    return run, 1
+
+
+@case("draw_selection_screen")
+def draw_selection_case():
+    game = game_play2.GameSession()
+    x, y, w, h = game_play2.x_box
+    hover = [(x + w // 2, y + h // 2)]
+
+    def run():
+        game.draw_selection_screen(game.layers.frame, hover)
+    return run, 1
+
+
+def inked_canvas():
+    rng = np.random.default_rng(0)
+    ink = InkCanvas()
+    for _ in range(40):
+        x0, y0, x1, y1 = (int(v) for v in rng.integers(0, (640, 480, 640, 480)))
+        ink.line((x0, y0), (x1, y1), (255, 0, 0), 5)
+    return ink
+
+
+@case("canvas_composite")
+def composite_case():
+    ink = inked_canvas()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def run():
+        ink.composite(frame, None)
+    return run, 1
+
+
+@case("canvas_composite_zoomed")
+def composite_zoomed_case():
+    ink = inked_canvas()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    view = Viewport()
+    view.zoom_at(0.7, 320, 240)
+
+    def run():
+        ink.composite(frame, view)
+    return run, 1
+
+
+# ---------------- Running ----------------
+def time_case(name, repeat=5):
+    """Best time of one call of case name, in microseconds."""
+    run, calls = CASES[name]()
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat, number))
+    return 1e6 * best / number / calls
+
+
+def compare(results, baseline, threshold):
+    """(name, us, baseline us or None, ratio or None, regressed) for every case run."""
+    rows = []
+    for name, us in results.items():
+        base = baseline.get(name)
+        ratio = us / base if base else None
+        rows.append((name, us, base, ratio, ratio is not None and ratio > 1 + threshold))
+    return rows
+
+
+def format_rows(rows):
+    lines = ["{:<26} {:>10} {:>10} {:>8}".format("case", "us/call", "baseline", "change")]
+    for name, us, base, ratio, regressed in rows:
+        lines.append("{:<26} {:>10.2f} {:>10} {:>8}{}".format(
+            name, us, "-" if base is None else "{:.2f}".format(base),
+            "-" if ratio is None else "{:+.0%}".format(ratio - 1), "  REGRESSION" if regressed else ""))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the per-frame hot paths")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (the best one counts)")
+    parser.add_argument("--baseline", help="compare against timings saved with --save")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fail when a case is this much slower than its baseline (0.25 = 25%%)")
+    parser.add_argument("--save", help="write the timings to this file as a baseline")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        baseline = saved["cases"]
+        here = (platform.python_version(), platform.machine())
+        there = (saved.get("python"), saved.get("machine"))
+        if here != there:
+            print("warning: the baseline was saved with Python {} on {}, this is Python {} on {}\n".format(
+                *there, *here))
+
+    results = {name: time_case(name, args.repeat) for name in args.cases}
+    rows = compare(results, baseline, args.threshold)
+    print(format_rows(rows))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                       "machine": platform.machine(), "cases": results}, f, indent=2)
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print("\n{} slower than the baseline by more than {:.0%}: {}".format(
+            len(regressions), args.threshold, ", ".join(regressions)))
+    return regressions
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,129 @@
+import cv2
+import numpy as np
+
+from frame_pool import FramePool
+
+
+class RoiHands:
+    """
+    Wraps a mediapipe Hands object and runs it on a crop around the hand
+    instead of the whole frame.
+
+    After a hand has been found, the next frame is cropped to a padded square
+    around the previous landmarks, optionally downscaled to max_side pixels,
+    and passed to hands.process(). The landmarks that come back are mapped
+    back to full-frame normalized coordinates in place, so the result looks
+    exactly like a full-frame result to the code using it (gestures, cursor
+    mapping, draw_landmarks). When the crop loses the hand, the same frame is
+    searched again at full size.
+
+    With max_hands > 1 the crop covers all hands found. While it holds fewer
+    than max_hands, every rescan-th frame is searched at full size, so a
+    hand entering elsewhere is found too.
+    """
+
+    def __init__(self, hands, padding=0.35, max_side=256, min_side=96, max_hands=1, rescan=15):
+        self.hands = hands
+        self.padding = padding      # extra margin on each side, as a fraction of the hand size
+        self.max_side = max_side    # crops bigger than this are downscaled (None = never)
+        self.min_side = min_side    # never crop smaller than this many pixels
+        self.roi = None             # (x0, y0, x1, y1) in pixels, or None to search the full frame
+        self.max_hands = max_hands
+        self.rescan = rescan
+        self._short = 0             # crops in a row with fewer than max_hands hands
+        self.pool = FramePool()     # crops are resized / copied into a reused buffer
+        self.full_frame_runs = 0
+        self.roi_runs = 0
+        self.roi_misses = 0
+
+    def process(self, rgb):
+        h, w = rgb.shape[:2]
+        if self.roi is not None and self._short >= self.rescan:
+            # Look for the missing hands on this frame (keeping the crop if there are none)
+            self._short = 0
+            self.full_frame_runs += 1
+            result = self.hands.process(rgb)
+            if result.multi_hand_landmarks:
+                self.roi = self._roi_around(result.multi_hand_landmarks, w, h)
+                return result
+        if self.roi is not None:
+            result = self._process_roi(rgb, w, h)
+            if result.multi_hand_landmarks:
+                self._short = self._short + 1 if len(result.multi_hand_landmarks) < self.max_hands else 0
+                return result
+            # Tracking lost: search the whole frame again
+            self.roi_misses += 1
+            self.roi = None
+
+        self.full_frame_runs += 1
+        result = self.hands.process(rgb)
+        if result.multi_hand_landmarks:
+            self.roi = self._roi_around(result.multi_hand_landmarks, w, h)
+        return result
+
+    def _process_roi(self, rgb, w, h):
+        x0, y0, x1, y1 = self.roi
+        crop = rgb[y0:y1, x0:x1]
+        cw, ch = x1 - x0, y1 - y0
+        side = max(cw, ch)
+        if self.max_side and side > self.max_side:
+            scale = self.max_side / side
+            size = (max(1, int(cw * scale)), max(1, int(ch * scale)))
+            crop = cv2.resize(crop, size, dst=self.pool.scratch((size[1], size[0], 3)),
+                              interpolation=cv2.INTER_AREA)
+        else:
+            buf = self.pool.scratch(crop.shape)
+            np.copyto(buf, crop)
+            crop = buf
+
+        self.roi_runs += 1
+        result = self.hands.process(crop)
+        if not result.multi_hand_landmarks:
+            return result
+
+        # Crop-normalized -> frame-normalized. Downscaling does not matter here
+        # because normalized coordinates are relative to the crop size.
+        sx, sy = cw / w, ch / h
+        ox, oy = x0 / w, y0 / h
+        for hand_landmarks in result.multi_hand_landmarks:
+            for lm in hand_landmarks.landmark:
+                lm.x = ox + lm.x * sx
+                lm.y = oy + lm.y * sy
+                lm.z = lm.z * sx    # z uses the same scale as x
+        self.roi = self._roi_around(result.multi_hand_landmarks, w, h)
+        return result
+
+    def _roi_around(self, multi_hand_landmarks, w, h):
+        # One box around every hand found
+        xs = [lm.x for hand_landmarks in multi_hand_landmarks for lm in hand_landmarks.landmark]
+        ys = [lm.y for hand_landmarks in multi_hand_landmarks for lm in hand_landmarks.landmark]
+        cx = (min(xs) + max(xs)) / 2 * w
+        cy = (min(ys) + max(ys)) / 2 * h
+        size = max((max(xs) - min(xs)) * w, (max(ys) - min(ys)) * h)
+        side = max(size * (1 + 2 * self.padding), self.min_side)
+        x0 = int(max(0, cx - side / 2))
+        y0 = int(max(0, cy - side / 2))
+        x1 = int(min(w, cx + side / 2))
+        y1 = int(min(h, cy + side / 2))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+    def stats(self):
+        runs = max(self.full_frame_runs + self.roi_runs, 1)
+        return {
+            "full_frame_runs": self.full_frame_runs,
+            "roi_runs": self.roi_runs,
+            "roi_misses": self.roi_misses,
+            "roi_fraction": self.roi_runs / runs,
+        }
+
+    def close(self):
+        self.hands.close()
+
+
+def print_roi_stats(hands):
+    if isinstance(hands, RoiHands):
+        s = hands.stats()
+        print("inference: {full_frame_runs} full-frame, {roi_runs} cropped, "
+              "{roi_misses} lost tracks ({roi_fraction:.0%} cropped)".format(**s))
@@ -0,0 +1,164 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+# Stages of one loop iteration, in the order the apps run them
+STAGES = ("capture", "convert", "inference", "logic", "landmarks", "render", "composite", "display")
+
+
+class StageTimer:
+    """
+    Lap timer for the main loops. Call start_frame() at the top of an
+    iteration, lap(stage) after each piece of work, and end_frame() at the
+    bottom. Time between two laps is charged to the stage named in the second
+    one; a stage lapped several times in one frame is summed.
+    """
+
+    def __init__(self):
+        self.samples = {}      # stage -> list of per-frame seconds
+        self.frame_times = []
+        self._frame = {}
+        self._frame_start = None
+        self._last = None
+
+    def start_frame(self):
+        self._frame_start = self._last = time.perf_counter()
+        self._frame = {}
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self._frame[stage] = self._frame.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        self.frame_times.append(time.perf_counter() - self._frame_start)
+        for stage, seconds in self._frame.items():
+            self.samples.setdefault(stage, []).append(seconds)
+        self._frame_start = None
+
+    def overlay(self, img):
+        """Live readout hook for the apps; plain timers draw nothing."""
+        pass
+
+    def report(self):
+        """FPS plus mean/p50/p95/p99 latency in milliseconds for each stage."""
+        frames = len(self.frame_times)
+        total = sum(self.frame_times)
+        report = {
+            "frames": frames,
+            "fps": frames / total if total > 0 else 0.0,
+            "stages": {},
+        }
+        names = [s for s in STAGES if s in self.samples]
+        names += [s for s in self.samples if s not in STAGES]
+        for stage in names + ["frame"]:
+            values = self.frame_times if stage == "frame" else self.samples[stage]
+            ms = np.asarray(values) * 1000.0
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            report["stages"][stage] = {
+                "mean": float(ms.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+            }
+        return report
+
+
+class AllocationTimer:
+    """
+    Same interface as StageTimer, but counts image-sized heap allocations
+    instead of time. Uses tracemalloc (NumPy and OpenCV output arrays are
+    traced): after each lap, the peak traced memory above the level at the
+    previous lap shows whether the stage allocated at least min_bytes, even
+    if the buffer was freed again before the lap. Each lap therefore counts
+    at most one allocation; zero means the stage reused its buffers.
+    """
+
+    def __init__(self, min_bytes=64 * 1024):
+        self.min_bytes = min_bytes
+        self.frames = 0
+        self.allocations = {}   # stage -> laps in which the stage allocated
+        self.bytes = {}         # stage -> largest allocation seen
+        self._base = 0
+        self._in_frame = False
+
+    def start_frame(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._base = tracemalloc.get_traced_memory()[0]
+        self._in_frame = True
+
+    def lap(self, stage):
+        current, peak = tracemalloc.get_traced_memory()
+        extra = peak - self._base
+        self.allocations.setdefault(stage, 0)
+        if extra >= self.min_bytes:
+            self.allocations[stage] += 1
+            self.bytes[stage] = max(self.bytes.get(stage, 0), extra)
+        tracemalloc.reset_peak()
+        self._base = current
+
+    def end_frame(self):
+        if self._in_frame:
+            self.frames += 1
+            self._in_frame = False
+
+    def overlay(self, img):
+        pass
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def report(self):
+        """Laps in which each stage allocated at least min_bytes, and the largest such allocation."""
+        names = [s for s in STAGES if s in self.allocations]
+        names += [s for s in self.allocations if s not in STAGES]
+        return {
+            "frames": self.frames,
+            "min_bytes": self.min_bytes,
+            "stages": {
+                stage: {"allocations": self.allocations[stage], "max_bytes": self.bytes.get(stage, 0)}
+                for stage in names
+            },
+        }
+
+
+class NullTimer:
+    """Stand-in used when nobody is measuring. Every call is a no-op."""
+
+    def start_frame(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def overlay(self, img):
+        pass
+
+
+null_timer = NullTimer()
+
+
+def format_report(name, report):
+    lines = ["{}: {} frames, {:.1f} FPS".format(name, report["frames"], report["fps"])]
+    lines.append("  {:<10} {:>8} {:>8} {:>8} {:>8}".format("stage", "mean", "p50", "p95", "p99"))
+    for stage, s in report["stages"].items():
+        lines.append("  {:<10} {:>8.2f} {:>8.2f} {:>8.2f} {:>8.2f}".format(
+            stage, s["mean"], s["p50"], s["p95"], s["p99"]))
+    return "\n".join(lines)
+
+
+def format_allocations(name, report):
+    lines = ["{}: image allocations (>= {} KiB) over {} frames".format(
+        name, report["min_bytes"] // 1024, report["frames"])]
+    lines.append("  {:<10} {:>8} {:>10}".format("stage", "count", "max KiB"))
+    for stage, s in report["stages"].items():
+        lines.append("  {:<10} {:>8} {:>10.0f}".format(stage, s["allocations"], s["max_bytes"] / 1024))
+    return "\n".join(lines)
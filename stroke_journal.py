@@ -0,0 +1,270 @@
+"""
+Stroke journal for the Air Canvas: every stroke as points, color and width,
+kept in growable NumPy arrays next to the InkCanvas tiles.
+
+Each new segment is drawn once, straight onto the raster. Undo and redo
+restore the nearest raster checkpoint (taken every checkpoint_every strokes)
+and replay the strokes after it. When more than max_strokes strokes are
+kept, the oldest ones are merged into the first checkpoint and dropped, so
+memory stays bounded however long the session; they can no longer be
+undone.
+
+Several hands can draw at once, each with its own pen: a stroke's points
+are collected apart while it is drawn and appended to the journal when it
+ends, so every stroke stays one run of points. (Where two of them cross,
+a replay paints them in the order they ended.)
+
+Points are in canvas coordinates (see ink_canvas.Viewport), so a drawing
+can extend past the screen in every direction.
+
+File layout (save / load):
+
+    header    magic, version, tile size, stroke count, point count,
+              number of base tiles
+    base      the tiles under the first stroke, each as (ty, tx, PNG size)
+              followed by the PNG
+    strokes   STROKE_DTYPE records
+    points    int32 (x, y) pairs
+"""
+import os
+import struct
+
+import cv2
+import numpy as np
+
+MAGIC = b"GCSTROKE"
+VERSION = 2
+HEADER = struct.Struct("<8sHHIII")
+BASE_TILE = struct.Struct("<iiI")
+
+# width 0 marks a "clear canvas" entry, so clearing can be undone too
+STROKE_DTYPE = np.dtype([
+    ("start", "<u4"),
+    ("length", "<u4"),
+    ("color", "u1", (3,)),
+    ("width", "u1"),
+])
+
+
+class OpenStroke:
+    """A stroke being drawn: its points are added to the journal when it ends."""
+
+    __slots__ = ("color", "width", "points", "length")
+
+    def __init__(self, color, width):
+        self.color = tuple(int(c) for c in color)
+        self.width = int(width)
+        self.points = np.zeros((64, 2), dtype=np.int32)
+        self.length = 0
+
+    def add(self, x, y):
+        if self.length == len(self.points):
+            self.points = np.resize(self.points, (2 * len(self.points), 2))
+        self.points[self.length] = (x, y)
+        self.length += 1
+
+
+class StrokeJournal:
+    """The strokes drawn on an InkCanvas, with undo / redo and save / load (see above)."""
+
+    def __init__(self, ink, checkpoint_every=16, max_strokes=256):
+        self.ink = ink
+        self.checkpoint_every = checkpoint_every
+        self.max_strokes = max_strokes
+        self.strokes = np.zeros(64, dtype=STROKE_DTYPE)
+        self.points = np.zeros((1024, 2), dtype=np.int32)
+        self.num_strokes = 0    # recorded, including undone strokes that can be redone
+        self.num_points = 0
+        self.visible = 0        # strokes currently on the canvas
+        self.merged = 0         # old strokes folded into the base checkpoint so far
+        self.checkpoints = [(0, ink.snapshot())]    # (stroke index, InkCanvas snapshot), base first
+        self._pens = {}         # pen -> its OpenStroke
+
+    # ---------------- Recording ----------------
+    def begin(self, color, width, pen=0):
+        """
+        Starts a stroke with `pen`; every hand drawing at the same time has its
+        own. Strokes that were undone can no longer be redone after this.
+        """
+        if pen in self._pens:
+            self.end(pen)
+        self._truncate()
+        self._pens[pen] = OpenStroke(color, width)
+
+    def add_point(self, x, y, pen=0):
+        """Adds a point to the open stroke of pen and draws the segment to it."""
+        stroke = self._pens[pen]
+        stroke.add(x, y)
+        if stroke.length > 1:
+            px, py = stroke.points[stroke.length - 2]
+            self.ink.line((int(px), int(py)), (int(x), int(y)), stroke.color, stroke.width)
+
+    def end(self, pen=None):
+        """Ends the open stroke of pen, or every open stroke (pen=None)."""
+        for p in list(self._pens) if pen is None else [pen]:
+            stroke = self._pens.pop(p, None)
+            if stroke is not None:
+                self._commit(stroke)
+
+    def _commit(self, stroke):
+        # Strokes are recorded in the order they end, each one's points in one run
+        n = stroke.length
+        if stroke.width and n < 2:
+            # A stroke of fewer than two points draws nothing, forget it
+            return
+        if self.num_strokes == len(self.strokes):
+            self.strokes = np.resize(self.strokes, 2 * len(self.strokes))
+        while self.num_points + n > len(self.points):
+            self.points = np.resize(self.points, (2 * len(self.points), 2))
+        rec = self.strokes[self.num_strokes]
+        rec["start"] = self.num_points
+        rec["length"] = n
+        rec["color"] = stroke.color
+        rec["width"] = stroke.width
+        self.points[self.num_points:self.num_points + n] = stroke.points[:n]
+        self.num_strokes += 1
+        self.num_points += n
+        self.visible = self.num_strokes
+        # No checkpoint while another stroke is still open: the raster holds
+        # part of it, which undoing back to the checkpoint would bring back
+        if not self._pens and self.visible - self.checkpoints[-1][0] >= self.checkpoint_every:
+            self.checkpoints.append((self.visible, self.ink.snapshot()))
+        while self.visible - self.checkpoints[0][0] > self.max_strokes and len(self.checkpoints) > 1:
+            self._merge()
+
+    def clear(self):
+        """Ends the open strokes and clears the canvas as an entry of its own, so it can be undone."""
+        self.end()
+        self.begin((0, 0, 0), 0)
+        self.ink.clear()
+        self.end()
+
+    # ---------------- Undo / Redo ----------------
+    def undo(self):
+        self.end()
+        if self.visible <= self.checkpoints[0][0]:
+            return False
+        self.visible -= 1
+        index, snapshot = max((c for c in self.checkpoints if c[0] <= self.visible), key=lambda c: c[0])
+        self.ink.restore(snapshot)
+        for i in range(index, self.visible):
+            self._replay(i)
+        return True
+
+    def redo(self):
+        if self._pens or self.visible >= self.num_strokes:
+            return False
+        self._replay(self.visible)
+        self.visible += 1
+        return True
+
+    def _replay(self, i):
+        rec = self.strokes[i]
+        if rec["width"] == 0:
+            self.ink.clear()
+            return
+        pts = self.points[rec["start"]:rec["start"] + rec["length"]]
+        color = tuple(int(c) for c in rec["color"])
+        width = int(rec["width"])
+        for (x0, y0), (x1, y1) in zip(pts[:-1], pts[1:]):
+            self.ink.line((int(x0), int(y0)), (int(x1), int(y1)), color, width)
+
+    def _truncate(self):
+        # Drop the redo tail
+        if self.visible < self.num_strokes:
+            self.num_strokes = self.visible
+            rec = self.strokes[self.visible - 1] if self.visible else None
+            self.num_points = int(rec["start"] + rec["length"]) if rec is not None else 0
+            self.checkpoints = [c for c in self.checkpoints if c[0] <= self.visible]
+
+    def _merge(self):
+        # Fold everything before the second-oldest checkpoint into the base
+        base, _ = self.checkpoints[1]
+        offset = int(self.strokes[base]["start"]) if base < self.num_strokes else self.num_points
+        n = self.num_strokes - base
+        self.strokes[:n] = self.strokes[base:self.num_strokes]
+        self.strokes["start"][:n] -= offset
+        self.points[:self.num_points - offset] = self.points[offset:self.num_points]
+        self.num_points -= offset
+        self.num_strokes = n
+        self.visible -= base
+        self.merged += base
+        self.checkpoints = [(i - base, snap) for i, snap in self.checkpoints[1:]]
+
+    # ---------------- Save / Load ----------------
+    def save(self, path):
+        """
+        Writes the visible strokes and the tiles they start from. The file is
+        written next to path and then renamed over it, so an interrupted save
+        leaves the previous drawing in place.
+        """
+        self.end()
+        base = self.checkpoints[0][1]
+        n = self.visible
+        num_points = int(self.strokes[n - 1]["start"] + self.strokes[n - 1]["length"]) if n else 0
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.ink.tile, n, num_points, len(base)))
+            for (ty, tx), img in base.items():
+                png = cv2.imencode(".png", img)[1].tobytes()
+                f.write(BASE_TILE.pack(ty, tx, len(png)))
+                f.write(png)
+            f.write(self.strokes[:n].tobytes())
+            f.write(self.points[:num_points].tobytes())
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """
+        Replaces the drawing with a saved one (which must use the same tile
+        size). Raises ValueError for anything that is not a complete journal.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError("{} is not a stroke journal".format(path))
+        magic, version, tile, n, num_points, num_tiles = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a stroke journal".format(path))
+        if tile != self.ink.tile:
+            raise ValueError("{} uses {} px tiles, the canvas {} px".format(path, tile, self.ink.tile))
+        pos = HEADER.size
+        base = {}
+        for _ in range(num_tiles):
+            if pos + BASE_TILE.size > len(data):
+                raise ValueError("{} is truncated".format(path))
+            ty, tx, size = BASE_TILE.unpack_from(data, pos)
+            pos += BASE_TILE.size
+            if pos + size > len(data):
+                raise ValueError("{} is truncated".format(path))
+            img = cv2.imdecode(np.frombuffer(data, np.uint8, size, pos), cv2.IMREAD_COLOR)
+            if img is None or img.shape != (tile, tile, 3):
+                raise ValueError("{}: tile ({}, {}) is damaged".format(path, ty, tx))
+            base[ty, tx] = img
+            pos += size
+        if len(data) != pos + n * STROKE_DTYPE.itemsize + num_points * 8:
+            raise ValueError("{} is truncated".format(path))
+        self.ink.restore(base)
+        strokes = np.frombuffer(data, STROKE_DTYPE, n, pos)
+        pos += strokes.nbytes
+        points = np.frombuffer(data, np.int32, 2 * num_points, pos).reshape(-1, 2)
+
+        self.strokes = np.zeros(max(64, 2 * n), dtype=STROKE_DTYPE)
+        self.strokes[:n] = strokes
+        self.points = np.zeros((max(1024, 2 * num_points), 2), dtype=np.int32)
+        self.points[:num_points] = points
+        self.num_strokes = self.visible = n
+        self.num_points = num_points
+        self.merged = 0
+        self._pens = {}
+        self.checkpoints = [(0, self.ink.snapshot())]
+        for i in range(n):
+            self._replay(i)
+            if (i + 1) % self.checkpoint_every == 0:
+                self.checkpoints.append((i + 1, self.ink.snapshot()))
+        while self.visible - self.checkpoints[0][0] > self.max_strokes and len(self.checkpoints) > 1:
+            self._merge()
+
+    def memory(self):
+        """Bytes held by the journal: stroke and point arrays plus the checkpoint tiles the canvas no longer shares."""
+        shared = self.ink.memory([snapshot for _, snapshot in self.checkpoints]) - self.ink.memory()
+        return self.strokes.nbytes + self.points.nbytes + shared
@@ -0,0 +1,138 @@
+"""
+Round trip of landmark_log.py: a session recorded from a fake Hands replays
+exactly what was recorded, also when the recorder never got to close(),
+and replayed gestures come out as they went in.
+
+    python -m pytest -q test_landmark_log.py
+"""
+import types
+
+import numpy as np
+import pytest
+
+from capture import frame_timestamp
+from gestures import GestureEngine, START
+from landmark_log import (HANDEDNESS, RECORD_DTYPE, HEADER_SIZE, LandmarkRecorder, ReplaySession,
+                          load_session, stop_recording)
+from landmarks import NUM_LANDMARKS, HandArray
+
+
+def hand_points(up, x=0.5):
+    """(21, 3) landmarks of a hand at x with the fingers in up (thumb = 0 ... pinky = 4) extended."""
+    pts = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+    pts[0] = (x, 0.75, 0.0)
+    for finger in range(5):
+        for joint in range(4):
+            y = 0.60 - 0.06 * joint if finger in up else 0.60 - 0.03 * min(joint, 1) + 0.02 * max(joint - 1, 0)
+            pts[1 + 4 * finger + joint] = (x - 0.1 + 0.05 * finger, y, -0.01 * joint)
+    return pts
+
+
+def mediapipe_result(hands):
+    """A mediapipe-like result of [(points, label, score)] (an empty list: no hand)."""
+    if not hands:
+        return types.SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+    landmarks = [types.SimpleNamespace(landmark=[types.SimpleNamespace(x=float(x), y=float(y), z=float(z))
+                                                 for x, y, z in points])
+                 for points, _, _ in hands]
+    labels = [types.SimpleNamespace(classification=[types.SimpleNamespace(label=label, score=score)])
+              for _, label, score in hands]
+    return types.SimpleNamespace(multi_hand_landmarks=landmarks, multi_handedness=labels)
+
+
+class FakeHands:
+    """Answers process() with the given results in turn."""
+
+    def __init__(self, results):
+        self.results = iter(results)
+
+    def process(self, rgb):
+        return mediapipe_result(next(self.results))
+
+
+def record(path, script, size=(48, 64), fps=30.0, close=True):
+    """Records script (one list of hands per frame) and sets the record times to fps."""
+    recorder = LandmarkRecorder(FakeHands(script), str(path))
+    frame = np.zeros(size + (3,), dtype=np.uint8)
+    for _ in script:
+        recorder.process(frame)
+    if close:
+        stop_recording(recorder)
+    records = np.memmap(str(path), dtype=RECORD_DTYPE, mode="r+", offset=HEADER_SIZE, shape=(len(script),))
+    records["t"] = np.arange(len(script)) / fps
+    records.flush()
+    del records
+    return recorder
+
+
+def replay(path, **kwargs):
+    """[(frame time, [(points, label)])] of every frame of a replay."""
+    session = ReplaySession(str(path), **kwargs)
+    frames = []
+    while True:
+        ret, image = session.read()
+        if not ret:
+            break
+        result = session.hands.process(image)
+        found = result.multi_hand_landmarks or []
+        frames.append((frame_timestamp(session),
+                       [(points, label) for points, (label, _) in zip(found, result.handedness)]))
+    return session, frames
+
+
+def test_replay_returns_the_recorded_results(tmp_path):
+    path = tmp_path / "session.lmk"
+    script = [
+        [(hand_points((1,)), "Right", 0.9)],
+        [],
+        [(hand_points(range(5), 0.3), "Left", 0.8), (hand_points(()), "Right", 0.7)],
+    ]
+    record(path, script)
+
+    records, header = load_session(str(path))
+    assert (header["width"], header["height"], header["count"]) == (64, 48, 3)
+    assert list(records["frame"]) == [0, 1, 2]
+
+    session, frames = replay(path)
+    assert session.frame.shape == (48, 64, 3)
+    assert len(frames) == len(script)
+    for (_, hands), expected in zip(frames, script):
+        assert len(hands) == len(expected)
+        for (points, label), (want, want_label, _) in zip(hands, expected):
+            np.testing.assert_array_equal(points, want)
+            assert label == want_label and label in HANDEDNESS
+    # Frame times are the recorded ones, one 30 fps frame apart however fast the replay ran
+    np.testing.assert_allclose(np.diff([t for t, _ in frames]), 1 / 30)
+
+
+def test_unclosed_recording_replays_up_to_the_crash(tmp_path):
+    path = tmp_path / "crashed.lmk"
+    script = [[(hand_points((1,)), "Right", 0.9)]] * 5
+    recorder = record(path, script, close=False)
+    # Killed mid-write: a partial record after the last complete one
+    with open(str(path), "ab") as f:
+        f.write(bytes(RECORD_DTYPE.itemsize // 2))
+
+    records, header = load_session(str(path))
+    assert header["count"] == 5
+    _, frames = replay(path)
+    assert len(frames) == 5
+    np.testing.assert_array_equal(frames[-1][1][0][0], script[-1][0][0])
+    recorder.close()
+
+
+@pytest.mark.parametrize("realtime", [False, True])
+def test_replayed_fist_starts_once(tmp_path, realtime):
+    # Half a second of fist between open hands, at 30 fps
+    path = tmp_path / "fist.lmk"
+    palm, fist = hand_points(range(5)), hand_points(())
+    script = [[(palm, "Right", 0.9)]] * 10 + [[(fist, "Right", 0.9)]] * 15 + [[(palm, "Right", 0.9)]] * 10
+    record(path, script)
+
+    engine, hand = GestureEngine(), HandArray()
+    starts = []
+    for t, hands in replay(path, realtime=realtime)[1]:
+        for event in engine.update(hand.load(hands[0][0]), t):
+            if event.kind == START:
+                starts.append(event.gesture)
+    assert starts.count("fist") == 1
@@ -0,0 +1,239 @@
+import random
+import time
+
+# Score of a won position. Wins found with fewer stones on the board score
+# higher, so the solver prefers quick wins and slow losses.
+WIN_SCORE = 1000000
+
+# Chance that the computer plays the solver's move instead of a random one
+DIFFICULTY_LEVELS = {
+    "easy": 0.0,     # always a random empty cell (the original behaviour)
+    "medium": 0.6,
+    "hard": 1.0,     # always the solver's move
+}
+
+_EXACT, _LOWER, _UPPER = 0, 1, 2
+
+_mask_cache = {}
+
+
+def win_masks(n, k):
+    """
+    Every k-in-a-row line of an n x n board as a bitmask, where bit r * n + c
+    is cell (r, c). Also returns, for every cell, the lines going through it,
+    so a move only has to be checked against those.
+    """
+    if (n, k) not in _mask_cache:
+        masks = []
+        for r in range(n):
+            for c in range(n):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_r, end_c = r + dr * (k - 1), c + dc * (k - 1)
+                    if 0 <= end_r < n and 0 <= end_c < n:
+                        mask = 0
+                        for i in range(k):
+                            mask |= 1 << ((r + dr * i) * n + c + dc * i)
+                        masks.append(mask)
+        by_cell = tuple(tuple(m for m in masks if m >> i & 1) for i in range(n * n))
+        _mask_cache[(n, k)] = (tuple(masks), by_cell)
+    return _mask_cache[(n, k)]
+
+
+def popcount(bits):
+    return bin(bits).count("1")
+
+
+# ---------------- Board ----------------
+class Board:
+    """
+    An n x n board needing k in a row, stored as one bitmask per player.
+    The winner is updated when a move is placed, by checking only the lines
+    through that cell, so is_win() and is_full() are O(1).
+    """
+
+    def __init__(self, n=3, k=None):
+        self.n = n
+        self.k = k or n
+        self.masks, self.masks_by_cell = win_masks(n, self.k)
+        self.full = (1 << (n * n)) - 1
+        self.reset()
+
+    def reset(self):
+        self.x = 0
+        self.o = 0
+        self.winner = None
+
+    def cell(self, r, c):
+        bit = 1 << (r * self.n + c)
+        if self.x & bit:
+            return 'X'
+        if self.o & bit:
+            return 'O'
+        return ''
+
+    def is_empty(self, r, c):
+        return not (self.x | self.o) >> (r * self.n + c) & 1
+
+    def place(self, r, c, sym):
+        i = r * self.n + c
+        if not self.is_empty(r, c):
+            raise ValueError("cell {} is not empty".format((r, c)))
+        if sym == 'X':
+            self.x |= 1 << i
+            bits = self.x
+        else:
+            self.o |= 1 << i
+            bits = self.o
+        if self.winner is None and any(bits & m == m for m in self.masks_by_cell[i]):
+            self.winner = sym
+
+    def is_win(self, sym):
+        return self.winner == sym
+
+    def is_full(self):
+        return (self.x | self.o) == self.full
+
+    def empty_cells(self):
+        occupied = self.x | self.o
+        return [divmod(i, self.n) for i in range(self.n * self.n) if not occupied >> i & 1]
+
+    def key(self):
+        """Hashable snapshot of the position (e.g. for render caches)."""
+        return self.x, self.o
+
+
+# ---------------- Solver ----------------
+class _Timeout(Exception):
+    pass
+
+
+class Solver:
+    """
+    Negamax with alpha-beta pruning and a transposition table, searched with
+    iterative deepening under a time budget.
+
+    3x3 is always solved to the end (perfect play). On bigger boards the
+    search stops when the budget runs out and uses the deepest completed
+    iteration, scoring unfinished positions by their open lines, so a move
+    never stalls the frame loop for long. The table is kept between moves
+    and games, so positions seen before are answered straight away.
+    """
+
+    def __init__(self, n=3, k=None, time_budget=0.025, max_table=1000000):
+        self.n = n
+        self.k = k or n
+        self.masks, self.masks_by_cell = win_masks(n, self.k)
+        self.full = (1 << (n * n)) - 1
+        self.time_budget = time_budget
+        self.max_table = max_table
+        self.table = {}     # (side to move bits, other bits) -> (depth, value, flag, best cell)
+        self.nodes = 0
+        self._deadline = None
+        # Try cells on many lines (the centre) first, it makes pruning much better
+        self.order = sorted(range(n * n), key=lambda i: -len(self.masks_by_cell[i]))
+        # Open-line weights for the heuristic, well below WIN_SCORE
+        self.line_weight = [0] + [4 ** a for a in range(1, self.k + 1)]
+
+    def choose_move(self, board, sym, difficulty="hard"):
+        """The computer's move for the given difficulty (see DIFFICULTY_LEVELS), or None if the board is full."""
+        empty = board.empty_cells()
+        if not empty:
+            return None
+        if random.random() < DIFFICULTY_LEVELS[difficulty]:
+            return self.best_move(board, sym)
+        return random.choice(empty)
+
+    def best_move(self, board, sym):
+        me, opp = (board.x, board.o) if sym == 'X' else (board.o, board.x)
+        empties = self.n * self.n - popcount(me | opp)
+        if empties == 0:
+            return None
+        if len(self.table) > self.max_table:
+            self.table.clear()
+
+        exact = self.n <= 3     # small enough to always solve completely
+        self._deadline = None if exact else time.perf_counter() + self.time_budget
+        self.nodes = 0
+        best = None
+        for depth in ([empties] if exact else range(1, empties + 1)):
+            try:
+                value = self._negamax(me, opp, depth, -WIN_SCORE - 1, WIN_SCORE + 1)
+            except _Timeout:
+                break
+            best = self.table[(me, opp)][3]
+            if abs(value) > WIN_SCORE // 2:
+                break   # forced win or loss found, deeper search will not change it
+        if best is None:
+            occupied = me | opp
+            best = next(i for i in self.order if not occupied >> i & 1)
+        return divmod(best, self.n)
+
+    def _negamax(self, me, opp, depth, alpha, beta):
+        # me: stones of the side to move, opp: stones of the side that just moved
+        self.nodes += 1
+        if self._deadline is not None and self.nodes & 127 == 0 \
+                and time.perf_counter() > self._deadline:
+            raise _Timeout()
+
+        occupied = me | opp
+        if occupied == self.full:
+            return 0
+        if depth == 0:
+            return self._evaluate(me, opp)
+
+        key = (me, opp)
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            e_depth, e_value, e_flag, tt_move = entry
+            if e_depth >= depth:
+                if e_flag == _EXACT:
+                    return e_value
+                if e_flag == _LOWER:
+                    alpha = max(alpha, e_value)
+                else:
+                    beta = min(beta, e_value)
+                if alpha >= beta:
+                    return e_value
+
+        alpha_start = alpha
+        win_value = WIN_SCORE - popcount(occupied)
+        best_value = -WIN_SCORE - 1
+        best_cell = None
+        moves = self.order if tt_move is None else [tt_move] + [i for i in self.order if i != tt_move]
+        for i in moves:
+            if occupied >> i & 1:
+                continue
+            new = me | (1 << i)
+            if any(new & m == m for m in self.masks_by_cell[i]):
+                value = win_value
+            else:
+                value = -self._negamax(opp, new, depth - 1, -beta, -alpha)
+            if value > best_value:
+                best_value, best_cell = value, i
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_start:
+            flag = _UPPER
+        elif best_value >= beta:
+            flag = _LOWER
+        else:
+            flag = _EXACT
+        self.table[key] = (depth, best_value, flag, best_cell)
+        return best_value
+
+    def _evaluate(self, me, opp):
+        """Open lines for the side to move minus open lines for the other side."""
+        score = 0
+        weight = self.line_weight
+        for m in self.masks:
+            mine = me & m
+            theirs = opp & m
+            if mine and not theirs:
+                score += weight[popcount(mine)]
+            elif theirs and not mine:
+                score -= weight[popcount(theirs)]
+        return score
@@ -0,0 +1,49 @@
+"""
+Drawing shared by the two Tic Tac Toe games (game_option.py and
+game_play2.py): the X / O selection boxes and board cells as widget draw
+callbacks (see widgets.py), and the board itself for the cached board layer.
+"""
+import cv2
+
+
+def draw_x_box(box, img, rect, hover, scale):
+    x, y, w, h = rect
+    a, b = w * 2 // 15, w * 13 // 15
+    cv2.rectangle(img, (x, y), (x + w, y + h), (0,0,255), int(round((6 if hover else 3) * scale)))
+    cv2.line(img, (x + a, y + a), (x + b, y + b), (0,0,255), int(round(7 * scale)))
+    cv2.line(img, (x + a, y + b), (x + b, y + a), (0,0,255), int(round(7 * scale)))
+
+def draw_o_box(box, img, rect, hover, scale):
+    x, y, w, h = rect
+    cv2.rectangle(img, (x, y), (x + w, y + h), (255,0,0), int(round((6 if hover else 3) * scale)))
+    cv2.circle(img, (x + w // 2, y + h // 2), w * 2 // 5, (255,0,0), int(round(7 * scale)))
+
+def draw_cell(cell, img, rect, hover, scale):
+    # The grid itself is part of the board layer; a hovered cell gets a frame
+    if hover:
+        x, y, w, h = rect
+        inset = w // 15
+        cv2.rectangle(img, (x + inset, y + inset), (x + w - inset, y + h - inset), (200,200,200), 2)
+
+def render_board(img, board, offset, cell_size):
+    """Clears img to white and draws the grid of board (a ttt_engine.Board) at (offset, offset) with its X and O."""
+    img[:] = (255, 255, 255)
+    n = board.n
+    arm = cell_size * 4 // 15   # half the size of an X (40 px on a 3x3 board)
+
+    # Draw grid lines
+    for i in range(n + 1):
+        # Vertical lines
+        cv2.line(img, (offset + i * cell_size, offset), (offset + i * cell_size, offset + n * cell_size), (0,0,0), 3)
+        # Horizontal lines
+        cv2.line(img, (offset, offset + i * cell_size), (offset + n * cell_size, offset + i * cell_size), (0,0,0), 3)
+
+    # Draw existing X and O
+    for r in range(n):
+        for c in range(n):
+            center = (offset + c * cell_size + cell_size//2, offset + r * cell_size + cell_size//2)
+            if board.cell(r, c) == 'X':
+                cv2.line(img, (center[0]-arm, center[1]-arm), (center[0]+arm, center[1]+arm), (0,0,255), 5)
+                cv2.line(img, (center[0]-arm, center[1]+arm), (center[0]+arm, center[1]-arm), (0,0,255), 5)
+            elif board.cell(r, c) == 'O':
+                cv2.circle(img, center, cell_size // 3, (255,0,0), 5)
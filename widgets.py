@@ -0,0 +1,111 @@
+"""
+Retained-mode widgets (buttons, color swatches, board cells) for the game
+screens and the Air Canvas palette.
+
+A WidgetLayer is built once from a list of widgets. Every widget's normal
+and hover look is pre-rendered into a Sprite, and an integer label map the
+size of the layer holds, for each pixel, which widget is under it (0 =
+none), so hit-testing the cursor is one array lookup. The same rectangles
+drive drawing and hit-testing. scaled() builds the layer again for another
+size (e.g. a bigger camera frame), so no geometry is computed per frame.
+"""
+import numpy as np
+
+from layer_cache import Sprite
+
+
+class Widget:
+    """
+    A rectangle (x, y, w, h) in layout pixels, drawn by draw(widget, img,
+    rect, hover, scale) where rect is where the widget lands in img.
+
+    The hit area is the inside of the rectangle without its edges, the same
+    pixels as x < cx < x + w and y < cy < y + h; `hit` overrides it with a
+    half-open (x0, y0, x1, y1). `pad` is how far the drawing reaches past
+    the rectangle (thick borders, labels underneath).
+    """
+
+    def __init__(self, name, rect, draw, value=None, hit=None, pad=8):
+        self.name = name
+        self.rect = rect
+        self.draw = draw
+        self.value = value
+        self.hit = hit if hit is not None else (rect[0] + 1, rect[1] + 1, rect[0] + rect[2], rect[1] + rect[3])
+        self.pad = pad
+
+
+def grid_cells(x, y, n, cell, draw):
+    """
+    n x n board cells starting at (x, y), with value (row, col). A cell
+    owns its top and left edge, so neighbours leave no gap, except on the
+    outer edge of the grid.
+    """
+    cells = []
+    for r in range(n):
+        for c in range(n):
+            x0, y0 = x + c * cell, y + r * cell
+            hit = (x0 + (c == 0), y0 + (r == 0), x0 + cell, y0 + cell)
+            cells.append(Widget("cell {},{}".format(r, c), (x0, y0, cell, cell), draw, (r, c), hit, pad=2))
+    return cells
+
+
+class WidgetLayer:
+    """
+    Widgets laid out on a width x height layer (layout pixels), built at
+    `scale`. Later widgets are on top of earlier ones where they overlap.
+    """
+
+    def __init__(self, width, height, widgets, scale=1.0):
+        self.layout = (width, height, widgets)
+        self.scale = scale
+        self.width = int(round(width * scale))
+        self.height = int(round(height * scale))
+        self.widgets = widgets
+
+        # Label map: index + 1 of the widget under each pixel, later widgets on top
+        self.labels = np.zeros((self.height, self.width), dtype=np.int16)
+        for i, widget in enumerate(widgets):
+            x0, y0, x1, y1 = (int(round(v * scale)) for v in widget.hit)
+            self.labels[max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)] = i + 1
+
+        # Per widget: where its sprites go and the pre-rendered (normal, hover) pair
+        self.origins = []
+        self.sprites = []
+        for widget in widgets:
+            x, y, w, h = (int(round(v * scale)) for v in widget.rect)
+            pad = int(round(widget.pad * scale))
+            sx0, sy0 = max(x - pad, 0), max(y - pad, 0)
+            sx1, sy1 = min(x + w + pad + 1, self.width), min(y + h + pad + 1, self.height)
+            rect = (x - sx0, y - sy0, w, h)
+            self.origins.append((sx0, sy0))
+            self.sprites.append(tuple(
+                Sprite(sx1 - sx0, sy1 - sy0,
+                       lambda img, widget=widget, rect=rect, hover=hover: widget.draw(widget, img, rect, hover, scale))
+                for hover in (False, True)))
+        self._index = {id(widget): i for i, widget in enumerate(widgets)}
+
+    def scaled(self, scale):
+        """The same layout built at `scale` times its size."""
+        width, height, widgets = self.layout
+        return WidgetLayer(width, height, widgets, scale)
+
+    def hit(self, x, y):
+        """The widget under (x, y), or None (also for a missing cursor)."""
+        if x is None or y is None or not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        i = self.labels[y, x]
+        return self.widgets[i - 1] if i else None
+
+    def draw(self, img, hover=None, x=0, y=0):
+        """Stamps every widget onto img with its top left corner at (x, y), `hover` (a widget) in its hover look."""
+        for widget, (sx, sy), sprites in zip(self.widgets, self.origins, self.sprites):
+            sprites[widget is hover].stamp(img, x + sx, y + sy)
+        return img
+
+    def draw_hover(self, img, widget, x=0, y=0):
+        """Stamps just the hover look of one widget, over a layer drawn with draw()."""
+        if widget is not None:
+            i = self._index[id(widget)]
+            sx, sy = self.origins[i]
+            self.sprites[i][1].stamp(img, x + sx, y + sy)
+        return img